@@ -0,0 +1,137 @@
+import csv
+import hashlib
+import json
+import os
+import numpy as np
+from geometry_kernels import pack_rings, bboxes, merge_bboxes, centroids
+
+# Attribution des isochrones aux stations par test point-dans-polygone :
+# une isochrone appartient à la station qui se trouve à l'intérieur.
+# Préfiltre par boîte englobante, puis ray-casting vectorisé sur toutes les
+# arêtes. Le plus proche voisin ne sert qu'en cas d'ambiguïté (plusieurs
+# stations dedans) ou si aucune station n'est dedans.
+
+INSIDE = 'inside'        # Une seule station dans le polygone
+AMBIGUOUS = 'ambiguous'  # Plusieurs stations dedans : la plus proche du centre
+NEAREST = 'nearest'      # Aucune station dedans : station la plus proche
+EXCLUDED = 'excluded'    # Aucune station dedans ni à moins de max_km
+INVALID = 'invalid'      # Géométrie non supportée
+
+CACHE_VERSION = 2        # À incrémenter quand la règle d'attribution change
+
+
+def polygon_parts(geometry):
+    # Liste des polygones (listes d'anneaux) d'un Polygon ou MultiPolygon,
+    # sans les parties vides (géométrie sans coordonnées : INVALID)
+    if geometry['type'] == 'Polygon':
+        parts = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        parts = geometry['coordinates']
+    else:
+        return []
+    return [p for p in parts if p and len(p[0])]
+
+
+def points_in_rings(px, py, rings):
+    # Règle pair-impair sur tous les anneaux (les trous inversent la parité)
+    crossings = np.zeros(len(px), dtype=np.int64)
+    for ring in rings:
+        ring = np.asarray(ring, dtype=float)
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        straddle = (y1[None, :] > py[:, None]) != (y2[None, :] > py[:, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = (x2 - x1)[None, :] * (py[:, None] - y1[None, :]) / (y2 - y1)[None, :] + x1[None, :]
+        crossings += np.count_nonzero(straddle & (px[:, None] < x_cross), axis=1)
+    return crossings % 2 == 1
+
+
+def attribute_features(features, index, max_km=None):
+    # Renvoie (noms des stations, statuts, stations candidates) pour chaque feature
+    n = len(features)
+    names = [None] * n
+    statuses = [INVALID] * n
+    candidates = [[] for _ in range(n)]
+
+    parts = [polygon_parts(f['geometry']) for f in features]
+    valid = [i for i, p in enumerate(parts) if p]
+    if not valid or not index.names:
+        return names, statuses, candidates
+
+    # Boîtes englobantes de tous les polygones (anneaux extérieurs de chaque partie),
+    # testées contre toutes les stations d'un coup
+    outer = [part[0] for i in valid for part in parts[i]]
+    group_offsets = np.concatenate([[0], np.cumsum([len(parts[i]) for i in valid])])
+    boxes = merge_bboxes(bboxes(*pack_rings(outer)), group_offsets)
+    in_bbox = ((index.lons[None, :] >= boxes[:, 0:1]) & (index.lons[None, :] <= boxes[:, 2:3])
+               & (index.lats[None, :] >= boxes[:, 1:2]) & (index.lats[None, :] <= boxes[:, 3:4]))
+
+    # Centre de gravité de l'anneau extérieur (et non moyenne des sommets,
+    # tirée vers les portions de contour les plus détaillées)
+    center_lons, center_lats = centroids(*pack_rings([parts[i][0][0] for i in valid])).T
+    nearest_idx, _ = index.nearest(center_lats, center_lons, max_km)
+
+    for row, i in enumerate(valid):
+        cand = np.flatnonzero(in_bbox[row])
+        inside = np.zeros(len(cand), dtype=bool)
+        for part in parts[i]:
+            if len(cand):
+                inside |= points_in_rings(index.lons[cand], index.lats[cand], part)
+        cand = cand[inside]
+        candidates[i] = [index.names[c] for c in cand]
+
+        if len(cand) == 1:
+            names[i], statuses[i] = index.names[cand[0]], INSIDE
+        elif len(cand) > 1:
+            # Plusieurs stations dedans : la plus proche du centre du polygone
+            d = (index.lats[cand] - center_lats[row]) ** 2 + \
+                ((index.lons[cand] - center_lons[row]) * np.cos(np.radians(center_lats[row]))) ** 2
+            names[i], statuses[i] = index.names[cand[np.argmin(d)]], AMBIGUOUS
+        elif nearest_idx[row] >= 0:
+            names[i], statuses[i] = index.names[nearest_idx[row]], NEAREST
+        else:
+            statuses[i] = EXCLUDED
+
+    return names, statuses, candidates
+
+
+def attribute_cached(features, index, max_km=None, cache_file=None):
+    # Même résultat que attribute_features, mis en cache sur disque tant que
+    # les stations, les géométries et max_km ne changent pas
+    # Clé : octets des coordonnées empaquetées (un tableau, pas de JSON par géométrie)
+    # et structure parties / anneaux de chaque feature
+    rings, structure = [], []
+    for f in features:
+        parts = polygon_parts(f['geometry'])
+        structure.append(len(parts))
+        for part in parts:
+            structure.append(len(part))
+            rings.extend(part)
+    coords, offsets = pack_rings(rings)
+    h = hashlib.sha1(f"{index.fingerprint()}|{max_km}|{CACHE_VERSION}".encode('utf-8'))
+    h.update(np.asarray(structure, dtype=np.int64).tobytes())
+    h.update(offsets.tobytes())
+    h.update(coords.tobytes())
+    key = h.hexdigest()
+
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, 'r') as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            return cached['stations'], cached['statuses'], cached['candidates']
+
+    names, statuses, candidates = attribute_features(features, index, max_km)
+    if cache_file:
+        with open(cache_file, 'w') as f:
+            json.dump({'key': key, 'stations': names, 'statuses': statuses, 'candidates': candidates},
+                      f, ensure_ascii=False)
+    return names, statuses, candidates
+
+
+def write_report(rows, filename):
+    # rows : (durée, indice feature, statut, station, candidats) hors attributions sans ambiguïté
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Duree', 'Feature', 'Statut', 'Station', 'Candidats'])
+        for duration, i, status, station, cands in rows:
+            writer.writerow([duration, i, status, station or '', ' | '.join(cands)])
@@ -0,0 +1,407 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import numpy as np
+import pandas as pd
+from build import STAGES, Stage, run_stage
+import geometry_kernels
+
+# Benchmarks sur des réseaux synthétiques de taille configurable
+#   python benchmark.py                          # 73 et 1000 stations
+#   python benchmark.py --tailles 73 1000 10000 --sommets 600
+#   python benchmark.py --save-baseline          # enregistre la référence
+#   python benchmark.py --strict                 # code retour 1 si régression
+#   python benchmark.py --noyaux                 # calculs géométriques seuls (aires, centres...)
+#   python benchmark.py --rendu                  # carte SVG / canvas dans Chromium (playwright)
+#
+# Pour chaque taille : stations tirées au hasard sur la France, isochrones
+# synthétiques (anneaux étoilés bruités, jamais auto-intersectés) dont le
+# nombre de sommets imite TravelTime. Les 30/60 min n'ont pas de station,
+# comme celles extraites du HTML, pour mesurer l'association. On lance
+# ensuite create_final_map_v2.py puis export_kml_by_station.py, mesurés
+# comme dans build.py (temps, CPU, mémoire max, sous-étapes).
+
+BENCH_DIR = 'bench'
+BASELINE_FILE = 'benchmark_baseline.json'
+REPORT_FILE = 'rapport_benchmark.json'
+DEFAULT_SIZES = [73, 1000]
+DEFAULT_VERTICES = 300
+TOLERANCE = 0.25   # +25 % sur une mesure = régression...
+MIN_DELTA = {'s': 0.5, 'Mo': 0.5}   # ...si l'écart absolu dépasse aussi le bruit de mesure
+
+# France métropolitaine (approximatif)
+FRANCE_BBOX = (-4.5, 42.5, 7.8, 50.9)
+TERRITOIRES = ['Nord-Est', 'Nord-Ouest', 'Centre', 'Centre-Est', 'Centre-Sud-Ouest', 'Sud-Med', 'Paris']
+RADIUS_KM = {'30': 25, '60': 50, '90': 75, '120': 100}   # ~50 km/h de moyenne
+RER_SHARE = 0.4
+
+# Mesures comparées à la référence : (clé, libellé, unité)
+METRICS = [
+    ('association_s', 'Association', 's'),
+    ('carte_s', 'Carte (total)', 's'),
+    ('rendu_folium_s', 'Rendu folium', 's'),
+    ('html_mb', 'Taille HTML', 'Mo'),
+    ('carte_rss_mb', 'Mémoire carte', 'Mo'),
+    ('kml_s', 'Export KML (total)', 's'),
+    ('kml_mb', 'Taille KML', 'Mo'),
+    ('kml_rss_mb', 'Mémoire KML', 'Mo'),
+]
+
+
+# ---------- Réseau synthétique ----------
+
+def synthetic_stations(n, rng):
+    lon0, lat0, lon1, lat1 = FRANCE_BBOX
+    is_rer = rng.random(n) < RER_SHARE
+    rows = []
+    for k in range(n):
+        if is_rer[k]:
+            name, kind, territoire = f'RER SYNTH{k:05d}', 'RER', 'RER'
+        else:
+            name, kind, territoire = f'ici Synth - Ville {k:05d}', 'ICI', TERRITOIRES[k % len(TERRITOIRES)]
+        rows.append({
+            'Nom_Station': name,
+            'Adresse': f'{k} rue de la Radio - {10000 + k % 89999} VILLE{k}',
+            'Type': kind,
+            'Contact_Principal': f'Contact {k} 06 00 00 {k % 100:02d} {k % 97:02d}',
+            'RedChef': '' if is_rer[k] else f'Red Chef {k} 06 11 22 33 44',
+            'RedChefAdj': '' if is_rer[k] else f'Adjoint {k}',
+            'RespProg': '' if is_rer[k] else f'Prog {k} 06 55 66 77 88',
+            'RespTech': '' if is_rer[k] else f'Tech {k} 06 99 88 77 66',
+            'Latitude': rng.uniform(lat0, lat1),
+            'Longitude': rng.uniform(lon0, lon1),
+            'Territoire': territoire,
+        })
+    return pd.DataFrame(rows)
+
+
+def synthetic_ring(lon, lat, radius_km, n_vertices, rng):
+    # Anneau étoilé autour de la station : rayon bruité par quelques harmoniques,
+    # toujours positif, donc jamais auto-intersecté
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radius = np.ones(n_vertices)
+    for harmonic in (2, 3, 5, 11, 23):
+        radius += rng.uniform(0, 0.25 / np.sqrt(harmonic)) * np.sin(harmonic * angles + rng.uniform(0, 2 * np.pi))
+    radius = np.maximum(radius, 0.2) * radius_km
+    dlat = radius * np.sin(angles) / 111.0
+    dlon = radius * np.cos(angles) / (111.0 * np.cos(np.radians(lat)))
+    ring = np.column_stack([lon + dlon, lat + dlat])
+    return np.vstack([ring, ring[:1]]).round(6).tolist()
+
+
+def write_network(df, out_dir, n_vertices, rng):
+    os.makedirs(out_dir, exist_ok=True)
+    df.to_csv(os.path.join(out_dir, 'all_stations_geocoded.csv'), sep=';', index=False)
+    for duration, radius_km in RADIUS_KM.items():
+        # Plus de sommets pour les grandes isochrones, comme les contours TravelTime
+        vertices = max(8, int(n_vertices * radius_km / RADIUS_KM['120']))
+        features = []
+        for station, lon, lat in df[['Nom_Station', 'Longitude', 'Latitude']].itertuples(index=False):
+            properties = {'time': f'{duration} min'}
+            if duration in ('90', '120'):
+                properties['station'] = station
+            features.append({
+                "type": "Feature",
+                "properties": properties,
+                "geometry": {"type": "Polygon",
+                             "coordinates": [synthetic_ring(lon, lat, radius_km, vertices, rng)]}
+            })
+        with open(os.path.join(out_dir, f'isochrones_{duration}min.geojson'), 'w') as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
+# ---------- Mesures ----------
+
+def span_total(metrics, name):
+    return round(sum(s['wall_s'] for s in metrics['spans'] if s['name'] == name), 3)
+
+
+def generate(n, n_vertices, seed):
+    out_dir = os.path.join(BENCH_DIR, f'n{n}')
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    rng = np.random.default_rng(seed)
+    start = time.time()
+    write_network(synthetic_stations(n, rng), out_dir, n_vertices, rng)
+    print(f"   🧪 Réseau de {n} stations généré ({time.time() - start:.1f}s)")
+    return out_dir
+
+
+def run_size(n, n_vertices, seed):
+    out_dir = generate(n, n_vertices, seed)
+    stages = {s.name: s for s in STAGES}
+    result = {'stations': n, 'vertices': n_vertices}
+    cwd = os.getcwd()
+    os.chdir(out_dir)
+    try:
+        # La carte passe en premier : elle construit l'instantané et fait l'association
+        returncode, carte = run_stage(stages['carte'])
+        if returncode != 0:
+            raise RuntimeError(f"create_final_map_v2.py a échoué ({n} stations)")
+        returncode, kml = run_stage(stages['kml'])
+        if returncode != 0:
+            raise RuntimeError(f"export_kml_by_station.py a échoué ({n} stations)")
+    finally:
+        os.chdir(cwd)
+
+    result.update({
+        'association_s': span_total(carte, 'association'),
+        'carte_s': carte['wall_s'],
+        'rendu_folium_s': span_total(carte, 'rendu folium'),
+        'html_mb': round(os.path.getsize(os.path.join(out_dir, 'carte_finale.html')) / 1e6, 2),
+        'carte_rss_mb': carte['peak_rss_mb'],
+        'kml_s': kml['wall_s'],
+        'kml_mb': round(kml['output_bytes'] / 1e6, 2),
+        'kml_rss_mb': kml['peak_rss_mb'],
+    })
+    return result
+
+
+# ---------- Noyaux géométriques ----------
+
+def _loop_kernels(rings):
+    # Calculs anneau par anneau, tels qu'ils étaient faits avant geometry_kernels
+    areas, centers, boxes = [], [], []
+    for ring in rings:
+        a = np.asarray(ring, dtype=float)
+        x, y = a[:, 0], a[:, 1]
+        areas.append(abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2)
+        centers.append((x.mean(), y.mean()))
+        boxes.append([min(c[0] for c in ring), min(c[1] for c in ring),
+                      max(c[0] for c in ring), max(c[1] for c in ring)])
+    return areas, centers, boxes
+
+
+def _batched_kernels(coords, offsets):
+    return (geometry_kernels.planar_areas(coords, offsets), geometry_kernels.centroids(coords, offsets),
+            geometry_kernels.bboxes(coords, offsets))
+
+
+def _best_time(function, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_kernels(n, n_vertices, seed):
+    # Aires, centres et boîtes de n anneaux : boucle par anneau contre calcul en bloc,
+    # conversion des listes GeoJSON comprise (pack_rings) ou non (données d'une GeometryStore)
+    rng = np.random.default_rng(seed)
+    stations = synthetic_stations(n, rng)
+    rings = [synthetic_ring(lon, lat, RADIUS_KM['120'], n_vertices, rng)
+             for lon, lat in stations[['Longitude', 'Latitude']].itertuples(index=False)]
+    coords, offsets = geometry_kernels.pack_rings(rings)
+    assert np.allclose(_loop_kernels(rings)[0], _batched_kernels(coords, offsets)[0]), "aires différentes"
+    loop_s = _best_time(_loop_kernels, rings)
+    packed_s = _best_time(lambda: _batched_kernels(*geometry_kernels.pack_rings(rings)))
+    kernels_s = _best_time(_batched_kernels, coords, offsets)
+    return {'anneaux': n, 'sommets': n_vertices, 'boucle_s': round(loop_s, 4),
+            'avec_conversion_s': round(packed_s, 4), 'noyaux_s': round(kernels_s, 4),
+            'acceleration': round(loop_s / max(kernels_s, 1e-9), 1)}
+
+
+# ---------- Rendu navigateur ----------
+
+# Carte générée dans chaque mode, ouverte dans Chromium sans affichage (playwright) :
+# nœuds DOM, premier affichage, carte prête, puis temps d'image pendant des
+# déplacements et des changements de zoom (de l'action à l'image suivante affichée).
+# Les tuiles de fond (images) sont bloquées pour ne pas mesurer le réseau.
+RENDER_MODES = {'svg': [], 'canvas': ['--canvas']}
+RENDER_REPORT_FILE = 'rapport_rendu.json'
+PAN_STEPS = 30
+ZOOM_STEPS = 8
+
+LOAD_JS = """
+async () => {
+    const frame = () => new Promise(resolve => requestAnimationFrame(resolve));
+    await frame(); await frame();
+    const paint = performance.getEntriesByName('first-contentful-paint')[0];
+    return {
+        dom_nodes: document.getElementsByTagName('*').length,
+        map_nodes: document.querySelectorAll('.leaflet-map-pane *').length,
+        first_paint_ms: paint ? paint.startTime : null,
+        ready_ms: performance.now(),
+    };
+}
+"""
+
+FRAMES_JS = """
+async ([mapName, panSteps, zoomSteps]) => {
+    const map = window[mapName];
+    const frame = () => new Promise(resolve => requestAnimationFrame(resolve));
+    async function timed(action, steps) {
+        const times = [];
+        await frame();
+        for (let i = 0; i < steps; i++) {
+            const start = performance.now();
+            action(i);
+            await frame(); await frame();   // la 2e image commence après l'affichage de la 1re
+            times.push(performance.now() - start);
+        }
+        return times;
+    }
+    const pan = await timed(i => map.panBy(i % 2 ? [-300, -150] : [300, 150], {animate: false}), panSteps);
+    const zoom = await timed(i => map.setZoom(map.getZoom() + (i % 2 ? -1 : 1), {animate: false}), zoomSteps);
+    return {pan: pan, zoom: zoom};
+}
+"""
+
+
+def measure_page(page, path):
+    with open(path, 'r', encoding='utf-8') as f:
+        map_name = re.search(r'var (map_[0-9a-f]+) = L\.map\(', f.read()).group(1)
+    page.goto('file://' + os.path.abspath(path), wait_until='load')
+    result = page.evaluate(LOAD_JS)
+    frames = page.evaluate(FRAMES_JS, [map_name, PAN_STEPS, ZOOM_STEPS])
+    for action, times in frames.items():
+        result[f'{action}_median_ms'] = round(float(np.median(times)), 1)
+        result[f'{action}_p95_ms'] = round(float(np.percentile(times, 95)), 1)
+    for key in ('first_paint_ms', 'ready_ms'):
+        if result[key] is not None:
+            result[key] = round(result[key], 1)
+    result['html_mb'] = round(os.path.getsize(path) / 1e6, 2)
+    return result
+
+
+def run_render(n, n_vertices, seed):
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        raise SystemExit("❌ --rendu demande playwright : pip install playwright && playwright install chromium")
+    out_dir = generate(n, n_vertices, seed)
+    pages = {}
+    cwd = os.getcwd()
+    os.chdir(out_dir)
+    try:
+        for mode, extra in RENDER_MODES.items():
+            returncode, _ = run_stage(Stage('carte', 'create_final_map_v2.py', [], ['carte_finale.html'], args=extra))
+            if returncode != 0:
+                raise RuntimeError(f"create_final_map_v2.py {' '.join(extra)} a échoué ({n} stations)")
+            pages[mode] = os.path.abspath(f'carte_{mode}.html')
+            shutil.copy('carte_finale.html', pages[mode])
+    finally:
+        os.chdir(cwd)
+
+    results = {}
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        for mode, path in pages.items():
+            page = browser.new_page(viewport={'width': 1280, 'height': 800})
+            page.route('**/*', lambda route: route.abort() if route.request.resource_type == 'image'
+                       else route.continue_())
+            results[mode] = measure_page(page, path)
+            page.close()
+        browser.close()
+    return results
+
+
+# ---------- Comparaison ----------
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # Lignes (taille, mesure, référence, actuel, ratio, régression ?)
+    rows = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        for metric, label, unit in METRICS:
+            current = result[metric]
+            before = reference.get(metric) if reference else None
+            ratio = current / before if before else None
+            regression = ratio is not None and ratio > 1 + tolerance and current - before > MIN_DELTA[unit]
+            rows.append((result['stations'], label, unit, before, current, ratio, regression))
+    return rows
+
+
+def print_report(rows):
+    print(f"\n{'Stations':>8}  {'Mesure':<20} {'Référence':>10} {'Actuel':>10} {'Écart':>8}")
+    for stations, label, unit, before, current, ratio, regression in rows:
+        before_text = f"{before:.2f}" if before is not None else '-'
+        ratio_text = f"{(ratio - 1) * 100:+.0f}%" if ratio is not None else ''
+        flag = '  ⚠️ régression' if regression else ''
+        print(f"{stations:>8}  {label:<20} {before_text:>10} {current:>10.2f} {ratio_text:>8} {unit}{flag}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks carte + KML sur réseaux synthétiques")
+    parser.add_argument('--tailles', type=int, nargs='+', default=DEFAULT_SIZES, help="nombres de stations")
+    parser.add_argument('--sommets', type=int, default=DEFAULT_VERTICES,
+                        help="sommets d'une isochrone 2h (les plus petites en ont moins)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="écart relatif toléré avant de signaler une régression")
+    parser.add_argument('--save-baseline', action='store_true', help=f"enregistrer les résultats dans {BASELINE_FILE}")
+    parser.add_argument('--strict', action='store_true', help="code retour 1 en cas de régression")
+    parser.add_argument('--noyaux', action='store_true',
+                        help="mesurer seulement les calculs géométriques (boucle par anneau / en bloc)")
+    parser.add_argument('--rendu', action='store_true',
+                        help="comparer la carte SVG et --canvas dans Chromium (nœuds DOM, affichage, images)")
+    args = parser.parse_args()
+
+    if args.noyaux:
+        print("⏱️  BENCHMARK NOYAUX GÉOMÉTRIQUES (aire, centre, boîte englobante)")
+        print("=" * 60)
+        for n in args.tailles:
+            r = run_kernels(n, args.sommets, args.seed)
+            print(f"   {n:>6} anneaux × {args.sommets} sommets : boucle {r['boucle_s']:.3f}s, "
+                  f"en bloc {r['avec_conversion_s']:.3f}s depuis le GeoJSON, "
+                  f"{r['noyaux_s']:.3f}s sur tableaux (×{r['acceleration']})")
+        raise SystemExit(0)
+
+    if args.rendu:
+        print("⏱️  BENCHMARK RENDU NAVIGATEUR (SVG / canvas)")
+        print("=" * 60)
+        report = {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': {}}
+        for n in args.tailles:
+            results = run_render(n, args.sommets, args.seed)
+            report['results'][f'{n}x{args.sommets}'] = results
+            print(f"\n   {n} stations     {'nœuds DOM':>10} {'carte':>7} {'1er aff.':>9} {'prête':>8} "
+                  f"{'dépl. méd/p95':>15} {'zoom méd/p95':>15}")
+            for mode, r in results.items():
+                first_paint = f"{r['first_paint_ms']:.0f}" if r['first_paint_ms'] is not None else '-'
+                print(f"   {mode:<14} {r['dom_nodes']:>10} {r['map_nodes']:>7} {first_paint:>7}ms "
+                      f"{r['ready_ms']:>6.0f}ms {r['pan_median_ms']:>7.1f}/{r['pan_p95_ms']:<5.1f}ms "
+                      f"{r['zoom_median_ms']:>7.1f}/{r['zoom_p95_ms']:<5.1f}ms")
+        with open(RENDER_REPORT_FILE, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n📊 Rapport : {RENDER_REPORT_FILE}")
+        raise SystemExit(0)
+
+    print("⏱️  BENCHMARK RÉSEAUX SYNTHÉTIQUES")
+    print("=" * 60)
+    results = {}
+    for n in args.tailles:
+        key = f'{n}x{args.sommets}'
+        results[key] = run_size(n, args.sommets, args.seed)
+        r = results[key]
+        print(f"   ✅ {n} stations : association {r['association_s']:.2f}s, carte {r['carte_s']:.1f}s "
+              f"({r['html_mb']:.1f} Mo), KML {r['kml_s']:.1f}s ({r['kml_mb']:.1f} Mo)")
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r') as f:
+            baseline = json.load(f)['results']
+    rows = compare(results, baseline, args.tolerance)
+    print_report(rows)
+
+    report = {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': sys.version.split()[0],
+              'results': results,
+              'regressions': [f"{r[0]} stations : {r[1]}" for r in rows if r[6]]}
+    with open(REPORT_FILE, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n📊 Rapport : {REPORT_FILE}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump({'date': report['date'], 'python': report['python'], 'results': baseline}, f, indent=2)
+        print(f"📌 Référence enregistrée : {BASELINE_FILE}")
+
+    if args.strict and report['regressions']:
+        print(f"❌ {len(report['regressions'])} régression(s)")
+        raise SystemExit(1)
@@ -0,0 +1,374 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from instrumentation import METRICS_ENV, peak_rss_mb
+
+# Chaîne de production complète, façon make :
+#   python build.py                  # tout ce qui est nécessaire pour la carte et les KML
+#   python build.py carte            # seulement la carte (et ce dont elle dépend)
+#   python build.py --dry-run        # ce qui serait relancé, et pourquoi
+#   python build.py --force geocodage
+#   python build.py --touch          # adopter les fichiers déjà produits sans rien relancer
+#   python build.py --list
+#   python build.py --trace build_trace.json   # chronologie à ouvrir dans Perfetto / speedscope
+#
+# Chaque étape déclare ses entrées et ses sorties ; l'ordre d'exécution découle
+# des fichiers (une entrée produite par une autre étape en fait une dépendance).
+# Une étape est sautée si ses sorties existent et que l'empreinte (SHA-1) de ses
+# entrées n'a pas changé depuis sa dernière exécution réussie.
+#
+# Une entrée peut se limiter à certaines colonnes d'un CSV : modifier un contact
+# dans l'annuaire ne relance pas les isochrones (qui ne lisent que nom et
+# coordonnées), seulement la carte dont les popups affichent ces contacts.
+#
+# Chaque étape relancée est mesurée (temps, CPU, mémoire max, volume des
+# sorties, requêtes réseau, sous-étapes) : rapport_build.json pour la dernière
+# exécution, historique_build.jsonl pour comparer d'une exécution à l'autre.
+
+STATE_FILE = '.build_state.json'
+REPORT_FILE = 'rapport_build.json'      # mesures de la dernière exécution
+HISTORY_FILE = 'historique_build.jsonl'  # une ligne par exécution, pour suivre les régressions
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stage:
+    def __init__(self, name, script, inputs, outputs, args=(), description=''):
+        # inputs : chemins, ou (chemin, [colonnes]) pour ne suivre que ces colonnes d'un CSV
+        self.name = name
+        self.script = script
+        self.inputs = [i if isinstance(i, tuple) else (i, None) for i in inputs]
+        self.outputs = list(outputs)
+        self.args = list(args)
+        self.description = description
+
+    def command(self):
+        return [sys.executable, os.path.join(SCRIPTS_DIR, self.script)] + self.args
+
+
+ISOCHRONES = [f'isochrones_{m}min.geojson' for m in (30, 60, 90, 120)]
+COORDS = ['Nom_Station', 'Latitude', 'Longitude']
+
+STAGES = [
+    Stage('nettoyage', 'clean_csv.py', ['Annuaire_ici_Global_.csv'], ['stations_cleaned.csv'],
+          description="annuaire ICI brut -> CSV nettoyé"),
+    Stage('colonnes', 'extract_useful_columns.py', ['stations_cleaned.csv'], ['stations_ICI_propre.csv'],
+          description="colonnes utiles de l'annuaire"),
+    Stage('fusion', 'merge_stations.py', ['stations_ICI_propre.csv', 'rer.xlsx'], ['all_stations.csv'],
+          description="fusion ICI + RER"),
+    # Le géocodage relit tout le CSV (il recopie les contacts) mais passe par
+    # geocode_cache.sqlite : une adresse inchangée ne réinterroge pas Nominatim
+    Stage('geocodage', 'geocode_V2.py', ['all_stations.csv'], ['all_stations_geocoded.csv'],
+          description="adresses -> coordonnées (cache SQLite)"),
+    # Modifie all_stations_geocoded.csv en place
+    Stage('territoires', 'add_territoire.py',
+          ['all_stations_geocoded.csv', ('stations_ICI_propre.csv', ['Nom_Station', 'Territoire'])],
+          ['all_stations_geocoded.csv'],
+          description="ajout de la colonne Territoire"),
+    Stage('isochrones_html', 'extract_isochrones_html.py', ['ReseauICI.html'], ISOCHRONES[:2],
+          description="isochrones 30/60 min extraites du HTML d'origine"),
+    Stage('isochrones_traveltime', 'generate_isochrones_traveltime.py',
+          [('all_stations_geocoded.csv', COORDS)], ISOCHRONES[2:],
+          description="isochrones 90/120 min (TravelTime, cache SQLite)"),
+    Stage('carte', 'create_final_map_v2.py', ['all_stations_geocoded.csv'] + ISOCHRONES, ['carte_finale.html'],
+          description="carte interactive (popups avec contacts)"),
+    Stage('kml', 'export_kml_by_station.py',
+          [('all_stations_geocoded.csv', COORDS + ['Territoire'])] + ISOCHRONES, ['kml_stations'],
+          description="un KML par station"),
+    Stage('couverture', 'coverage.py',
+          [('all_stations_geocoded.csv', ['Nom_Station', 'Territoire', 'Type'])] + ISOCHRONES,
+          ['rapport_couverture.csv'] + [f'couverture_{d}min.geojson' for d in ('30', '60', '90', '120')],
+          args=['--couches'], description="aires couvertes, recouvrements et zones blanches par territoire"),
+    # communes.csv : centres des communes, à télécharger une fois (ex. data.gouv.fr)
+    Stage('communes', 'commune_coverage.py',
+          ['communes.csv', ('all_stations_geocoded.csv', ['Nom_Station', 'Territoire', 'Type'])] + ISOCHRONES,
+          ['couverture_communes.js'], description="table commune -> stations pour la recherche de la carte"),
+]
+
+DEFAULT_TARGETS = ['carte', 'kml']
+
+
+# ---------- Empreintes ----------
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def columns_hash(path, columns):
+    # Empreinte des seules colonnes indiquées (CSV ';'), ligne par ligne
+    h = hashlib.sha1()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f, delimiter=';')
+        missing = [c for c in columns if c not in (reader.fieldnames or [])]
+        h.update(json.dumps(missing).encode('utf-8'))
+        for row in reader:
+            h.update(json.dumps([row.get(c) for c in columns], ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+
+def input_key(path, columns):
+    return f"{path}[{','.join(columns)}]" if columns else path
+
+
+def input_hashes(stage):
+    hashes = {}
+    for path, columns in stage.inputs:
+        if not os.path.exists(path):
+            hashes[input_key(path, columns)] = None
+        elif columns:
+            hashes[input_key(path, columns)] = columns_hash(path, columns)
+        else:
+            hashes[input_key(path, columns)] = file_hash(path)
+    return hashes
+
+
+def load_state(path=STATE_FILE):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state, path=STATE_FILE):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+# ---------- Graphe ----------
+
+def dependencies(stage, stages):
+    # Étapes en amont directes : celles qui écrivent un fichier lu par cette étape
+    position = {s.name: k for k, s in enumerate(stages)}
+    deps = []
+    for path, _ in stage.inputs:
+        for other in stages:
+            if other is not stage and path in other.outputs \
+                    and position[other.name] < position[stage.name] and other not in deps:
+                deps.append(other)
+    return deps
+
+
+def plan(targets, stages=STAGES):
+    # Étapes nécessaires aux cibles, dans l'ordre topologique (celui de STAGES)
+    by_name = {s.name: s for s in stages}
+    needed = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        todo.extend(d.name for d in dependencies(by_name[name], stages))
+    return [s for s in stages if s.name in needed]
+
+
+def stale_reason(stage, state, produced):
+    # Raison de relancer l'étape, ou None si elle est à jour
+    missing_outputs = [o for o in stage.outputs if not os.path.exists(o)]
+    missing_inputs = [p for p, _ in stage.inputs if not os.path.exists(p) and p not in produced]
+    if missing_inputs:
+        if not missing_outputs:
+            return None   # source absente (ex. ReseauICI.html) : on garde les sorties existantes
+        return f"entrée introuvable : {', '.join(missing_inputs)}"
+    if missing_outputs:
+        return f"sortie absente : {', '.join(missing_outputs)}"
+    previous = state.get(stage.name)
+    if previous is None:
+        return "jamais construite"
+    current = input_hashes(stage)
+    changed = [key for key, h in current.items() if previous['inputs'].get(key) != h]
+    if changed:
+        return f"modifié : {', '.join(changed)}"
+    return None
+
+
+# ---------- Mesures ----------
+
+def output_bytes(paths):
+    # Volume des sorties (dossiers parcourus récursivement)
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def run_stage(stage):
+    # Lance le script ; os.wait4 donne le CPU et la mémoire max de ce processus
+    # (et de ses propres sous-processus), les compteurs viennent d'instrumentation.py
+    fd, metrics_path = tempfile.mkstemp(prefix='build_', suffix='.json')
+    os.close(fd)
+    os.remove(metrics_path)
+    start = time.time()
+    proc = subprocess.Popen(stage.command(), env=dict(os.environ, **{METRICS_ENV: metrics_path}))
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.time() - start
+
+    inner = {'counters': {}, 'spans': []}
+    if os.path.exists(metrics_path):
+        with open(metrics_path, 'r') as f:
+            inner = json.load(f)
+        os.remove(metrics_path)
+    return proc.returncode, {
+        'start': start,
+        'wall_s': round(wall, 3),
+        'cpu_user_s': round(rusage.ru_utime, 3),
+        'cpu_sys_s': round(rusage.ru_stime, 3),
+        'peak_rss_mb': round(peak_rss_mb(rusage), 1),
+        'output_bytes': output_bytes(stage.outputs),
+        'counters': inner['counters'],
+        'spans': inner['spans'],
+    }
+
+
+def print_metrics(name, metrics, previous):
+    delta = ''
+    if previous and previous.get('wall_s'):
+        delta = f" ({(metrics['wall_s'] / previous['wall_s'] - 1) * 100:+.0f}% vs précédent)"
+    print(f"      ⏱️  {metrics['wall_s']:.1f}s{delta}, CPU {metrics['cpu_user_s'] + metrics['cpu_sys_s']:.1f}s, "
+          f"mémoire max {metrics['peak_rss_mb']:.0f} Mo, sorties {metrics['output_bytes'] / 1e6:.1f} Mo")
+    for counter, value in sorted(metrics['counters'].items()):
+        print(f"      📡 {counter} : {value}")
+    totals = {}
+    for sub in metrics['spans']:
+        totals[sub['name']] = totals.get(sub['name'], 0) + sub['wall_s']
+    for sub, seconds in totals.items():
+        print(f"      ↳ {sub} : {seconds:.2f}s")
+
+
+def write_report(run, path=REPORT_FILE, history=HISTORY_FILE):
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2, ensure_ascii=False)
+    with open(history, 'a') as f:
+        f.write(json.dumps(run, ensure_ascii=False) + '\n')
+
+
+def write_trace(run, path):
+    # Format Chrome Trace Event (chrome://tracing, Perfetto, speedscope) :
+    # une barre par étape, les sous-étapes imbriquées dessous
+    t0 = run['start']
+    events = []
+    for k, stage in enumerate(s for s in run['stages'] if s['status'] == 'ran'):
+        metrics = stage['metrics']
+        events.append({'name': stage['name'], 'cat': 'etape', 'ph': 'X', 'pid': 1, 'tid': 1,
+                       'ts': int((metrics['start'] - t0) * 1e6), 'dur': int(metrics['wall_s'] * 1e6),
+                       'args': {key: metrics[key] for key in
+                                ('cpu_user_s', 'cpu_sys_s', 'peak_rss_mb', 'output_bytes', 'counters')}})
+        for sub in metrics['spans']:
+            events.append({'name': sub['name'], 'cat': 'sous-etape', 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': int((sub['start'] - t0) * 1e6), 'dur': int(sub['wall_s'] * 1e6),
+                           'args': {'cpu_s': sub['cpu_s']}})
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def build(targets, force=(), dry_run=False, trace=None, stages=STAGES):
+    state = load_state()
+    produced = {output for s in stages for output in s.outputs}
+    steps = plan(targets, stages)
+    run = {'start': time.time(), 'targets': list(targets), 'stages': []}
+    ran = []
+    ok = True
+    for stage in steps:
+        reason = "forcée" if stage.name in force else stale_reason(stage, state, produced)
+        if reason is None:
+            print(f"   ⏭️  {stage.name} : à jour")
+            run['stages'].append({'name': stage.name, 'status': 'skipped'})
+            continue
+        if reason.startswith("entrée introuvable"):
+            print(f"   ❌ {stage.name} : {reason}")
+            ok = False
+            break
+        print(f"   ▶️  {stage.name} ({reason})")
+        if dry_run:
+            ran.append(stage.name)
+            continue
+        returncode, metrics = run_stage(stage)
+        run['stages'].append({'name': stage.name, 'status': 'ran' if returncode == 0 else 'failed',
+                              'reason': reason, 'metrics': metrics})
+        if returncode != 0:
+            print(f"   ❌ {stage.name} a échoué (code {returncode})")
+            ok = False
+            break
+        # Empreintes relevées après exécution : une étape qui réécrit son entrée
+        # (add_territoire.py) est ainsi considérée à jour au passage suivant
+        previous = state.get(stage.name, {}).get('metrics')
+        state[stage.name] = {'inputs': input_hashes(stage), 'finished': time.time(),
+                             'metrics': {k: v for k, v in metrics.items() if k != 'spans'}}
+        save_state(state)
+        ran.append(stage.name)
+        print(f"   ✅ {stage.name}")
+        print_metrics(stage.name, metrics, previous)
+
+    if dry_run:
+        print(f"\n✅ {len(ran)}/{len(steps)} étapes à relancer" + (f" : {', '.join(ran)}" if ran else ""))
+        return ok
+    run['wall_s'] = round(time.time() - run['start'], 3)
+    write_report(run)
+    if trace:
+        write_trace(run, trace)
+    if ok:
+        print(f"\n✅ {len(ran)}/{len(steps)} étapes relancées" + (f" : {', '.join(ran)}" if ran else ""))
+    print(f"📊 Rapport : {REPORT_FILE} (historique : {HISTORY_FILE})" + (f", trace : {trace}" if trace else ""))
+    return ok
+
+
+def touch(targets, stages=STAGES):
+    # Comme make -t : enregistre les empreintes actuelles (adoption d'un dossier déjà construit)
+    state = load_state()
+    for stage in plan(targets, stages):
+        if all(os.path.exists(o) for o in stage.outputs):
+            state[stage.name] = {'inputs': input_hashes(stage), 'finished': time.time()}
+            print(f"   📌 {stage.name}")
+        else:
+            print(f"   ⚠️  {stage.name} : sorties absentes, non marquée")
+    save_state(state)
+
+
+if __name__ == '__main__':
+    names = [s.name for s in STAGES]
+    parser = argparse.ArgumentParser(description="Reconstruit uniquement les étapes dont les entrées ont changé")
+    parser.add_argument('targets', nargs='*', metavar='ETAPE',
+                        help=f"étapes cibles (défaut : {' '.join(DEFAULT_TARGETS)})")
+    parser.add_argument('--force', nargs='+', default=[], choices=names, metavar='ETAPE',
+                        help="relancer ces étapes même si elles sont à jour")
+    parser.add_argument('--dry-run', action='store_true', help="afficher le plan sans rien exécuter")
+    parser.add_argument('--touch', action='store_true',
+                        help="marquer les étapes comme à jour sans les exécuter (fichiers existants)")
+    parser.add_argument('--list', action='store_true', help="lister les étapes et leurs dépendances")
+    parser.add_argument('--trace', metavar='FICHIER',
+                        help="écrire une trace Chrome/Perfetto/speedscope des étapes (ex. build_trace.json)")
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(names)
+    if unknown:
+        parser.error(f"étapes inconnues : {', '.join(sorted(unknown))} (choix : {', '.join(names)})")
+
+    if args.list:
+        for stage in STAGES:
+            deps = ', '.join(d.name for d in dependencies(stage, STAGES)) or '-'
+            print(f"{stage.name:<24} {stage.description}  [après : {deps}]")
+        raise SystemExit(0)
+
+    targets = args.targets or DEFAULT_TARGETS
+    print(f"🔨 BUILD : {' '.join(targets)}")
+    print("=" * 60)
+    if args.touch:
+        touch(targets)
+        raise SystemExit(0)
+    ok = build(targets + [f for f in args.force if f not in targets], force=set(args.force),
+               dry_run=args.dry_run, trace=args.trace)
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,123 @@
+import argparse
+import base64
+import json
+import time
+import numpy as np
+from network import Network
+from reachability import ReachabilityIndex, read_communes
+from territoires import rattachement
+from commune_lookup import OUTPUT_FILE
+
+# Table commune -> stations par durée, précalculée pour la recherche de la carte
+#   python commune_coverage.py --communes communes.csv   # -> couverture_communes.js
+#
+# Le fichier .js appelle chargerCouverture({...}) : la carte le charge à la
+# première recherche (commune_lookup.py), puis chaque recherche est une lecture
+# directe dans des tableaux typés, sans test point-dans-polygone dans le navigateur :
+# - communes triées par cellule d'une grille régulière (GRID_DEG) ; cellCounts
+#   donne le nombre de communes de chaque cellule -> commune la plus proche du
+#   lieu trouvé en parcourant les 3 x 3 cellules voisines
+# - positions quantifiées sur 16 bits dans l'emprise des communes
+# - couverture : pour chaque commune, pairCounts entrées consécutives de pairs ;
+#   chaque entrée 16 bits = indice de station << 4 | masque des durées
+#   (bit d = durée d atteinte), soit 2 octets par couple commune / station
+# Les plages sont stockées en longueurs (8 bits le plus souvent), pas en offsets.
+# Tableaux binaires en base64 (petit-boutiste, comme les tableaux typés du navigateur).
+
+GRID_DEG = 0.1
+DURATION_BITS = 4
+MAX_STATIONS = 2 ** (16 - DURATION_BITS)
+
+
+def _typed(array, dtype):
+    # Tableau binaire pour le navigateur : {'type': 'Uint16Array', 'data': base64}
+    dtype = np.dtype(dtype)
+    array = np.ascontiguousarray(array, dtype=dtype.newbyteorder('<'))
+    return {'type': f'{"Int" if dtype.kind == "i" else "Uint"}{dtype.itemsize * 8}Array',
+            'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def _counts(counts):
+    # Longueurs de plages (le navigateur refait les sommes cumulées), sur 8 bits si possible
+    return _typed(counts, np.uint8 if counts.max(initial=0) < 256 else np.uint32)
+
+
+def grid_order(lons, lats, origin, grid_deg=GRID_DEG):
+    # (cellule de chaque commune, nombre de colonnes, nombre de lignes)
+    cols = np.floor((lons - origin[0]) / grid_deg).astype(np.int64)
+    rows = np.floor((lats - origin[1]) / grid_deg).astype(np.int64)
+    n_cols, n_rows = int(cols.max()) + 1, int(rows.max()) + 1
+    return rows * n_cols + cols, n_cols, n_rows
+
+
+def build_table(index, communes, grid_deg=GRID_DEG):
+    if len(index.durations) > DURATION_BITS or len(index.stations) >= MAX_STATIONS:
+        raise ValueError(f"au plus {DURATION_BITS} durées et {MAX_STATIONS - 1} stations")
+    lons, lats = communes['longitude'].to_numpy(), communes['latitude'].to_numpy()
+    origin = (np.floor(lons.min() / grid_deg) * grid_deg, np.floor(lats.min() / grid_deg) * grid_deg)
+    cells, n_cols, n_rows = grid_order(lons, lats, origin, grid_deg)
+    order = np.argsort(cells, kind='stable')
+    communes, lons, lats, cells = communes.iloc[order].reset_index(drop=True), lons[order], lats[order], cells[order]
+    cell_counts = np.bincount(cells, minlength=n_cols * n_rows)
+
+    # Positions sur 16 bits : pas = emprise / 65535 sur chaque axe
+    extent = (max(lons.max() - origin[0], 1e-9), max(lats.max() - origin[1], 1e-9))
+    qx = np.round((lons - origin[0]) / extent[0] * 65535)
+    qy = np.round((lats - origin[1]) / extent[1] * 65535)
+
+    # Couples (commune, station) et masque des durées atteintes
+    point, duration, station = index.query_pairs(lons, lats)
+    keys, inverse = np.unique(point * len(index.stations) + station, return_inverse=True)
+    masks = np.zeros(len(keys), dtype=np.int64)
+    np.bitwise_or.at(masks, inverse, 1 << duration)
+    pair_point, pair_station = np.divmod(keys, len(index.stations))
+    pairs = (pair_station << DURATION_BITS) | masks
+    pair_counts = np.bincount(pair_point, minlength=len(communes))
+
+    return {
+        'durations': index.durations,
+        'origin': [float(origin[0]), float(origin[1])],
+        'extent': [float(extent[0]), float(extent[1])],
+        'grid': [grid_deg, n_cols, n_rows],
+        'codes': '\n'.join(communes['code'].astype(str)),
+        'names': '\n'.join(communes['nom'].fillna('').astype(str)),
+        'cellCounts': _counts(cell_counts),
+        'positions': _typed(np.column_stack([qx, qy]).ravel(), np.uint16),
+        'pairCounts': _counts(pair_counts),
+        'pairs': _typed(pairs, np.uint16),
+    }
+
+
+def station_table(net, index):
+    # [nom affiché, couleur du territoire] par indice de station
+    rows = {station: (station_type, territoire) for station, territoire, station_type
+            in net.stations[['Nom_Station', 'Territoire', 'Type']].itertuples(index=False)}
+    result = []
+    for station in index.stations:
+        station_type, territoire = rows[station]
+        result.append([station.strip(), rattachement(station, territoire, station_type)[1]])
+    return result
+
+
+def write_table(table, stations, filename=OUTPUT_FILE):
+    payload = json.dumps({**table, 'stations': stations}, ensure_ascii=False, separators=(',', ':'))
+    content = f'chargerCouverture({payload});\n'
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return len(content.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Table commune -> stations pour la recherche de la carte")
+    parser.add_argument('--communes', default='communes.csv', help="CSV de communes (latitude, longitude, code, nom)")
+    parser.add_argument('--sortie', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    print("🏘️  Table de couverture des communes...")
+    net = Network.load()
+    index = ReachabilityIndex(net)
+    communes = read_communes(args.communes)
+    start = time.time()
+    table = build_table(index, communes)
+    size = write_table(table, station_table(net, index), args.sortie)
+    print(f"✅ {len(communes)} communes en {time.time() - start:.2f}s -> {args.sortie} ({size / 1e6:.2f} Mo)")
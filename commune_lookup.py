@@ -0,0 +1,104 @@
+import json
+
+# Côté carte de la table commune -> stations (construite par commune_coverage.py) :
+# le fichier .js appelle chargerCouverture({...}) et se charge par une balise
+# <script> à la première recherche du Geocoder (fonctionne aussi en file://).
+# Séparé de commune_coverage.py pour que la carte n'ait pas besoin de shapely.
+
+OUTPUT_FILE = 'couverture_communes.js'
+
+
+def lookup_script(map_name, labels, filename=OUTPUT_FILE):
+    # JavaScript de la carte : à chaque recherche du Geocoder, stations qui desservent
+    # la commune la plus proche du lieu trouvé. Doit s'exécuter avant la création du
+    # contrôle Geocoder (addInitHook s'applique aux contrôles créés ensuite).
+    return f"""
+(function() {{
+    var map = {map_name};
+    var labels = {json.dumps(labels)};
+    var table = null, pending = null, requested = false;
+
+    function esc(text) {{
+        return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+    }}
+
+    function decode(o) {{
+        var bytes = Uint8Array.from(atob(o.data), function(c) {{ return c.charCodeAt(0); }});
+        return new window[o.type](bytes.buffer);
+    }}
+
+    function offsets(counts) {{
+        // Longueurs de plages -> offsets (n + 1 valeurs)
+        var start = new Uint32Array(counts.length + 1);
+        for (var i = 0; i < counts.length; i++) start[i + 1] = start[i] + counts[i];
+        return start;
+    }}
+
+    window.chargerCouverture = function(t) {{
+        table = t;
+        table.cellStart = offsets(decode(t.cellCounts));
+        table.positions = decode(t.positions);
+        table.pairStart = offsets(decode(t.pairCounts));
+        table.pairs = decode(t.pairs);
+        table.codes = t.codes.split('\\n');
+        table.names = t.names.split('\\n');
+        if (pending) {{ show(pending); pending = null; }}
+    }};
+
+    function nearest(lat, lng) {{
+        var g = table.grid, col = Math.floor((lng - table.origin[0]) / g[0]),
+            row = Math.floor((lat - table.origin[1]) / g[0]);
+        var scale = Math.cos(lat * Math.PI / 180), best = -1, bestD = Infinity;
+        for (var r = row - 1; r <= row + 1; r++) {{
+            if (r < 0 || r >= g[2]) continue;
+            for (var c = col - 1; c <= col + 1; c++) {{
+                if (c < 0 || c >= g[1]) continue;
+                var cell = r * g[1] + c;
+                for (var i = table.cellStart[cell]; i < table.cellStart[cell + 1]; i++) {{
+                    var x = table.origin[0] + table.positions[2 * i] / 65535 * table.extent[0];
+                    var y = table.origin[1] + table.positions[2 * i + 1] / 65535 * table.extent[1];
+                    var d = Math.pow((x - lng) * scale, 2) + Math.pow(y - lat, 2);
+                    if (d < bestD) {{ bestD = d; best = i; }}
+                }}
+            }}
+        }}
+        return best;
+    }}
+
+    function show(center) {{
+        var i = nearest(center.lat, center.lng);
+        var html;
+        if (i < 0) {{
+            html = '<b>Hors des communes connues</b>';
+        }} else {{
+            var byDuration = table.durations.map(function() {{ return []; }});
+            for (var k = table.pairStart[i]; k < table.pairStart[i + 1]; k++) {{
+                var s = table.stations[table.pairs[k] >> 4], mask = table.pairs[k] & 15;
+                table.durations.forEach(function(d, j) {{
+                    if (mask & (1 << j)) byDuration[j].push('<span style="color:' + s[1] + '">' + esc(s[0]) + '</span>');
+                }});
+            }}
+            html = '<div style="min-width:220px"><b>' + esc(table.names[i] || table.codes[i]) + '</b>' +
+                ' <small>(' + esc(table.codes[i]) + ')</small><hr style="margin:6px 0">';
+            table.durations.forEach(function(d, j) {{
+                html += '<div><b>' + labels[d] + ' :</b> ' + (byDuration[j].join(', ') || '<i>aucune station</i>') + '</div>';
+            }});
+            html += '</div>';
+        }}
+        L.popup({{maxWidth: 320}}).setLatLng(center).setContent(html).openOn(map);
+    }}
+
+    L.Control.Geocoder.addInitHook(function() {{
+        this.on('markgeocode', function(e) {{
+            if (table) {{ show(e.geocode.center); return; }}
+            pending = e.geocode.center;
+            if (!requested) {{
+                requested = true;
+                var script = document.createElement('script');
+                script.src = "{filename}";
+                document.body.appendChild(script);
+            }}
+        }});
+    }});
+}})();
+"""
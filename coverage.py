@@ -0,0 +1,195 @@
+import argparse
+import csv
+import json
+import numpy as np
+import shapely
+from network import Network
+from territoires import COLORS, rattachement
+from geometry_kernels import geodesic_areas
+from simplification import MAP_TOLERANCE
+from instrumentation import span
+
+# Couverture des isochrones par territoire et par durée
+#   python coverage.py               # rapport_couverture.csv
+#   python coverage.py --couches     # + couverture_{durée}min.geojson (zones fusionnées)
+#
+# Pour chaque (territoire, durée) :
+# - aire couverte : union de toutes les isochrones des stations du territoire
+#   (union en cascade de GEOS : une géométrie par station, puis par territoire)
+# - recouvrement : aire atteinte par au moins deux stations ; les paires de
+#   stations qui se touchent sont trouvées par un R-tree (STRtree) au lieu de
+#   tester toutes les paires
+# - zones blanches : trous de la zone couverte (enclaves non desservies)
+# Aires géodésiques en km² (geometry_kernels), trous déduits.
+
+REPORT_FILE = 'rapport_couverture.csv'
+LAYER_FILE = 'couverture_{}min.geojson'
+ALL_TERRITORIES = 'Tous'
+MIN_GAP_KM2 = 1.0   # Trous plus petits ignorés (artefacts de contour)
+POLYGON = 3         # shapely.get_type_id
+
+
+def store_geometries(store):
+    # Une géométrie shapely par feature de la GeometryStore (None si pas de géométrie),
+    # construites en bloc à partir des tableaux d'offsets
+    geometries = np.full(len(store), None, dtype=object)
+    n_rings = len(store.ring_offsets) - 1
+    if n_rings == 0:
+        return geometries
+    ring_of_vertex = np.repeat(np.arange(n_rings), np.diff(store.ring_offsets))
+    rings = shapely.linearrings(np.asarray(store.coords, dtype=float), indices=ring_of_vertex)
+    part_of_ring = np.repeat(np.arange(len(store.part_offsets) - 1), np.diff(store.part_offsets))
+    polygons = shapely.polygons(rings, indices=part_of_ring)
+    feature_of_part = np.repeat(np.arange(len(store)), np.diff(store.feature_offsets))
+    features, dense = np.unique(feature_of_part, return_inverse=True)
+    geometries[features] = shapely.multipolygons(polygons, indices=dense)
+    # Les contours TravelTime peuvent s'auto-intersecter : réparés avant les unions
+    # (méthode "structure" : le résultat reste polygonal)
+    invalid = np.zeros(len(store), dtype=bool)
+    invalid[features] = ~shapely.is_valid(geometries[features])
+    geometries[invalid] = shapely.make_valid(geometries[invalid], method='structure', keep_collapsed=False)
+    return geometries
+
+
+def areas_km2(geometries):
+    # Aire géodésique de chaque géométrie (polygones ou multipolygones, trous déduits)
+    geometries = np.asarray(geometries, dtype=object)
+    parts, geometry_of_part = shapely.get_parts(geometries, return_index=True)
+    polygonal = shapely.get_type_id(parts) == POLYGON
+    parts, geometry_of_part = parts[polygonal], geometry_of_part[polygonal]
+    rings, part_of_ring = shapely.get_rings(parts, return_index=True)
+    coords, ring_of_vertex = shapely.get_coordinates(rings, return_index=True)
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(ring_of_vertex, minlength=len(rings)))
+    areas = geodesic_areas(coords, offsets)
+    # get_rings renvoie l'extérieur de chaque polygone puis ses trous
+    exterior = np.ones(len(rings), dtype=bool)
+    exterior[1:] = part_of_ring[1:] != part_of_ring[:-1]
+    return np.bincount(geometry_of_part[part_of_ring], weights=np.where(exterior, areas, -areas),
+                       minlength=len(geometries))
+
+
+def overlap(station_geometries):
+    # Zone atteinte par au moins deux stations : intersections des seules paires
+    # proches (requête R-tree), puis union de ces intersections
+    if len(station_geometries) < 2:
+        return shapely.Polygon()
+    tree = shapely.STRtree(station_geometries)
+    left, right = tree.query(station_geometries, predicate='intersects')
+    pairs = left < right
+    if not pairs.any():
+        return shapely.Polygon()
+    return shapely.union_all(shapely.intersection(station_geometries[left[pairs]],
+                                                  station_geometries[right[pairs]]))
+
+
+def gaps(union):
+    # Trous de la zone couverte d'au moins MIN_GAP_KM2
+    holes = [shapely.Polygon(ring) for polygon in shapely.get_parts(union)
+             if shapely.get_type_id(polygon) == POLYGON for ring in polygon.interiors]
+    holes = np.array(holes, dtype=object)
+    return holes[areas_km2(holes) >= MIN_GAP_KM2] if len(holes) else holes
+
+
+def coverage_stats(station_geometries):
+    # (zone couverte, statistiques) pour les géométries d'un ensemble de stations
+    union = shapely.union_all(station_geometries)
+    holes = gaps(union)
+    covered, multiple = areas_km2([union, overlap(station_geometries)])
+    return union, {
+        'stations': len(station_geometries),
+        'aire_cumulee_km2': areas_km2(station_geometries).sum(),
+        'aire_couverte_km2': covered,
+        'recouvrement_km2': multiple,
+        'zones_blanches': len(holes),
+        'aire_zones_blanches_km2': areas_km2(holes).sum() if len(holes) else 0.0,
+    }
+
+
+def station_geometries(net, duration):
+    # {station: union de ses isochrones pour cette durée}
+    geometries = store_geometries(net.geometries(duration))
+    result = {}
+    for station, durations in net.feature_ids.items():
+        parts = [g for g in geometries[durations[duration]] if g is not None]
+        if parts:
+            result[station] = shapely.union_all(parts)
+    return result
+
+
+def analyse(net):
+    # Lignes du rapport et zones fusionnées {durée: [(territoire, géométrie, stats)]}
+    territoire_of = {
+        station: rattachement(station, territoire, station_type)[0]
+        for station, territoire, station_type in net.stations[['Nom_Station', 'Territoire', 'Type']]
+        .itertuples(index=False)
+    }
+    rows, layers = [], {}
+    for duration in net.durations:
+        with span(f'couverture {duration} min'):
+            by_station = station_geometries(net, duration)
+            by_territory = {}
+            for station, geometry in by_station.items():
+                by_territory.setdefault(territoire_of.get(station, ''), []).append(geometry)
+            by_territory[ALL_TERRITORIES] = list(by_station.values())
+            layers[duration] = []
+            for territoire in sorted(by_territory, key=lambda t: (t == ALL_TERRITORIES, t)):
+                union, stats = coverage_stats(np.array(by_territory[territoire], dtype=object))
+                rows.append({'territoire': territoire, 'duree': duration, **stats})
+                if territoire != ALL_TERRITORIES:
+                    layers[duration].append((territoire, union, stats))
+    return rows, layers
+
+
+def write_report(rows, filename=REPORT_FILE):
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Territoire', 'Duree', 'Stations', 'Aire_cumulee_km2', 'Aire_couverte_km2',
+                         'Recouvrement_km2', 'Part_recouvrement', 'Zones_blanches', 'Aire_zones_blanches_km2'])
+        for row in rows:
+            share = row['recouvrement_km2'] / row['aire_couverte_km2'] if row['aire_couverte_km2'] else 0
+            writer.writerow([row['territoire'], row['duree'], row['stations'],
+                             f"{row['aire_cumulee_km2']:.1f}", f"{row['aire_couverte_km2']:.1f}",
+                             f"{row['recouvrement_km2']:.1f}", f"{share:.1%}",
+                             row['zones_blanches'], f"{row['aire_zones_blanches_km2']:.1f}"])
+
+
+def write_layers(layers, colors=COLORS, tolerance=MAP_TOLERANCE):
+    # Une FeatureCollection par durée : une zone fusionnée (simplifiée) par territoire
+    for duration, zones in layers.items():
+        features = []
+        for territoire, union, stats in zones:
+            geometry = shapely.set_precision(shapely.simplify(union, tolerance), 1e-6)
+            features.append({
+                "type": "Feature",
+                "properties": {'territoire': territoire, 'duration': duration,
+                               'color': colors.get(territoire, '#999999'), 'stations': stats['stations'],
+                               'area_km2': round(stats['aire_couverte_km2'], 1),
+                               'overlap_km2': round(stats['recouvrement_km2'], 1)},
+                "geometry": json.loads(shapely.to_geojson(geometry))
+            })
+        with open(LAYER_FILE.format(duration), 'w') as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Couverture des isochrones par territoire et par durée")
+    parser.add_argument('--couches', action='store_true',
+                        help=f"écrire aussi les zones fusionnées ({LAYER_FILE.format('<durée>')})")
+    args = parser.parse_args()
+
+    print("🧮 Analyse de la couverture par territoire...")
+    net = Network.load()
+    rows, layers = analyse(net)
+    write_report(rows)
+
+    for row in rows:
+        if row['territoire'] == ALL_TERRITORIES:
+            print(f"   {row['duree']:>3} min : {row['aire_couverte_km2']:,.0f} km² couverts, "
+                  f"{row['recouvrement_km2']:,.0f} km² par plusieurs stations, "
+                  f"{row['zones_blanches']} zones blanches enclavées")
+    print(f"✅ Rapport : {REPORT_FILE}")
+
+    if args.couches:
+        write_layers(layers)
+        print(f"✅ Zones fusionnées : {', '.join(LAYER_FILE.format(d) for d in layers)}")
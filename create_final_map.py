@@ -1,19 +1,15 @@
-import pandas as pd
 import folium
-import json
+from network import Network
 
 # Lire les données
-df = pd.read_csv('all_stations_geocoded.csv', sep=';')
+net = Network.load()
+df = net.stations
 
 # Lire les isochrones
-with open('isochrones_30min.geojson', 'r') as f:
-    iso_30 = json.load(f)
-with open('isochrones_60min.geojson', 'r') as f:
-    iso_60 = json.load(f)
-with open('isochrones_90min.geojson', 'r') as f:
-    iso_90 = json.load(f)
-with open('isochrones_120min.geojson', 'r') as f:
-    iso_120 = json.load(f)
+iso_30 = net.isochrones('30')
+iso_60 = net.isochrones('60')
+iso_90 = net.isochrones('90')
+iso_120 = net.isochrones('120')
 
 print("📍 Création de la carte finale...")
 
@@ -41,7 +37,7 @@ OPACITIES = {
 m = folium.Map(location=[46.6, 2.5], zoom_start=6, tiles='cartodbpositron')
 
 # Fonction pour trouver le territoire d'une station
-station_territoire = dict(zip(df['Nom_Station'], df['Territoire']))
+station_territoire = net.station_territoire
 
 # Ajouter les isochrones 120 min (en dessous)
 for feature in iso_120['features']:
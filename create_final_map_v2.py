@@ -1,22 +1,24 @@
-import pandas as pd
+import argparse
+import json
+import os
 import folium
 from folium import FeatureGroup
 from folium.plugins import Search, Geocoder
-import json
-import math
-import re
 import branca
-
-# Fonction pour retirer les numéros de téléphone
-def remove_phone(text):
-    if pd.isna(text) or text == '0' or text == 'nan':
-        return ''
-    # Supprimer les numéros de téléphone (formats français)
-    text = str(text)
-    text = re.sub(r'\d{2}[-.\s]?\d{2}[-.\s]?\d{2}[-.\s]?\d{2}[-.\s]?\d{2}', '', text)
-    text = re.sub(r'\d{10}', '', text)
-    text = re.sub(r'\d{2}\s\d{2}\s\d{2}\s\d{2}\s\d{2}', '', text)
-    return text.strip()
+from collections import Counter
+from network import Network
+from simplification import MAP_TOLERANCE, station_report
+from tiles_export import write_tiles, loader_script
+from attribution import write_report, AMBIGUOUS, NEAREST, EXCLUDED, INVALID
+from instrumentation import span
+from territoires import COLORS, rattachement
+from commune_lookup import lookup_script, OUTPUT_FILE as COMMUNES_FILE
+from branca.element import MacroElement
+from jinja2 import Template
+from folium.utilities import JsCode
+from map_hover import RENDERER, renderer_script, hover_script
+from map_canvas import StationShape, shapes_script, SHAPE_RADIUS
+from map_popups import station_table, templates_script, bind_script
 
 # Fonction pour créer des styles avec survol
 def create_hover_style(base_color, duration):
@@ -47,84 +49,35 @@ def create_highlight_style(base_color, duration):
     }}
     """
 
-# Lire les données
-df = pd.read_csv('all_stations_geocoded.csv', sep=';')
-
-# Lire les isochrones
-with open('isochrones_30min.geojson', 'r') as f:
-    iso_30 = json.load(f)
-with open('isochrones_60min.geojson', 'r') as f:
-    iso_60 = json.load(f)
-with open('isochrones_90min.geojson', 'r') as f:
-    iso_90 = json.load(f)
-with open('isochrones_120min.geojson', 'r') as f:
-    iso_120 = json.load(f)
+# Script JavaScript rendu dans la carte après sa création (dans l'ordre d'ajout),
+# contrairement à m.get_root().script qui passe avant L.map(...)
+class MapScript(MacroElement):
+    _template = Template("{% macro script(this, kwargs) %}{{ this.js }}{% endmacro %}")
+
+    def __init__(self, js):
+        super().__init__()
+        self._name = 'MapScript'
+        self.js = js
+
+# --tuiles : les isochrones ne sont plus inclus dans le HTML mais écrits en tuiles
+# par niveau de zoom (dossier tuiles/), chargées à la demande par la carte
+parser = argparse.ArgumentParser(description="Crée carte_finale.html")
+parser.add_argument('--tuiles', action='store_true', help="Exporter les isochrones en tuiles par zoom")
+parser.add_argument('--couverture', action='store_true',
+                    help="Ajouter les zones fusionnées par territoire (couverture_*min.geojson, voir coverage.py)")
+parser.add_argument('--communes', action='store_true',
+                    help=f"Afficher les stations qui desservent la commune recherchée ({COMMUNES_FILE}, voir commune_coverage.py)")
+parser.add_argument('--canvas', action='store_true',
+                    help="Dessiner aussi les stations sur canvas (moins de nœuds DOM, voir map_canvas.py) ; "
+                         "isochrones et couverture restent survolables par le gestionnaire unique de map_hover.py")
+args = parser.parse_args()
+
+# Lire les données (stations + isochrones attribués, depuis l'instantané si à jour)
+net = Network.load()
+df = net.stations
 
 print("📍 Création de la carte avec contrôles par station...")
 
-COLORS = {
-    'Nord Est': '#e41a1c',
-    'Nord Ouest': '#377eb8',
-    'Centre': '#4daf4a',
-    'Est du Sud': '#984ea3',
-    'Sud Ouest': '#ff7f00',
-    'Sud Med': '#f0e130',
-    'Paris': '#a65628',
-    'RER': '#999999'
-}
-
-# Correspondance entre les anciens noms (dans le CSV) et les nouveaux noms
-TERRITOIRE_MAPPING = {
-    'Nord-Est': 'Nord Est',
-    'Nord-Ouest': 'Nord Ouest',
-    'Centre': 'Centre',
-    'Centre-Est': 'Est du Sud',
-    'Centre-Sud-Ouest': 'Sud Ouest',
-    'Sud-Med': 'Sud Med',
-    'Paris': 'Paris',
-    'RER': 'RER'
-}
-
-# Mapping des RER vers leur territoire de rattachement
-RER_TERRITOIRE_MAPPING = {
-    'RER EPINAL': 'Nord Est',
-    'RER TULLE': 'Centre',
-    'RER EVREUX': 'Nord Ouest',
-    'RER ANNECY': 'Est du Sud',
-    'RER ARRAS': 'Nord Est',
-    'RER BÉZIERS': 'Sud Med',
-    'RER TOULON': 'Sud Med',
-    'RER ANGOULÈME': 'Sud Ouest',
-    'RER MULHOUSE': 'Nord Est',
-    'RER ALÈS': 'Sud Med',
-    'RER VANNES': 'Nord Ouest',
-    'RER BOURGES': 'Centre',
-    'RER VESOUL': 'Est du Sud',
-    'RER AUBENAS': 'Est du Sud',
-    'RER CALAIS': 'Nord Est',
-    'RER COLMAR': 'Nord Est',
-    'RER LA ROCHE SUR YON': 'Nord Ouest',
-    'RER ARCACHON': 'Sud Ouest',
-    'RER SAINT-NAZAIRE': 'Nord Ouest',
-    'RER SAINT-BRIEUC': 'Nord Ouest',
-    'RER BREST': 'Nord Ouest',
-    'RER MENDE': 'Sud Med',
-    'RER LE HAVRE': 'Nord Ouest',
-    'RER DAX': 'Sud Ouest',
-    'RER MONTBÉLIARD': 'Nord Est',
-    'RER VALENCIENNES': 'Nord Est',
-    'RER BOURGOIN': 'Est du Sud',
-    'RER NIORT': 'Sud Ouest',
-    'RER SENS': 'Est du Sud'
-}
-
-# Mapping des Bureaux vers leur territoire de rattachement
-BUREAU_TERRITOIRE_MAPPING = {
-    'Bureau LYON': 'Est du Sud',
-    'Bureau MARSEILLE': 'Sud Med',
-    'Bureau AJACCIO': 'Sud Med'
-}
-
 STYLES = {
     '30':  {'fillOpacity': 0.35, 'weight': 2, 'dashArray': None},
     '60':  {'fillOpacity': 0.25, 'weight': 1.5, 'dashArray': '5, 5'},
@@ -139,104 +92,29 @@ DURATION_LABELS = {
     '120': '2h'
 }
 
-station_territoire = dict(zip(df['Nom_Station'], df['Territoire']))
-
-# Associer isochrones 30/60 aux stations
-def get_polygon_center(coords):
-    lons = [c[0] for c in coords]
-    lats = [c[1] for c in coords]
-    return sum(lats) / len(lats), sum(lons) / len(lons)
-
-def find_nearest_station(lat, lon, df):
-    min_dist = float('inf')
-    nearest = None
-    MAX_DISTANCE = 0.5  # Distance maximale en degrés (environ 50km)
-    
-    for idx, row in df.iterrows():
-        dist = math.sqrt((row['Latitude'] - lat)**2 + (row['Longitude'] - lon)**2)
-        if dist < min_dist and dist < MAX_DISTANCE:
-            min_dist = dist
-            nearest = row['Nom_Station']
-    
-    return nearest
-
-print("   Association des isochrones 30min aux stations...")
-excluded_30 = 0
-for i, feature in enumerate(iso_30['features']):
-    try:
-        geom = feature['geometry']
-        if geom['type'] == 'Polygon':
-            coords = geom['coordinates'][0]
-        elif geom['type'] == 'MultiPolygon':
-            coords = geom['coordinates'][0][0]
-        else:
-            print(f"   Type de géométrie non supporté: {geom['type']}")
-            continue
-        
-        center_lat, center_lon = get_polygon_center(coords)
-        station = find_nearest_station(center_lat, center_lon, df)
-        if station:
-            feature['properties']['station'] = station
-        else:
-            feature['properties']['station'] = 'EXCLUDE'
-            excluded_30 += 1
-    except Exception as e:
-        print(f"   Erreur avec feature {i}: {e}")
-        print(f"   Feature: {type(feature)}")
-        if isinstance(feature, dict):
-            print(f"   Keys: {feature.keys()}")
-        continue
-
-print("   Association des isochrones 60min aux stations...")
-excluded_60 = 0
-for feature in iso_60['features']:
-    geom = feature['geometry']
-    if geom['type'] == 'Polygon':
-        coords = geom['coordinates'][0]
-    elif geom['type'] == 'MultiPolygon':
-        coords = geom['coordinates'][0][0]
-    else:
-        print(f"   Type de géométrie non supporté: {geom['type']}")
-        continue
-    
-    center_lat, center_lon = get_polygon_center(coords)
-    station = find_nearest_station(center_lat, center_lon, df)
-    if station:
-        feature['properties']['station'] = station
-    else:
-        feature['properties']['station'] = 'EXCLUDE'
-        excluded_60 += 1
-
-if excluded_30 > 0 or excluded_60 > 0:
-    print(f"   ⚠️  {excluded_30} isochrones 30min et {excluded_60} isochrones 60min exclus (trop éloignés des stations)")
+station_territoire = net.station_territoire
 
-# Créer des dictionnaires d'isochrones par station
-iso_by_station = {}
-for station in df['Nom_Station'].tolist():
-    iso_by_station[station] = {'30': [], '60': [], '90': [], '120': []}
+# Isochrones 30/60 attribués par le Network : station contenue dans le polygone,
+# plus proche voisin seulement si ambigu ou si aucune station n'est dedans
+report_rows = net.attribution_report
+counts = Counter(row[2] for row in report_rows)
+if report_rows:
+    write_report(report_rows, 'rapport_attribution.csv')
+    print(f"   ⚠️  {counts[AMBIGUOUS]} ambiguës, {counts[NEAREST]} sans station à l'intérieur, "
+          f"{counts[EXCLUDED] + counts[INVALID]} exclues (détail : rapport_attribution.csv)")
 
-for feature in iso_30['features']:
-    station = feature['properties'].get('station', '')
-    if station in iso_by_station and station != 'EXCLUDE':
-        iso_by_station[station]['30'].append(feature)
-
-for feature in iso_60['features']:
-    station = feature['properties'].get('station', '')
-    if station in iso_by_station and station != 'EXCLUDE':
-        iso_by_station[station]['60'].append(feature)
-
-for feature in iso_90['features']:
-    station = feature['properties'].get('station', '')
-    if station in iso_by_station and station != 'EXCLUDE':
-        iso_by_station[station]['90'].append(feature)
-
-for feature in iso_120['features']:
-    station = feature['properties'].get('station', '')
-    if station in iso_by_station and station != 'EXCLUDE':
-        iso_by_station[station]['120'].append(feature)
+# Géométries simplifiées (Douglas-Peucker, tolérance ≈ demi-pixel au zoom 10)
+iso_by_station = net.by_station(MAP_TOLERANCE)
+savings = station_report(net, MAP_TOLERANCE, 'rapport_simplification_carte.csv')
+print(f"   ✂️  Simplification : {savings['vertices_before']} → {savings['vertices_after']} sommets, "
+      f"{savings['bytes_before'] / 1e6:.1f} → {savings['bytes_after'] / 1e6:.1f} Mo")
 
 # Créer la carte avec des contrôles par durée
-m = folium.Map(location=[46.6, 2.5], zoom_start=6, tiles=None)
+# --canvas : stations sur un canvas commun (map_canvas.py) et canvas par défaut
+# pour les autres couches vectorielles (prefer_canvas)
+m = folium.Map(location=[46.6, 2.5], zoom_start=6, tiles=None, prefer_canvas=args.canvas)
+if args.canvas:
+    MapScript(shapes_script()).add_to(m)
 
 # Ajouter le tile layer avec un nom personnalisé
 folium.TileLayer(
@@ -273,94 +151,61 @@ for duration in ['30', '60', '90', '120']:
 # Trier les stations par territoire puis par nom
 df_sorted = df.sort_values(['Territoire', 'Nom_Station'])
 
+# Une ligne par station (nom, territoire, couleur, contacts) : les isochrones et
+# les marqueurs n'en portent que l'indice, le HTML est construit dans le navigateur
+stations, station_ids = station_table(df_sorted)
+MapScript(templates_script(stations, DURATION_LABELS)).add_to(m)
+
 # Créer les isochrones avec interactivité
 station_data = {}  # Pour stocker les infos des stations
+layer_features = {}  # (type de station, durée) -> features
 
 for idx, row in df_sorted.iterrows():
     station = row['Nom_Station']
-    territoire_original = row['Territoire']
-    station_type = row['Type']
     
     # Déterminer le territoire de rattachement selon le type
-    if territoire_original == 'RER' or station_type == 'RER':
-        territoire = RER_TERRITOIRE_MAPPING.get(station, 'RER')
-        if territoire == 'RER':  # Si pas trouvé dans le mapping, garder RER
-            color = COLORS.get('RER', '#999999')
-        else:
-            color = COLORS.get(territoire, '#999999')
-    elif territoire_original == 'Bureau' or station_type == 'Bureau':
-        territoire = BUREAU_TERRITOIRE_MAPPING.get(station, 'Bureau')
-        color = COLORS.get(territoire, '#999999')
-    else:
-        territoire = TERRITOIRE_MAPPING.get(territoire_original, territoire_original)
-        color = COLORS.get(territoire, '#999999')
-    
-    short_name = station.replace('ici ', '').replace('RER ', '')
+    territoire, color, group = rattachement(station, row['Territoire'], row['Type'])
     
     # Stocker les données de la station
     station_data[station] = {
-        'name': short_name,
-        'territoire': territoire,
+        'index': station_ids[station],
         'color': color,
-        'lat': row['Latitude'],
-        'lon': row['Longitude']
+        'group': group
     }
     
-    # Ajouter les isochrones pour chaque durée
+    if args.tuiles:
+        continue  # Les isochrones sont écrits en tuiles plus bas
+    
+    # Regrouper les isochrones par (type de station, durée) : une seule couche
+    # GeoJSON par groupe, stylée à partir des propriétés de chaque feature
     for duration in ['120', '90', '60', '30']:
         for feature in iso_by_station[station][duration]:
-            # Ajouter les métadonnées à la feature
-            feature['properties']['station_name'] = station
-            feature['properties']['short_name'] = short_name
-            feature['properties']['territoire'] = territoire
-            feature['properties']['duration'] = duration
-            feature['properties']['duration_label'] = DURATION_LABELS[duration]
-            
-            # Créer le tooltip et popup
-            tooltip_text = f"{short_name} - {DURATION_LABELS[duration]}"
-            popup_html = f"""
-            <div style="width:200px; text-align:center;">
-                <h4 style="margin:5px 0; color:{color}">{short_name}</h4>
-                <p style="margin:5px 0;"><b>Territoire:</b> {territoire}</p>
-                <p style="margin:5px 0;"><b>Couverture:</b> {DURATION_LABELS[duration]}</p>
-                <hr style="margin:8px 0;">
-                <small><i>Cliquez sur la station pour plus d'infos</i></small>
-            </div>
-            """
+            # Indice de la station (tooltip et popup : map_popups.py), couleur et durée pour le style
+            feature['properties'] = {'station': station_ids[station], 'color': color, 'duration': duration}
             
-            # Ajouter à la carte avec interactivité et survol amélioré
-            geojson = folium.GeoJson(
-                feature,
-                style_function=lambda x, c=color, d=duration: {
-                    'fillColor': c,
-                    'color': '#000000',
-                    'weight': STYLES[d]['weight'],
-                    'fillOpacity': STYLES[d]['fillOpacity'],
-                    'dashArray': STYLES[d]['dashArray'],
-                    'interactive': True
-                },
-                highlight_function=lambda x, c=color, d=duration: {
-                    'fillColor': c,
-                    'color': '#FF4444',
-                    'weight': STYLES[d]['weight'] + 3,
-                    'fillOpacity': min(STYLES[d]['fillOpacity'] + 0.4, 0.9),
-                    'dashArray': None
-                },
-                tooltip=folium.Tooltip(
-                    tooltip_text, 
-                    sticky=True,
-                    style="background-color: white; color: black; font-family: arial; font-size: 12px; padding: 8px; border-radius: 5px; box-shadow: 0 2px 5px rgba(0,0,0,0.3);"
-                ),
-                popup=folium.Popup(popup_html, max_width=250)
-            )
-            
-            # Ajouter au groupe approprié selon le type de station
-            if territoire_original == 'RER' or station_type == 'RER':
-                geojson.add_to(rer_duration_groups[duration])
-            elif territoire_original == 'Bureau' or station_type == 'Bureau':
-                geojson.add_to(bureau_duration_groups[duration])
-            else:
-                geojson.add_to(ici_duration_groups[duration])
+            layer_features.setdefault((group, duration), []).append(feature)
+
+# Une couche par (type de station, durée), avec survol et clic identiques
+duration_groups = {'ici': ici_duration_groups, 'rer': rer_duration_groups, 'bureau': bureau_duration_groups}
+# Survol, tooltip et popup : pas d'interactivité par couche, un gestionnaire
+# unique sur la carte (map_hover.py) et un canvas partagé pour toutes les zones
+MapScript(renderer_script()).add_to(m)
+isochrone_layers = []
+for (group, duration), features in layer_features.items():
+    layer = folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        style_function=lambda x: {
+            'fillColor': x['properties']['color'],
+            'color': '#000000',
+            'weight': STYLES[x['properties']['duration']]['weight'],
+            'fillOpacity': STYLES[x['properties']['duration']]['fillOpacity'],
+            'dashArray': STYLES[x['properties']['duration']]['dashArray']
+        },
+        interactive=False,
+        renderer=JsCode(RENDERER)
+    )
+    layer.add_to(duration_groups[group][duration])
+    isochrone_layers.append(layer.get_name())
 
 # Ajouter tous les groupes à la carte
 for duration in ici_duration_groups:
@@ -368,8 +213,59 @@ for duration in ici_duration_groups:
     rer_duration_groups[duration].add_to(m)
     bureau_duration_groups[duration].add_to(m)
 
+MapScript(hover_script(m.get_name(), STYLES, isochrone_layers)).add_to(m)
+
+if args.tuiles:
+    def tile_properties(duration, properties):
+        data = station_data.get(properties.get('station'))
+        if data is None:
+            return None
+        return {
+            'station': data['index'],
+            'color': data['color'],
+            'group': data['group'],
+            'duration': duration
+        }
+
+    with span('export tuiles'):
+        tile_index, tile_bytes = write_tiles(net, tile_properties)
+    groups_by_key = {}
+    for duration in ici_duration_groups:
+        groups_by_key[f'ici_{duration}'] = ici_duration_groups[duration].get_name()
+        groups_by_key[f'rer_{duration}'] = rer_duration_groups[duration].get_name()
+        groups_by_key[f'bureau_{duration}'] = bureau_duration_groups[duration].get_name()
+    MapScript(loader_script(m.get_name(), groups_by_key, tile_index)).add_to(m)
+    n_tiles = sum(len(keys) for keys in tile_index.values())
+    print(f"   🧩 {n_tiles} tuiles écrites dans tuiles/ ({tile_bytes / 1e6:.1f} Mo)")
+
 print("   ✅ Isochrones interactifs ajoutés")
 
+if args.couverture:
+    # Zones couvertes par territoire, toutes stations fusionnées (contour seul, masquées par défaut)
+    # Tooltip par le gestionnaire unique de map_hover.py, comme les isochrones
+    for duration in ['30', '60', '90', '120']:
+        path = f'couverture_{duration}min.geojson'
+        if not os.path.exists(path):
+            print(f"   ⚠️  {path} absent (lancer coverage.py --couches)")
+            continue
+        with open(path, 'r') as f:
+            zones = json.load(f)
+        group = FeatureGroup(name=f'🧮 Couverture fusionnée - {DURATION_LABELS[duration]}', show=False)
+        layer = folium.GeoJson(
+            zones,
+            style_function=lambda x: {
+                'fillColor': x['properties']['color'],
+                'color': x['properties']['color'],
+                'weight': 3,
+                'fillOpacity': 0.1
+            },
+            interactive=False,
+            renderer=JsCode(RENDERER)
+        ).add_to(group)
+        group.add_to(m)
+        MapScript(f"window.survolIsochrones.add({layer.get_name()}, 'couverture');").add_to(m)
+    print("   ✅ Zones de couverture fusionnées ajoutées")
+
 # ============================================
 # AJOUTER LES STATIONS avec contrôles avancés
 # ============================================
@@ -389,85 +285,40 @@ for idx, row in df_sorted.iterrows():
     station_type = row['Type']
     
     # Déterminer le territoire de rattachement selon le type
-    if territoire_original == 'RER' or station_type == 'RER':
-        territoire = RER_TERRITOIRE_MAPPING.get(station, 'RER')
-        if territoire == 'RER':  # Si pas trouvé dans le mapping, garder RER
-            color = COLORS.get('RER', '#999999')
-        else:
-            color = COLORS.get(territoire, '#999999')
-    elif territoire_original == 'Bureau' or station_type == 'Bureau':
-        territoire = BUREAU_TERRITOIRE_MAPPING.get(station, 'Bureau')
-        color = COLORS.get(territoire, '#999999')
-    else:
-        territoire = TERRITOIRE_MAPPING.get(territoire_original, territoire_original)
-        color = COLORS.get(territoire, '#999999')
-    
-    short_name = station.replace('ici ', '').replace('RER ', '')
+    territoire, color, group = rattachement(station, territoire_original, station_type)
     
-    if station_type == 'ICI':
-        popup_html = f"""
-        <div style="width:280px">
-            <h4 style="margin:0 0 10px 0; color:{color}; text-align:center;">{row['Nom_Station']}</h4>
-            <div style="background:#f8f9fa; padding:10px; border-radius:5px; margin-bottom:10px;">
-                <b>🏢 Territoire:</b> {territoire}<br>
-                <b>📍 Couverture:</b> 30min à 2h de transport
-            </div>
-            <hr style="margin:10px 0">
-            <div style="font-size:13px;">
-                <b>👤 Directeur:</b> {remove_phone(row['Contact_Principal'])}<br>
-                <b>✏️ Réd. Chef:</b> {remove_phone(row['RedChef'])}<br>
-                <b>🔧 Réd. Chef Adj:</b> {remove_phone(row['RedChefAdj'])}<br>
-                <b>📺 Resp. Prog:</b> {remove_phone(row['RespProg'])}<br>
-                <b>⚙️ Resp. Tech:</b> {remove_phone(row['RespTech'])}
-            </div>
-            <hr style="margin:10px 0">
-            <div style="text-align:center; font-size:11px; color:#666;">
-                <i>💡 Survolez les zones colorées pour voir les isochrones</i>
-            </div>
-        </div>
-        """
-    elif station_type == 'RER':
-        popup_html = f"""
-        <div style="width:250px">
-            <h4 style="margin:0 0 10px 0; color:{color}; text-align:center;">{row['Nom_Station']}</h4>
-            <div style="background:#f8f9fa; padding:10px; border-radius:5px; margin-bottom:10px;">
-                <b>🏢 Territoire:</b> {territoire}<br>
-                <b>📻 Type:</b> RER (Radio locale)
-            </div>
-            <hr style="margin:10px 0">
-            <b>📞 Contact:</b> {remove_phone(row['Contact_Principal'])}
-            <hr style="margin:10px 0">
-            <div style="text-align:center; font-size:11px; color:#666;">
-                <i>💡 Survolez les zones colorées pour voir les isochrones</i>
-            </div>
-        </div>
-        """
-    else:  # Bureau
-        popup_html = f"""
-        <div style="width:250px">
-            <h4 style="margin:0 0 10px 0; color:{color}; text-align:center;">{row['Nom_Station']}</h4>
-            <div style="background:#f8f9fa; padding:10px; border-radius:5px; margin-bottom:10px;">
-                <b>🏢 Territoire:</b> {territoire}<br>
-                <b>🏢 Type:</b> Bureau
-            </div>
-            <hr style="margin:10px 0">
-            <b>📞 Contact:</b> {remove_phone(row['Contact_Principal'])}
-            <hr style="margin:10px 0">
-            <div style="text-align:center; font-size:11px; color:#666;">
-                <i>💡 Survolez les zones colorées pour voir les isochrones</i>
-            </div>
-        </div>
-        """
-    
-    if territoire_original == 'RER' or station_type == 'RER':
+    if args.canvas:
+        # Mêmes formes sur le canvas des stations : carré RER, losange Bureau, cercle ICI
+        if territoire_original == 'RER' or station_type == 'RER':
+            forme, radius, group = 'carre', SHAPE_RADIUS, rer_positions_group
+        elif territoire_original == 'Bureau' or station_type == 'Bureau':
+            forme, radius, group = 'losange', SHAPE_RADIUS, bureau_positions_group
+        else:
+            StationShape(
+                location=[row['Latitude'], row['Longitude']],
+                radius=12,
+                color='white',
+                fill=True,
+                fillColor='white',
+                fillOpacity=1,
+                weight=0
+            ).add_to(all_stations_group)
+            forme, radius, group = 'cercle', 10, all_stations_group
+        marker = StationShape(
+            location=[row['Latitude'], row['Longitude']],
+            forme=forme,
+            radius=radius,
+            color='white',
+            fill=True,
+            fillColor=color,
+            fillOpacity=0.9 if forme == 'cercle' else 1,
+            weight=3
+        )
+        marker.add_to(group)
+    elif territoire_original == 'RER' or station_type == 'RER':
         # Pour les RER : carré coloré selon le territoire avec contour blanc
-        folium.Marker(
+        marker = folium.Marker(
             location=[row['Latitude'], row['Longitude']],
-            popup=folium.Popup(popup_html, max_width=320),
-            tooltip=folium.Tooltip(
-                f"<b>{short_name}</b><br>{territoire}<br><i>Cliquez pour plus d'infos</i>",
-                sticky=True
-            ),
             icon=folium.DivIcon(
                 html=f'''
                 <div style="
@@ -482,16 +333,12 @@ for idx, row in df_sorted.iterrows():
                 icon_size=(22, 22),
                 icon_anchor=(11, 11)
             )
-        ).add_to(rer_positions_group)
+        )
+        marker.add_to(rer_positions_group)
     elif territoire_original == 'Bureau' or station_type == 'Bureau':
         # Pour les Bureaux : losange coloré avec contour blanc
-        folium.Marker(
+        marker = folium.Marker(
             location=[row['Latitude'], row['Longitude']],
-            popup=folium.Popup(popup_html, max_width=320),
-            tooltip=folium.Tooltip(
-                f"<b>{short_name}</b><br>{territoire}<br><i>Cliquez pour plus d'infos</i>",
-                sticky=True
-            ),
             icon=folium.DivIcon(
                 html=f'''
                 <div style="
@@ -506,7 +353,8 @@ for idx, row in df_sorted.iterrows():
                 icon_size=(22, 22),
                 icon_anchor=(11, 11)
             )
-        ).add_to(bureau_positions_group)
+        )
+        marker.add_to(bureau_positions_group)
     else:
         # Pour les stations ICI : contour blanc plus visible
         folium.CircleMarker(
@@ -523,11 +371,6 @@ for idx, row in df_sorted.iterrows():
         marker = folium.CircleMarker(
             location=[row['Latitude'], row['Longitude']],
             radius=10,
-            popup=folium.Popup(popup_html, max_width=320),
-            tooltip=folium.Tooltip(
-                f"<b>{short_name}</b><br>{territoire}<br><i>Cliquez pour plus d'infos</i>",
-                sticky=True
-            ),
             color='white',
             fill=True,
             fillColor=color,
@@ -535,12 +378,17 @@ for idx, row in df_sorted.iterrows():
             weight=3
         )
         marker.add_to(all_stations_group)
+    
+    # Popup et tooltip construits dans le navigateur à partir de la table des stations
+    marker.options['station'] = station_ids[station]
 
 # Ajouter les groupes de stations à la carte
 all_stations_group.add_to(m)
 rer_positions_group.add_to(m)
 bureau_positions_group.add_to(m)
 bureau_positions_group.add_to(m)
+MapScript(bind_script([all_stations_group.get_name(), rer_positions_group.get_name(),
+                       bureau_positions_group.get_name()])).add_to(m)
 
 print("   ✅ Stations interactives ajoutées (sans numéros)")
 
@@ -548,6 +396,13 @@ print("   ✅ Stations interactives ajoutées (sans numéros)")
 # AJOUTER LE MOTEUR DE RECHERCHE
 # ============================================
 
+# Stations qui desservent la commune trouvée : table précalculée, chargée à la première
+# recherche (avant le Geocoder : le script s'accroche aux contrôles créés ensuite)
+if args.communes:
+    if not os.path.exists(COMMUNES_FILE):
+        print(f"   ⚠️  {COMMUNES_FILE} absent (lancer commune_coverage.py) : la carte le chargera s'il est ajouté")
+    MapScript(lookup_script(m.get_name(), DURATION_LABELS)).add_to(m)
+
 # Ajouter le géocodeur pour rechercher des lieux
 geocoder = Geocoder(
     collapsed=False,
@@ -919,7 +774,8 @@ m.get_root().html.add_child(folium.Element(search_banner_html))
 m.get_root().html.add_child(folium.Element(legend_html))
 m.get_root().html.add_child(folium.Element(custom_css))
 
-m.save('carte_finale.html')
+with span('rendu folium'):
+    m.save('carte_finale.html')
 print(f"\n✅ Carte interactive sauvegardée : carte_finale.html")
 print(f"🎛️  {len(COLORS) * 4 + len(COLORS) + 1} couches organisées par territoire")
 print(f"📍  {len(df)} stations interactives")
@@ -1,16 +1,13 @@
-import pandas as pd
 import folium
-import json
+from network import Network
 
 # Lire les données
-df = pd.read_csv('all_stations_geocoded.csv', sep=';')
+net = Network.load()
+df = net.stations
 
 # Lire les isochrones
-with open('isochrones_90min.geojson', 'r') as f:
-    iso_90 = json.load(f)
-
-with open('isochrones_120min.geojson', 'r') as f:
-    iso_120 = json.load(f)
+iso_90 = net.isochrones('90')
+iso_120 = net.isochrones('120')
 
 print("📍 Création de la carte de test...")
 
@@ -1,37 +1,27 @@
-import re
+from collections import Counter
+from leaflet_html import read_layers, polygon_rings
 
-# Ouvrir le fichier HTML
-with open('ReseauICI.html', 'r', encoding='utf-8') as f:
-    html_content = f.read()
+# Lire les couches Leaflet du HTML original
+layers = read_layers('ReseauICI.html')
 
 print("🔍 Analyse de la structure des polygones...")
 
-# Trouver un exemple de polygone
-polygon_pattern = r'L\.polygon\(\s*(\[\[[\d\.\-,\s\[\]]+\]\])'
-matches = re.findall(polygon_pattern, html_content)
+print(f"\n📊 Couches trouvées : {dict(Counter(layer['kind'] for layer in layers))}")
 
-if matches:
-    print(f"\n📍 Nombre de polygones trouvés : {len(matches)}")
-    print(f"\n📋 Exemple du premier polygone (500 premiers caractères) :")
-    print(matches[0][:500])
-    print("...")
-    
-    # Voir la structure
-    print(f"\n📋 Structure complète du premier polygone :")
-    first_polygon = matches[0]
-    
-    # Compter les niveaux de crochets
-    print(f"   Longueur : {len(first_polygon)} caractères")
-    print(f"   Commence par : {first_polygon[:50]}")
-    print(f"   Finit par : {first_polygon[-50:]}")
+polygons = [layer for layer in layers if layer['kind'] == 'polygon']
+
+if polygons:
+    print(f"\n📍 Nombre de polygones trouvés : {len(polygons)}")
+
+    # Voir la structure du premier polygone
+    first_polygon = polygons[0]
+    rings = polygon_rings(first_polygon['coords'])
+    print(f"\n📋 Structure complète du premier polygone (polygon_{first_polygon['id']}) :")
+    print(f"   Anneaux : {len(rings)} (sommets : {', '.join(str(len(r)) for r in rings)})")
+    print(f"   Commence par : {first_polygon['coords'][:2]}")
+    print(f"   Options : {first_polygon['options']}")
+
+    colors = Counter(p['options'].get('fillColor') for p in polygons)
+    print(f"\n🎨 Couleurs de remplissage : {dict(colors)}")
 else:
-    print("❌ Aucun polygone trouvé avec ce pattern")
-    
-    # Essayer un pattern plus large
-    print("\n🔍 Recherche avec pattern élargi...")
-    alt_pattern = r'L\.polygon\(([^\)]{100,500})'
-    alt_matches = re.findall(alt_pattern, html_content)
-    
-    if alt_matches:
-        print(f"   Trouvé {len(alt_matches)} correspondances")
-        print(f"   Exemple : {alt_matches[0][:200]}")
\ No newline at end of file
+    print("❌ Aucun polygone trouvé")
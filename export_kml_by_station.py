@@ -1,23 +1,20 @@
-import pandas as pd
-import json
-import math
-import simplekml
+import argparse
 import os
-
-# Créer un dossier pour les KML
-os.makedirs('kml_stations', exist_ok=True)
-
-# Lire les données
-df = pd.read_csv('all_stations_geocoded.csv', sep=';')
-
-with open('isochrones_30min.geojson', 'r') as f:
-    iso_30 = json.load(f)
-with open('isochrones_60min.geojson', 'r') as f:
-    iso_60 = json.load(f)
-with open('isochrones_90min.geojson', 'r') as f:
-    iso_90 = json.load(f)
-with open('isochrones_120min.geojson', 'r') as f:
-    iso_120 = json.load(f)
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from kml_writer import KmlWriter
+from network import Network
+from instrumentation import span
+from simplification import KML_TOLERANCE, station_report
+
+# Export d'un fichier KML (ou KMZ) par station, en parallèle sur plusieurs processus.
+# Chaque document déclare ses styles une seule fois (point + un style par durée) ;
+# les polygones y font référence au lieu de porter chacun leur propre <Style>.
+# Les processus relisent l'instantané du réseau en mmap, simplification comprise,
+# et écrivent en flux (kml_writer) sans construire d'arbre en mémoire.
+
+KML_DIR = 'kml_stations'
+NETWORK_KMZ = os.path.join(KML_DIR, 'reseau_complet.kmz')
 
 COLORS = {
     'Nord-Est': 'ff1a1ae4',
@@ -30,99 +27,111 @@ COLORS = {
     'RER': 'ff999999'
 }
 
-station_territoire = dict(zip(df['Nom_Station'], df['Territoire']))
-
-# Associer isochrones aux stations
-def get_polygon_center(coords):
-    lons = [c[0] for c in coords]
-    lats = [c[1] for c in coords]
-    return sum(lats) / len(lats), sum(lons) / len(lons)
-
-def find_nearest_station(lat, lon, df):
-    min_dist = float('inf')
-    nearest = None
-    for idx, row in df.iterrows():
-        dist = math.sqrt((row['Latitude'] - lat)**2 + (row['Longitude'] - lon)**2)
-        if dist < min_dist:
-            min_dist = dist
-            nearest = row['Nom_Station']
-    return nearest
-
-print("📍 Association des isochrones aux stations...")
-for feature in iso_30['features']:
-    if 'station' not in feature['properties']:
-        coords = feature['geometry']['coordinates'][0]
-        center_lat, center_lon = get_polygon_center(coords)
-        feature['properties']['station'] = find_nearest_station(center_lat, center_lon, df)
-
-for feature in iso_60['features']:
-    if 'station' not in feature['properties']:
-        coords = feature['geometry']['coordinates'][0]
-        center_lat, center_lon = get_polygon_center(coords)
-        feature['properties']['station'] = find_nearest_station(center_lat, center_lon, df)
-
-# Créer un dictionnaire d'isochrones par station
-iso_by_station = {}
-for station in df['Nom_Station'].tolist():
-    iso_by_station[station] = {'30': [], '60': [], '90': [], '120': []}
-
-for feature in iso_30['features']:
-    station = feature['properties'].get('station', '')
-    if station in iso_by_station:
-        iso_by_station[station]['30'].append(feature)
-
-for feature in iso_60['features']:
-    station = feature['properties'].get('station', '')
-    if station in iso_by_station:
-        iso_by_station[station]['60'].append(feature)
-
-for feature in iso_90['features']:
-    station = feature['properties'].get('station', '')
-    if station in iso_by_station:
-        iso_by_station[station]['90'].append(feature)
-
-for feature in iso_120['features']:
-    station = feature['properties'].get('station', '')
-    if station in iso_by_station:
-        iso_by_station[station]['120'].append(feature)
-
-# Créer un KML par station
-print("\n📁 Export des fichiers KML...")
-
-for idx, row in df.iterrows():
-    station = row['Nom_Station']
-    territoire = row['Territoire']
+# Durée, opacité (aa de aabbggrr) : du plus grand au plus petit pour l'empilement
+LEVELS = [('120', '40'), ('90', '60'), ('60', '80'), ('30', 'AA')]
+
+_net = None
+
+
+def _init_worker():
+    global _net
+    _net = Network.load()
+
+
+def safe_filename(station):
+    return station.replace(' ', '_').replace('/', '_').replace('*', '').replace("'", '')
+
+
+def write_styles(kml, territoire, prefix=''):
+    # Styles partagés d'un territoire : point + un style par durée ; renvoie leurs identifiants
     color = COLORS.get(territoire, 'ff999999')
-    
-    kml = simplekml.Kml()
-    
-    # Ajouter le point de la station
-    pnt = kml.newpoint(name=station)
-    pnt.coords = [(row['Longitude'], row['Latitude'])]
-    pnt.description = f"Territoire: {territoire}"
-    pnt.style.iconstyle.color = color
-    pnt.style.iconstyle.scale = 1.2
-    
-    # Ajouter les 4 niveaux d'isochrones
-    for level, opacity in [('120', '40'), ('90', '60'), ('60', '80'), ('30', 'AA')]:
-        folder = kml.newfolder(name=f"Isochrone {level}min" if level != '120' else "Isochrone 2h")
-        
-        for feature in iso_by_station[station][level]:
-            coords = feature['geometry']['coordinates'][0]
-            # Simplifier le polygone
-            coords_simplified = coords[::3]
-            
-            if len(coords_simplified) > 3:
-                pol = folder.newpolygon(name=f"{level} min")
-                pol.outerboundaryis = [(c[0], c[1]) for c in coords_simplified]
-                pol.style.polystyle.color = opacity + color[2:]
-                pol.style.linestyle.color = 'ff000000'
-                pol.style.linestyle.width = 1
-    
-    # Nettoyer le nom du fichier
-    safe_name = station.replace(' ', '_').replace('/', '_').replace('*', '').replace("'", '')
-    filename = f"kml_stations/{safe_name}.kml"
-    kml.save(filename)
-    print(f"   ✅ {filename}")
-
-print(f"\n✅ {len(df)} fichiers KML exportés dans le dossier 'kml_stations/'")
\ No newline at end of file
+    ids = {'station': f'{prefix}station'}
+    kml.style(ids['station'], icon_color=color, icon_scale=1.2)
+    for level, opacity in LEVELS:
+        ids[level] = f'{prefix}iso{level}'
+        kml.style(ids[level], poly_color=opacity + color[2:], line_color='ff000000', line_width=1)
+    return ids
+
+
+def write_station(kml, station, territoire, lon, lat, styles):
+    # Point de la station puis les 4 niveaux d'isochrones
+    kml.point(station, lon, lat, styles['station'], description=f"Territoire: {territoire}")
+    for level, _ in LEVELS:
+        with kml.folder(f"Isochrone {level}min" if level != '120' else "Isochrone 2h"):
+            store = _net.simplified(level, KML_TOLERANCE)
+            for i in _net.feature_ids[station][level]:
+                ring = store.outer_ring(i)
+                if ring is not None and len(ring) > 3:
+                    kml.polygon(f"{level} min", ring, styles[level])
+
+
+def export_station(station, territoire, lon, lat, kmz=False):
+    filename = os.path.join(KML_DIR, safe_filename(station) + ('.kmz' if kmz else '.kml'))
+    with KmlWriter(filename, name=station) as kml:
+        write_station(kml, station, territoire, lon, lat, write_styles(kml, territoire))
+    return filename, os.path.getsize(filename)
+
+
+def export_network(filename):
+    # Un seul KMZ pour tout le réseau : un dossier par territoire, puis par station
+    df = _net.stations
+    with KmlWriter(filename, name="Réseau ici - isochrones") as kml:
+        territoires = sorted(df['Territoire'].dropna().unique())
+        styles = {t: write_styles(kml, t, prefix=f't{k}_') for k, t in enumerate(territoires)}
+        for territoire in territoires:
+            with kml.folder(territoire):
+                stations = df[df['Territoire'] == territoire]
+                for station, lon, lat in stations[['Nom_Station', 'Longitude', 'Latitude']].itertuples(index=False):
+                    with kml.folder(station):
+                        write_station(kml, station, territoire, lon, lat, styles[territoire])
+    return filename, os.path.getsize(filename)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export KML des isochrones, un fichier par station")
+    parser.add_argument('--kmz', action='store_true', help="écrire des .kmz compressés au lieu de .kml")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="nombre de processus (défaut : nombre de cœurs)")
+    parser.add_argument('--reseau', action='store_true',
+                        help=f"écrire aussi un KMZ unique de tout le réseau ({NETWORK_KMZ})")
+    args = parser.parse_args()
+
+    # Créer un dossier pour les KML
+    os.makedirs(KML_DIR, exist_ok=True)
+
+    # Lire les données (stations + isochrones attribués, depuis l'instantané si à jour)
+    net = Network.load()
+    df = net.stations
+
+    ambiguous = Counter(row[0] for row in net.attribution_report)
+    for duration, count in ambiguous.items():
+        print(f"   ⚠️  {duration} min : {count} isochrones attribuées par repli (pas de station unique à l'intérieur)")
+
+    # Simplification partagée avec la carte (Douglas-Peucker, anneaux valides et fermés)
+    savings = station_report(net, KML_TOLERANCE, 'rapport_simplification_kml.csv')
+    print(f"✂️  Simplification : {savings['vertices_before']} → {savings['vertices_after']} sommets, "
+          f"{savings['bytes_before'] / 1e6:.1f} → {savings['bytes_after'] / 1e6:.1f} Mo "
+          f"(détail par station : rapport_simplification_kml.csv)")
+    for level, _ in LEVELS:
+        net.save_simplified(level, KML_TOLERANCE)
+
+    # Créer un fichier par station
+    print(f"\n📁 Export des fichiers {'KMZ' if args.kmz else 'KML'}...")
+
+    rows = df[['Nom_Station', 'Territoire', 'Longitude', 'Latitude']].itertuples(index=False)
+    stations, territoires, lons, lats = zip(*rows)
+    total_bytes = 0
+    with span('export KML'), ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        network_export = pool.submit(export_network, NETWORK_KMZ) if args.reseau else None
+        for filename, size in pool.map(export_station, stations, territoires, lons, lats,
+                                       [args.kmz] * len(stations), chunksize=8):
+            total_bytes += size
+            print(f"   ✅ {filename}")
+        if network_export is not None:
+            network_export.result()
+
+    print(f"\n✅ {len(df)} fichiers {'KMZ' if args.kmz else 'KML'} exportés dans le dossier '{KML_DIR}/' "
+          f"({total_bytes / 1e6:.1f} Mo)")
+    if network_export is not None:
+        filename, size = network_export.result()
+        print(f"🗺️  Réseau complet : {filename} ({size / 1e6:.1f} Mo)")
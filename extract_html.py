@@ -1,38 +1,28 @@
-from bs4 import BeautifulSoup
-import re
 import json
+from leaflet_html import read_layers
 
-# Ouvrir le fichier HTML
-with open('ReseauICI.html', 'r', encoding='utf-8') as f:
-    html_content = f.read()
-
-# Parser avec BeautifulSoup
-soup = BeautifulSoup(html_content, 'html.parser')
-
-# Extraire le JavaScript qui contient toutes les données
-scripts = soup.find_all('script')
-js_content = scripts[-1].string if scripts else ""
+# Lire les couches Leaflet du HTML original (un seul passage sur le fichier)
+layers = read_layers('ReseauICI.html')
 
 # Extraire tous les markers (points sur la carte)
-marker_pattern = r'L\.marker\(\s*\[([0-9.]+),\s*([0-9.-]+)\]'
-markers = re.findall(marker_pattern, js_content)
+markers = [layer for layer in layers if layer['kind'] == 'marker']
 
 print(f"\n🎯 NOMBRE DE POINTS TROUVÉS : {len(markers)}")
 print("\n📍 Premiers points (lat, lon) :")
-for i, (lat, lon) in enumerate(markers[:5]):
+for i, marker in enumerate(markers[:5]):
+    lat, lon = marker['coords'][:2]
     print(f"  Point {i+1}: {lat}, {lon}")
 
-# Extraire tous les polygones (isochrones)
-polygon_pattern = r'L\.polygon\(\s*(\[\[.*?\]\])'
-polygon_matches = re.findall(polygon_pattern, js_content, re.DOTALL)
+# Polygones (isochrones)
+polygons = [layer for layer in layers if layer['kind'] == 'polygon']
 
-print(f"\n🔷 NOMBRE DE POLYGONES TROUVÉS : {len(polygon_matches)}")
+print(f"\n🔷 NOMBRE DE POLYGONES TROUVÉS : {len(polygons)}")
 
 # Sauvegarder les markers dans un fichier
 with open('markers_extracted.json', 'w') as f:
-    json.dump([{"lat": float(lat), "lon": float(lon)} for lat, lon in markers], f, indent=2)
+    json.dump([{"lat": float(m['coords'][0]), "lon": float(m['coords'][1])} for m in markers], f, indent=2)
 
 print("\n✅ Données extraites et sauvegardées dans 'markers_extracted.json'")
 print(f"\n📊 RÉSUMÉ:")
 print(f"   - {len(markers)} points (stations)")
-print(f"   - {len(polygon_matches)} polygones (isochrones)")
\ No newline at end of file
+print(f"   - {len(polygons)} polygones (isochrones)")
@@ -1,65 +1,54 @@
-import re
 import json
+from leaflet_html import read_layers, polygon_rings, marker_positions, classify_nested
+from geometry_kernels import pack_rings, planar_areas
 
-# Ouvrir le fichier HTML
-with open('ReseauICI.html', 'r', encoding='utf-8') as f:
-    html_content = f.read()
-
+# Lire les couches Leaflet du HTML original (un seul passage sur le fichier)
 print("🔍 Extraction des isochrones du HTML original...")
+layers = read_layers('ReseauICI.html')
+polygons = [layer for layer in layers if layer['kind'] == 'polygon']
+stations = marker_positions(layers)
 
-# Trouver tous les polygones avec leur couleur
-pattern = r'var polygon_([a-f0-9]+) = L\.polygon\(\s*(\[\[[\d\.\-,\s\[\]]+\]\])[^}]+?"fillColor":\s*"([^"]+)"'
-matches = re.findall(pattern, html_content, re.DOTALL)
-
-print(f"   Polygones trouvés : {len(matches)}")
+print(f"   Polygones trouvés : {len(polygons)}, marqueurs de stations : {len(stations)}")
 
-# Parser tous les polygones
+# Construire les features
 all_features = []
 
-for polygon_id, coords_str, color in matches:
-    try:
-        coords = json.loads(coords_str)
-        geojson_coords = [[point[1], point[0]] for point in coords]
-        
-        # Calculer l'aire
-        n = len(geojson_coords)
-        area = 0
-        for i in range(n - 1):
-            area += geojson_coords[i][0] * geojson_coords[i+1][1]
-            area -= geojson_coords[i+1][0] * geojson_coords[i][1]
-        area = abs(area) / 2
-        
-        feature = {
-            "type": "Feature",
-            "properties": {
-                "id": polygon_id,
-                "color": color,
-                "area": area
-            },
-            "geometry": {
-                "type": "Polygon",
-                "coordinates": [geojson_coords]
-            }
+for polygon in polygons:
+    rings = polygon_rings(polygon['coords'])
+    if not rings or len(rings[0]) < 4:
+        print(f"   ⚠️ Polygone {polygon['id']} ignoré (moins de 3 sommets)")
+        continue
+    feature = {
+        "type": "Feature",
+        "properties": {
+            "id": polygon['id'],
+            "color": polygon['options'].get('fillColor', polygon['options'].get('color')),
+            "area": None
+        },
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": rings
         }
-        all_features.append(feature)
-        
-    except Exception as e:
-        print(f"   ⚠️ Erreur polygone {polygon_id}: {e}")
+    }
+    all_features.append(feature)
 
-print(f"   Polygones parsés : {len(all_features)}")
+# Aires (degrés², comme avant) de tous les anneaux extérieurs en un seul calcul
+areas = planar_areas(*pack_rings([f['geometry']['coordinates'][0] for f in all_features]))
+for f, area in zip(all_features, areas.tolist()):
+    f['properties']['area'] = area
 
-# Séparer par aire : petits = 30min, grands = 60min
-# Seuil basé sur les aires moyennes observées : ~0.15 vs ~0.75
-areas = [f['properties']['area'] for f in all_features]
-threshold = sum(areas) / len(areas)  # Moyenne comme seuil
+print(f"   Polygones parsés : {len(all_features)}")
 
-print(f"   Seuil d'aire : {threshold:.4f}")
+# Séparer par station : le 30 min d'une station est le plus petit de ses deux polygones
+labels, n_isolated = classify_nested([f['geometry']['coordinates'][0] for f in all_features], stations)
+if n_isolated:
+    print(f"   ⚠️ {n_isolated} polygones sans emboîtement, classés d'après leur aire")
 
 features_30min = []
 features_60min = []
 
-for f in all_features:
-    if f['properties']['area'] < threshold:
+for f, label in zip(all_features, labels):
+    if label == 'inner':
         f['properties']['time'] = '30 min'
         features_30min.append(f)
     else:
@@ -79,4 +68,4 @@ with open('isochrones_60min.geojson', 'w') as f:
 
 print("\n✅ Fichiers sauvegardés :")
 print("   - isochrones_30min.geojson")
-print("   - isochrones_60min.geojson")
\ No newline at end of file
+print("   - isochrones_60min.geojson")
@@ -1,7 +1,12 @@
 import pandas as pd
-import requests
+import argparse
 import json
+import os
 import time
+from traveltime_client import make_search, fetch_time_maps
+from isochrone_cache import IsochroneCache, key_for_search
+from instrumentation import span
+from local_isochrones import compute_isochrones
 
 # ⚠️ REMPLACE PAR TES IDENTIFIANTS
 APP_ID = 'f2e68f22'
@@ -14,97 +19,141 @@ headers = {
     'X-Api-Key': API_KEY
 }
 
-# Lire les stations
-df = pd.read_csv('all_stations_geocoded.csv', sep=';')
+# Mode incrémental : seules les recherches absentes ou périmées du cache
+# sont envoyées à l'API. Exemples :
+#   python generate_isochrones_traveltime.py                      # 90 et 120 min, toutes stations
+#   python generate_isochrones_traveltime.py --stations "RER SENS" --durees 30 60
+#   python generate_isochrones_traveltime.py --stations "ici Paris " --refresh
+#   python generate_isochrones_traveltime.py --moteur local --graphe france.osm --durees 30 60 90 120
 
-print("🚗 GÉNÉRATION DES ISOCHRONES 1h30 et 2h (TravelTime API)")
-print("=" * 60)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Génère les isochrones via TravelTime (incrémental)")
+    parser.add_argument('--durees', type=int, nargs='+', default=[90, 120], help="Durées en minutes")
+    parser.add_argument('--stations', nargs='+', help="Limiter aux stations indiquées")
+    parser.add_argument('--refresh', action='store_true', help="Ignorer le cache pour les stations sélectionnées")
+    parser.add_argument('--dry-run', action='store_true', help="Afficher le diff sans appeler l'API")
+    parser.add_argument('--moteur', choices=['traveltime', 'local'], default='traveltime',
+                        help="traveltime (API, cache SQLite) ou local (graphe OSM, hors ligne, sans quota)")
+    parser.add_argument('--graphe', help="Extrait OSM (.osm) ou graphe en cache (.graph.npz) pour --moteur local")
+    parser.add_argument('--workers', type=int, default=None, help="Processus pour --moteur local (défaut : tous les cœurs)")
+    args = parser.parse_args()
+    if args.moteur == 'local' and not args.graphe:
+        parser.error("--moteur local demande --graphe FICHIER.osm")
 
-features_90min = []
-features_120min = []
+    # Lire les stations
+    df = pd.read_csv('all_stations_geocoded.csv', sep=';')
+    df = df.dropna(subset=['Latitude', 'Longitude']).drop_duplicates('Nom_Station')
+    if args.stations:
+        unknown = set(args.stations) - set(df['Nom_Station'])
+        if unknown:
+            print(f"⚠️  Stations inconnues ignorées : {', '.join(sorted(unknown))}")
+        df = df[df['Nom_Station'].isin(args.stations)]
+    if df.empty:
+        print("🧮 Aucune station sélectionnée, rien à calculer")
+        raise SystemExit(0)
 
-for idx, row in df.iterrows():
-    station = row['Nom_Station']
-    lat = row['Latitude']
-    lon = row['Longitude']
-    
-    print(f"{idx+1}/{len(df)} - {station}...")
-    
-    # Requête pour 90 min (5400 sec) et 120 min (7200 sec)
-    for minutes, seconds in [(90, 5400), (120, 7200)]:
-        try:
-            payload = {
-                "departure_searches": [
-                    {
-                        "id": f"{station}_{minutes}min",
-                        "coords": {"lat": lat, "lng": lon},
-                        "departure_time": "2024-01-15T08:00:00Z",
-                        "travel_time": seconds,
-                        "transportation": {"type": "driving"}
-                    }
-                ]
-            }
-            
-            response = requests.post(
-                'https://api.traveltimeapp.com/v4/time-map',
-                headers=headers,
-                json=payload
+    labels = ' / '.join(f"{m} min" for m in args.durees)
+    engine = "TravelTime API" if args.moteur == 'traveltime' else f"moteur local, {args.graphe}"
+    print(f"🚗 GÉNÉRATION DES ISOCHRONES {labels} ({engine})")
+    print("=" * 60)
+
+    # Préparer toutes les recherches (station × durée)
+    searches = []
+    search_meta = {}
+    for idx, row in df.iterrows():
+        station = row['Nom_Station']
+        for minutes in args.durees:
+            search_id = f"{station}_{minutes}min"
+            searches.append(make_search(search_id, row['Latitude'], row['Longitude'], minutes * 60))
+            search_meta[search_id] = (station, minutes)
+
+    if args.moteur == 'local':
+        # Hors ligne : tout est recalculé (pas de quota). Une seule exploration du
+        # graphe par station, contourée à chaque durée : isochrones emboîtées.
+        if args.dry_run:
+            print(f"🧮 {len(searches)} isochrones à calculer ({len(df)} stations)")
+            raise SystemExit(0)
+        start = time.time()
+        seconds = [m * 60 for m in args.durees]
+        with span('isochrones locales'):
+            computed = compute_isochrones(
+                args.graphe,
+                [(row['Nom_Station'], row['Latitude'], row['Longitude'], seconds) for _, row in df.iterrows()],
+                max_workers=args.workers
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Extraire les coordonnées du polygone
-                if data.get('results') and len(data['results']) > 0:
-                    shapes = data['results'][0].get('shapes', [])
-                    
-                    for shape in shapes:
-                        shell = shape.get('shell', [])
-                        if shell:
-                            # Convertir en format GeoJSON [lon, lat]
-                            coords = [[point['lng'], point['lat']] for point in shell]
-                            coords.append(coords[0])  # Fermer le polygone
-                            
-                            feature = {
-                                "type": "Feature",
-                                "properties": {
-                                    "station": station,
-                                    "time": f"{minutes} min"
-                                },
-                                "geometry": {
-                                    "type": "Polygon",
-                                    "coordinates": [coords]
-                                }
-                            }
-                            
-                            if minutes == 90:
-                                features_90min.append(feature)
-                            else:
-                                features_120min.append(feature)
-                    
-                    print(f"         ✅ {minutes} min OK")
-                else:
-                    print(f"         ⚠️ {minutes} min - Pas de résultat")
+        results, errors = {}, {}
+        for search in searches:
+            station, minutes = search_meta[search['id']]
+            polygons = computed[station][minutes * 60]
+            if polygons:
+                results[search['id']] = polygons
             else:
-                print(f"         ❌ {minutes} min - Erreur {response.status_code}: {response.text[:80]}")
-        
-        except Exception as e:
-            print(f"         ❌ {minutes} min - Erreur: {str(e)[:60]}")
-        
-        # Pause pour respecter les limites
-        time.sleep(0.5)
+                errors[search['id']] = "hors du graphe routier"
+        print(f"🧮 {len(searches)} isochrones calculées pour {len(df)} stations en {time.time() - start:.1f}s")
+    else:
+        # Diff avec le cache
+        cache = IsochroneCache()
+        force_ids = {s['id'] for s in searches} if args.refresh else set()
+        results, missing = cache.diff(searches, force_ids)
+        print(f"💾 {len(results)} isochrones en cache, {len(missing)} à récupérer")
+        for search in missing:
+            print(f"   ➕ {search['id']}")
+
+        if args.dry_run:
+            cache.close()
+            raise SystemExit(0)
 
-print("\n" + "=" * 60)
-print(f"✅ Isochrones 90 min : {len(features_90min)}")
-print(f"✅ Isochrones 120 min : {len(features_120min)}")
+        errors = {}
+        if missing:
+            start = time.time()
+            with span('fetch isochrones'):
+                fetched, errors, n_requests = fetch_time_maps(missing, headers)
+            print(f"📡 {len(missing)} recherches envoyées en {n_requests} requêtes ({time.time() - start:.1f}s)")
+            searches_by_id = {s['id']: s for s in missing}
+            for search_id, polygons in fetched.items():
+                search = searches_by_id[search_id]
+                cache.put(key_for_search(search), search_meta[search_id][0], search['travel_time'], polygons)
+            cache.commit()
+            results.update(fetched)
+        cache.close()
 
-# Sauvegarder en GeoJSON
-with open('isochrones_90min.geojson', 'w') as f:
-    json.dump({"type": "FeatureCollection", "features": features_90min}, f)
+    for search_id, message in errors.items():
+        station, minutes = search_meta[search_id]
+        print(f"   ❌ {station} {minutes} min - {message}")
 
-with open('isochrones_120min.geojson', 'w') as f:
-    json.dump({"type": "FeatureCollection", "features": features_120min}, f)
+    # Fusionner dans les fichiers GeoJSON : on remplace les features des stations
+    # régénérées et on garde les autres (ex: isochrones 30/60 extraits du HTML)
+    print("\n" + "=" * 60)
+    for minutes in args.durees:
+        filename = f'isochrones_{minutes}min.geojson'
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                iso_data = json.load(f)
+        else:
+            iso_data = {"type": "FeatureCollection", "features": []}
+
+        refreshed = {search_meta[sid][0] for sid in results if search_meta[sid][1] == minutes}
+        iso_data['features'] = [
+            f for f in iso_data['features'] if f['properties'].get('station') not in refreshed
+        ]
+
+        for search in searches:
+            station, search_minutes = search_meta[search['id']]
+            if search_minutes != minutes or search['id'] not in results:
+                continue
+            for polygon in results[search['id']]:
+                iso_data['features'].append({
+                    "type": "Feature",
+                    "properties": {
+                        "station": station,
+                        "time": f"{minutes} min"
+                    },
+                    "geometry": {
+                        "type": "Polygon",
+                        "coordinates": polygon
+                    }
+                })
 
-print("\n✅ Fichiers sauvegardés :")
-print("   - isochrones_90min.geojson")
-print("   - isochrones_120min.geojson")
\ No newline at end of file
+        with open(filename, 'w') as f:
+            json.dump(iso_data, f)
+        print(f"✅ {filename} : {len(iso_data['features'])} isochrones ({len(refreshed)} stations mises à jour)")
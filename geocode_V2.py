@@ -2,13 +2,17 @@ import pandas as pd
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 import re
+from geocode_cache import GeocodeCache
 
 # Lire le fichier
 df = pd.read_csv('all_stations.csv', sep=';')
 
 # Initialiser le géocodeur avec timeout plus long
 geolocator = Nominatim(user_agent="carte_ici_projet_v2", timeout=10)
-geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.5)
+# swallow_exceptions=False : un timeout ou une erreur réseau remonte (après les
+# nouvelles tentatives) au lieu de renvoyer None, qui serait mis en cache comme
+# "adresse introuvable"
+geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.5, swallow_exceptions=False)
 
 # Fonction pour simplifier les adresses
 def simplify_address(address, station_name):
@@ -27,10 +31,15 @@ def simplify_address(address, station_name):
     
     return addr + ", France"
 
-# Géocoder
-print("🌍 GÉOCODAGE V2 EN COURS... (environ 2 minutes)")
+# Géocoder (le cache évite de réinterroger Nominatim pour les adresses inchangées)
+print("🌍 GÉOCODAGE V2 EN COURS...")
 print("=" * 60)
 
+cache = GeocodeCache()
+purged = cache.purge_expired()
+if purged:
+    print(f"🧹 {purged} entrées expirées supprimées du cache")
+
 results = []
 
 for idx, row in df.iterrows():
@@ -41,38 +50,28 @@ for idx, row in df.iterrows():
     print(f"{idx+1}/{len(df)} - {station}")
     print(f"         Adresse simplifiée: {address_simple[:50]}...")
     
+    # Chaîne de repli : adresse simplifiée, puis juste la ville (extraite de la station)
+    queries = [address_simple]
+    city_match = re.search(r'- ([A-Za-zÀ-ÿ\s-]+)$', station)
+    if city_match:
+        queries.append(city_match.group(1).strip() + ", France")
+    
     try:
-        location = geocode(address_simple)
-        if location:
-            print(f"         ✅ Trouvé: {location.latitude:.4f}, {location.longitude:.4f}")
-            results.append({
-                'idx': idx,
-                'lat': location.latitude,
-                'lon': location.longitude
-            })
+        coords, level = cache.geocode_chain(queries, geocode)
+        if coords:
+            via = " via ville" if level > 0 else ""
+            print(f"         ✅ Trouvé{via}: {coords[0]:.4f}, {coords[1]:.4f}")
+            results.append({'idx': idx, 'lat': coords[0], 'lon': coords[1]})
         else:
-            # Essayer avec juste la ville (extraire de la station)
-            city_match = re.search(r'- ([A-Za-zÀ-ÿ\s-]+)$', station)
-            if city_match:
-                city = city_match.group(1).strip()
-                location = geocode(city + ", France")
-                if location:
-                    print(f"         ✅ Trouvé via ville: {location.latitude:.4f}, {location.longitude:.4f}")
-                    results.append({
-                        'idx': idx,
-                        'lat': location.latitude,
-                        'lon': location.longitude
-                    })
-                else:
-                    print(f"         ⚠️  Pas trouvé")
-                    results.append({'idx': idx, 'lat': None, 'lon': None})
-            else:
-                print(f"         ⚠️  Pas trouvé")
-                results.append({'idx': idx, 'lat': None, 'lon': None})
+            print(f"         ⚠️  Pas trouvé")
+            results.append({'idx': idx, 'lat': None, 'lon': None})
     except Exception as e:
         print(f"         ❌ Erreur: {str(e)[:50]}")
         results.append({'idx': idx, 'lat': None, 'lon': None})
 
+print(f"\n💾 {cache.summary()}")
+cache.close()
+
 # Ajouter au DataFrame
 df['Latitude'] = [r['lat'] for r in results]
 df['Longitude'] = [r['lon'] for r in results]
@@ -0,0 +1,118 @@
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+from instrumentation import count
+
+# Cache persistant des géocodages (SQLite)
+# Clé = empreinte SHA-1 de l'adresse simplifiée normalisée, donc une adresse
+# modifiée dans le CSV produit une nouvelle clé et repasse par Nominatim.
+
+CACHE_FILE = 'geocode_cache.sqlite'
+TTL_DAYS = 180           # Durée de validité d'un résultat trouvé
+TTL_NOT_FOUND_DAYS = 14  # Un échec est retenté plus tôt
+
+
+def normalize_query(query):
+    # Minuscules, sans accents, espaces et ponctuation homogènes
+    text = unicodedata.normalize('NFKD', str(query))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold()
+    text = re.sub(r'\s*,\s*', ', ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip(' ,')
+
+
+def cache_key(query):
+    return hashlib.sha1(normalize_query(query).encode('utf-8')).hexdigest()
+
+
+class GeocodeCache:
+    def __init__(self, path=CACHE_FILE, ttl_days=TTL_DAYS, ttl_not_found_days=TTL_NOT_FOUND_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.ttl_not_found = ttl_not_found_days * 86400
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'network': 0}
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                lat REAL,
+                lon REAL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, query):
+        # Renvoie (trouvé_en_cache, (lat, lon) ou None)
+        row = self.conn.execute(
+            'SELECT lat, lon, created_at FROM geocode WHERE key = ?', (cache_key(query),)
+        ).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return False, None
+
+        lat, lon, created_at = row
+        ttl = self.ttl if lat is not None else self.ttl_not_found
+        if time.time() - created_at > ttl:
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return False, None
+
+        self.stats['hits'] += 1
+        return True, (lat, lon) if lat is not None else None
+
+    def put(self, query, coords):
+        lat, lon = coords if coords else (None, None)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO geocode (key, query, lat, lon, created_at) VALUES (?, ?, ?, ?, ?)',
+            (cache_key(query), normalize_query(query), lat, lon, time.time())
+        )
+        self.conn.commit()
+
+    def geocode(self, query, geocode_func):
+        # Interroge le cache, puis le réseau uniquement en cas d'absence
+        found, coords = self.get(query)
+        if found:
+            return coords
+
+        self.stats['network'] += 1
+        count('requetes_geocodage')
+        # Seule une réponse du service est mise en cache (None = introuvable) ;
+        # une exception (timeout, réseau) remonte sans rien écrire
+        location = geocode_func(query)
+        coords = (location.latitude, location.longitude) if location else None
+        self.put(query, coords)
+        return coords
+
+    def geocode_chain(self, queries, geocode_func):
+        # Essaie chaque requête dans l'ordre (adresse, puis ville seule) ;
+        # chaque maillon a sa propre entrée en cache, échecs compris.
+        for i, query in enumerate(queries):
+            coords = self.geocode(query, geocode_func)
+            if coords:
+                return coords, i
+        return None, None
+
+    def purge_expired(self):
+        now = time.time()
+        cur = self.conn.execute(
+            'DELETE FROM geocode WHERE (lat IS NOT NULL AND ? - created_at > ?) '
+            'OR (lat IS NULL AND ? - created_at > ?)',
+            (now, self.ttl, now, self.ttl_not_found)
+        )
+        self.conn.commit()
+        return cur.rowcount
+
+    def summary(self):
+        total = self.stats['hits'] + self.stats['misses']
+        rate = 100 * self.stats['hits'] / total if total else 0
+        return (f"Cache : {self.stats['hits']} hits, {self.stats['misses']} misses "
+                f"({self.stats['expired']} expirés), {self.stats['network']} requêtes réseau "
+                f"- taux de hit {rate:.0f}%")
+
+    def close(self):
+        self.conn.close()
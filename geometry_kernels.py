@@ -0,0 +1,118 @@
+import numpy as np
+from station_index import EARTH_RADIUS_KM
+
+# Calculs géométriques en bloc sur des anneaux stockés à plat
+# (même découpage que GeometryStore) :
+#
+#   coords  : (n_sommets, 2) [lon, lat]
+#   offsets : (n_anneaux + 1,) ; anneau k = coords[offsets[k]:offsets[k + 1]]
+#
+# Chaque fonction traite tous les anneaux en quelques opérations NumPy,
+# sans boucle Python par anneau ni par sommet. Les anneaux peuvent être
+# fermés (GeoJSON) ou non (contours bruts) : l'arête de fermeture est
+# toujours ajoutée, elle est nulle si le premier sommet est répété.
+#
+#   coords, offsets = pack_rings(rings)
+#   areas = geodesic_areas(coords, offsets)      # km²
+#   lons, lats = centroids(coords, offsets).T
+
+
+def pack_rings(rings):
+    # Liste d'anneaux (listes [lon, lat] ou tableaux) -> (coords, offsets)
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(r) for r in rings])
+    arrays = [np.asarray(r, dtype=float).reshape(len(r), -1)[:, :2] for r in rings if len(r)]
+    coords = np.concatenate(arrays) if arrays else np.empty((0, 2))
+    return coords, offsets
+
+
+def vertex_counts(offsets):
+    return np.diff(offsets)
+
+
+def _edge_sums(coords, offsets, term):
+    # Somme de term(a, b) sur les arêtes a -> b de chaque anneau, fermeture comprise.
+    # Les arêtes internes sont calculées en un bloc sur tout le tableau ; les sommes
+    # cumulées découpent ensuite par anneau (l'arête qui enjambe deux anneaux est exclue).
+    n_rings = len(offsets) - 1
+    result = np.zeros(n_rings)
+    if len(coords) == 0:
+        return result
+    cumulative = np.zeros(len(coords))
+    if len(coords) > 1:
+        np.cumsum(term(coords[:-1], coords[1:]), out=cumulative[1:])
+    starts, ends = offsets[:-1], offsets[1:]
+    has = ends > starts
+    result[has] = cumulative[ends[has] - 1] - cumulative[starts[has]]
+    result[has] += term(coords[ends[has] - 1], coords[starts[has]])
+    return result
+
+
+def _cross(a, b):
+    return a[:, 0] * b[:, 1] - b[:, 0] * a[:, 1]
+
+
+def signed_areas(coords, offsets):
+    # Formule du lacet, en degrés² ; positive dans le sens trigonométrique
+    return _edge_sums(coords, offsets, _cross) / 2
+
+
+def planar_areas(coords, offsets):
+    return np.abs(signed_areas(coords, offsets))
+
+
+def geodesic_areas(coords, offsets):
+    # Aire sur la sphère en km² (excès sphérique par arête, Chamberlain & Duquette 2007)
+    radians = np.radians(coords)
+
+    def term(a, b):
+        return (b[:, 0] - a[:, 0]) * (2 + np.sin(a[:, 1]) + np.sin(b[:, 1]))
+    return np.abs(_edge_sums(radians, offsets, term)) * EARTH_RADIUS_KM ** 2 / 2
+
+
+def centroids(coords, offsets):
+    # Centre de gravité de la surface de chaque anneau, (n, 2) [lon, lat] ;
+    # moyenne des sommets si l'anneau est plat (aire nulle), NaN s'il est vide.
+    # Calcul en degrés : à l'échelle d'une isochrone l'écart avec une projection
+    # locale est négligeable (un facteur constant sur x ne déplace pas le centroïde).
+    counts = vertex_counts(offsets)
+    area = signed_areas(coords, offsets)
+    moments = np.column_stack([
+        _edge_sums(coords, offsets, lambda a, b: (a[:, 0] + b[:, 0]) * _cross(a, b)),
+        _edge_sums(coords, offsets, lambda a, b: (a[:, 1] + b[:, 1]) * _cross(a, b)),
+    ])
+    result = np.full((len(counts), 2), np.nan)
+    has = counts > 0
+    if has.any():
+        # reduceat sur les seuls anneaux non vides : chaque segment s'arrête au suivant
+        result[has] = np.add.reduceat(coords, offsets[:-1][has], axis=0) / counts[has, None]
+    solid = np.abs(area) > 0
+    result[solid] = moments[solid] / (6 * area[solid, None])
+    return result
+
+
+def bboxes(coords, offsets):
+    # [min_lon, min_lat, max_lon, max_lat] de chaque anneau (NaN si vide).
+    # Avec offsets = ring_offsets[part_offsets[feature_offsets]] on obtient
+    # directement les boîtes par feature d'une GeometryStore.
+    counts = vertex_counts(offsets)
+    boxes = np.full((len(counts), 4), np.nan)
+    has = counts > 0
+    if has.any():
+        starts = offsets[:-1][has]
+        coords = np.asarray(coords, dtype=float)
+        boxes[has, 0:2] = np.minimum.reduceat(coords, starts, axis=0)
+        boxes[has, 2:4] = np.maximum.reduceat(coords, starts, axis=0)
+    return boxes
+
+
+def merge_bboxes(boxes, group_offsets):
+    # Boîtes de groupes d'anneaux consécutifs (ex. parties d'un MultiPolygon)
+    counts = np.diff(group_offsets)
+    merged = np.full((len(counts), 4), np.nan)
+    has = counts > 0
+    if has.any():
+        starts = group_offsets[:-1][has]
+        merged[has, 0:2] = np.fmin.reduceat(boxes[:, 0:2], starts, axis=0)
+        merged[has, 2:4] = np.fmax.reduceat(boxes[:, 2:4], starts, axis=0)
+    return merged
@@ -0,0 +1,138 @@
+import json
+import numpy as np
+import geometry_kernels
+
+# Stockage colonnaire des polygones d'isochrones
+# Toutes les coordonnées [lon, lat] d'une couche sont dans un seul tableau
+# (n_sommets, 2) ; des tableaux d'offsets découpent ce tableau en anneaux,
+# les anneaux en polygones et les polygones en features :
+#
+#   coords[ring_offsets[r]:ring_offsets[r + 1]]          -> anneau r
+#   ring_offsets[part_offsets[p]:part_offsets[p + 1]]    -> anneaux du polygone p
+#   part_offsets[feature_offsets[f]:feature_offsets[f+1]] -> polygones de la feature f
+#
+# Les fichiers .npy s'ouvrent en mmap : les anneaux sont des vues sans copie.
+
+NO_GEOMETRY, POLYGON, MULTIPOLYGON = 0, 1, 2
+ARRAYS = ['coords', 'ring_offsets', 'part_offsets', 'feature_offsets', 'geom_types']
+
+
+class GeometryStore:
+    def __init__(self, coords, ring_offsets, part_offsets, feature_offsets, geom_types, properties):
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.part_offsets = part_offsets
+        self.feature_offsets = feature_offsets
+        self.geom_types = geom_types
+        self.properties = properties
+
+    # ---------- Import / export GeoJSON ----------
+
+    @classmethod
+    def from_features(cls, features, dtype=np.float64):
+        rings, ring_offsets, part_offsets, feature_offsets, geom_types = [], [0], [0], [0], []
+        n_vertices = 0
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'Polygon':
+                parts, geom_type = [geometry['coordinates']], POLYGON
+            elif geometry.get('type') == 'MultiPolygon':
+                parts, geom_type = geometry['coordinates'], MULTIPOLYGON
+            else:
+                parts, geom_type = [], NO_GEOMETRY
+            for part in parts:
+                for ring in part:
+                    rings.append(ring)
+                    n_vertices += len(ring)
+                    ring_offsets.append(n_vertices)
+                part_offsets.append(len(ring_offsets) - 1)
+            feature_offsets.append(len(part_offsets) - 1)
+            geom_types.append(geom_type)
+
+        coords = np.empty((n_vertices, 2), dtype=dtype)
+        for ring, start, end in zip(rings, ring_offsets[:-1], ring_offsets[1:]):
+            coords[start:end] = [c[:2] for c in ring]
+
+        return cls(
+            coords,
+            np.array(ring_offsets, dtype=np.int64),
+            np.array(part_offsets, dtype=np.int64),
+            np.array(feature_offsets, dtype=np.int64),
+            np.array(geom_types, dtype=np.int8),
+            [dict(f.get('properties') or {}) for f in features]
+        )
+
+    @classmethod
+    def from_geojson(cls, path, dtype=np.float64):
+        with open(path, 'r') as f:
+            return cls.from_features(json.load(f)['features'], dtype)
+
+    def geometry(self, i):
+        # Géométrie GeoJSON de la feature i (listes Python, pour folium / json)
+        parts = [[ring.tolist() for ring in part] for part in self.feature_parts(i)]
+        if self.geom_types[i] == POLYGON:
+            return {"type": "Polygon", "coordinates": parts[0]}
+        if self.geom_types[i] == MULTIPOLYGON:
+            return {"type": "MultiPolygon", "coordinates": parts}
+        return None
+
+    def feature(self, i):
+        return {"type": "Feature", "properties": dict(self.properties[i]), "geometry": self.geometry(i)}
+
+    def to_geojson(self):
+        return {"type": "FeatureCollection", "features": [self.feature(i) for i in range(len(self))]}
+
+    def write_geojson(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_geojson(), f)
+
+    # ---------- Accès sans copie ----------
+
+    def __len__(self):
+        return len(self.feature_offsets) - 1
+
+    def ring(self, r):
+        return self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]]
+
+    def feature_parts(self, i):
+        # Polygones de la feature i, chacun sous forme de liste d'anneaux (vues)
+        parts = []
+        for p in range(self.feature_offsets[i], self.feature_offsets[i + 1]):
+            parts.append([self.ring(r) for r in range(self.part_offsets[p], self.part_offsets[p + 1])])
+        return parts
+
+    def outer_ring(self, i):
+        # Anneau extérieur du premier polygone, ou None si pas de géométrie
+        if self.feature_offsets[i] == self.feature_offsets[i + 1]:
+            return None
+        return self.ring(self.part_offsets[self.feature_offsets[i]])
+
+    def vertex_offsets(self):
+        # Découpage de coords par feature (tous les anneaux de la feature)
+        return self.ring_offsets[self.part_offsets[self.feature_offsets]]
+
+    def bboxes(self):
+        # Boîte englobante [min_lon, min_lat, max_lon, max_lat] de chaque feature (NaN si vide)
+        return geometry_kernels.bboxes(self.coords, self.vertex_offsets())
+
+    def vertex_counts(self):
+        return geometry_kernels.vertex_counts(self.vertex_offsets())
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    # ---------- Fichiers binaires (mmap) ----------
+
+    def save(self, prefix):
+        for name in ARRAYS:
+            np.save(f'{prefix}.{name}.npy', getattr(self, name))
+        with open(f'{prefix}.properties.json', 'w') as f:
+            json.dump(self.properties, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, prefix, mmap=True):
+        arrays = [np.load(f'{prefix}.{name}.npy', mmap_mode='r' if mmap else None) for name in ARRAYS]
+        with open(f'{prefix}.properties.json', 'r') as f:
+            properties = json.load(f)
+        return cls(*arrays, properties)
@@ -0,0 +1,59 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Mesures internes d'un script lancé par build.py
+# build.py mesure chaque étape de l'extérieur (temps, CPU, mémoire max, octets
+# écrits) ; les scripts y ajoutent leurs compteurs (requêtes réseau) et des
+# sous-étapes chronométrées :
+#
+#   from instrumentation import count, span
+#   count('requetes_traveltime')
+#   with span('association'):
+#       ...
+#
+# Hors build.py (variable BUILD_METRICS absente) rien n'est écrit.
+
+METRICS_ENV = 'BUILD_METRICS'
+
+_lock = threading.Lock()
+_counters = {}
+_spans = []
+_pid = os.getpid()
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+@contextmanager
+def span(name):
+    start, cpu = time.time(), time.process_time()
+    try:
+        yield
+    finally:
+        with _lock:
+            _spans.append({'name': name, 'start': start,
+                           'wall_s': time.time() - start, 'cpu_s': time.process_time() - cpu})
+
+
+def peak_rss_mb(rusage):
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return rusage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _dump():
+    path = os.environ.get(METRICS_ENV)
+    # Les processus d'export (ProcessPoolExecutor) héritent de la variable : seul le script écrit
+    if not path or os.getpid() != _pid or not (_counters or _spans):
+        return
+    with open(path, 'w') as f:
+        json.dump({'counters': _counters, 'spans': _spans}, f)
+
+
+atexit.register(_dump)
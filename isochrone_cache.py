@@ -0,0 +1,75 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+# Stock local des réponses TravelTime
+# Clé = empreinte des paramètres exacts de la recherche
+# (coordonnées, durée, mode, heure de départ) : si une station est déplacée
+# ou si un paramètre change, la clé change et l'isochrone est refetché.
+
+CACHE_FILE = 'isochrones_cache.sqlite'
+TTL_DAYS = 365
+
+
+def search_key(lat, lon, seconds, mode, departure_time):
+    params = [round(float(lat), 6), round(float(lon), 6), int(seconds), mode, departure_time]
+    return hashlib.sha1(json.dumps(params).encode('utf-8')).hexdigest()
+
+
+def key_for_search(search):
+    return search_key(
+        search['coords']['lat'], search['coords']['lng'], search['travel_time'],
+        search['transportation']['type'], search['departure_time']
+    )
+
+
+class IsochroneCache:
+    def __init__(self, path=CACHE_FILE, ttl_days=TTL_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS isochrones (
+                key TEXT PRIMARY KEY,
+                station TEXT NOT NULL,
+                seconds INTEGER NOT NULL,
+                rings TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, key):
+        # Renvoie les polygones en cache, ou None si absent / périmé
+        row = self.conn.execute(
+            'SELECT rings, fetched_at FROM isochrones WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        polygons = json.loads(row[0])
+        # Anciennes entrées : un anneau extérieur par forme, sans trous
+        return [[p] if p and isinstance(p[0][0], (int, float)) else p for p in polygons]
+
+    def put(self, key, station, seconds, polygons):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO isochrones (key, station, seconds, rings, fetched_at) VALUES (?, ?, ?, ?, ?)',
+            (key, station, int(seconds), json.dumps(polygons), time.time())
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def diff(self, searches, force_ids=()):
+        # Sépare les recherches déjà en cache de celles à (re)fetcher
+        cached, missing = {}, []
+        for search in searches:
+            polygons = None if search['id'] in force_ids else self.get(key_for_search(search))
+            if polygons is None:
+                missing.append(search)
+            else:
+                cached[search['id']] = polygons
+        return cached, missing
+
+    def close(self):
+        self.conn.close()
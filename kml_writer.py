@@ -0,0 +1,95 @@
+import io
+import zipfile
+from contextlib import contextmanager
+from xml.sax.saxutils import escape
+import numpy as np
+
+# Écriture KML / KMZ en flux, sans arbre en mémoire
+# Les balises sont écrites au fur et à mesure ; les coordonnées partent
+# directement des tableaux NumPy (GeometryStore) vers le fichier.
+#
+#   with KmlWriter('station.kmz', name='ici Paris') as kml:
+#       kml.style('poly30', poly_color='aa28568a', line_color='ff000000', line_width=1)
+#       with kml.folder('Isochrone 30min'):
+#           kml.polygon('30 min', ring, 'poly30')
+#
+# Un chemin en .kmz écrit doc.kml dans une archive zip compressée.
+
+COORD_FORMAT = '%.6f,%.6f'   # ~10 cm, largement suffisant pour Google Earth
+
+
+class KmlWriter:
+    def __init__(self, path, name=None):
+        self.path = path
+        self._zip = None
+        if path.endswith('.kmz'):
+            self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+            self._out = io.TextIOWrapper(self._zip.open('doc.kml', 'w'), encoding='utf-8')
+        else:
+            self._out = open(path, 'w', encoding='utf-8')
+        self._out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<kml xmlns="http://www.opengis.net/kml/2.2">\n<Document>\n')
+        if name:
+            self._out.write(f'<name>{escape(name)}</name>\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._out.closed:
+            return
+        self._out.write('</Document>\n</kml>\n')
+        self._out.close()
+        if self._zip is not None:
+            self._zip.close()
+
+    def style(self, style_id, icon_color=None, icon_scale=None,
+              poly_color=None, line_color=None, line_width=None):
+        # Style partagé, référencé ensuite par son identifiant (#style_id)
+        out = self._out
+        out.write(f'<Style id="{escape(style_id)}">')
+        if icon_color or icon_scale:
+            out.write('<IconStyle>')
+            if icon_color:
+                out.write(f'<color>{icon_color}</color>')
+            if icon_scale:
+                out.write(f'<scale>{icon_scale}</scale>')
+            out.write('</IconStyle>')
+        if line_color or line_width:
+            out.write('<LineStyle>')
+            if line_color:
+                out.write(f'<color>{line_color}</color>')
+            if line_width:
+                out.write(f'<width>{line_width}</width>')
+            out.write('</LineStyle>')
+        if poly_color:
+            out.write(f'<PolyStyle><color>{poly_color}</color></PolyStyle>')
+        out.write('</Style>\n')
+
+    @contextmanager
+    def folder(self, name):
+        self._out.write(f'<Folder><name>{escape(name)}</name>\n')
+        yield self
+        self._out.write('</Folder>\n')
+
+    def point(self, name, lon, lat, style_id=None, description=None):
+        out = self._out
+        out.write(f'<Placemark><name>{escape(name)}</name>')
+        if description:
+            out.write(f'<description>{escape(description)}</description>')
+        if style_id:
+            out.write(f'<styleUrl>#{escape(style_id)}</styleUrl>')
+        out.write(f'<Point><coordinates>{COORD_FORMAT % (lon, lat)}</coordinates></Point></Placemark>\n')
+
+    def polygon(self, name, ring, style_id=None):
+        # ring : tableau (n, 2) [lon, lat], fermé
+        out = self._out
+        out.write(f'<Placemark><name>{escape(name)}</name>')
+        if style_id:
+            out.write(f'<styleUrl>#{escape(style_id)}</styleUrl>')
+        out.write('<Polygon><outerBoundaryIs><LinearRing><coordinates>')
+        np.savetxt(out, np.asarray(ring), fmt=COORD_FORMAT, newline=' ')
+        out.write('</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>\n')
@@ -0,0 +1,147 @@
+import json
+import re
+import numpy as np
+from attribution import points_in_rings
+from geometry_kernels import pack_rings, planar_areas, bboxes
+
+# Lecture des couches Leaflet d'une carte folium exportée (ReseauICI.html)
+# Un seul passage linéaire sur le texte : on repère chaque "var <nom> = L.<type>("
+# puis le décodeur JSON (en C) lit directement le tableau de coordonnées et
+# l'objet d'options qui suivent, sans expression régulière sur leur contenu.
+#
+#   layers = read_layers('ReseauICI.html')
+#   rings = [polygon_rings(l['coords'])[0] for l in layers if l['kind'] == 'polygon']
+#   stations = marker_positions(layers)
+#   labels, n_isolated = classify_nested(rings, stations)   # 'inner' (30 min) / 'outer' (60 min)
+
+LAYER_PATTERN = re.compile(r'var (\w+) = L\.(polygon|marker|circleMarker|circle|polyline)\(\s*')
+_decoder = json.JSONDecoder()
+SAMPLE_VERTICES = 32   # sommets testés pour décider qu'un polygone en contient un autre
+
+
+def _skip_spaces(text, pos):
+    while pos < len(text) and text[pos] in ' \t\r\n':
+        pos += 1
+    return pos
+
+
+def iter_layers(html):
+    # {'id', 'kind', 'coords', 'options'} pour chaque couche, dans l'ordre du fichier
+    for match in LAYER_PATTERN.finditer(html):
+        name, kind = match.groups()
+        try:
+            coords, pos = _decoder.raw_decode(html, match.end())
+        except ValueError:
+            continue
+        options = {}
+        pos = _skip_spaces(html, pos)
+        if html.startswith(',', pos):
+            pos = _skip_spaces(html, pos + 1)
+            if html.startswith('{', pos):
+                try:
+                    options, pos = _decoder.raw_decode(html, pos)
+                except ValueError:
+                    pass
+        yield {'id': name.split('_', 1)[-1], 'kind': kind, 'coords': coords, 'options': options}
+
+
+def read_layers(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(iter_layers(f.read()))
+
+
+def polygon_rings(coords):
+    # Coordonnées Leaflet [lat, lon] -> anneaux GeoJSON [lon, lat] fermés (extérieur puis trous)
+    rings = coords if coords and isinstance(coords[0][0], list) else [coords]
+    result = []
+    for ring in rings:
+        ring = [[point[1], point[0]] for point in ring]
+        if ring and ring[0] != ring[-1]:
+            ring.append(ring[0])
+        result.append(ring)
+    return result
+
+
+def marker_positions(layers):
+    # Positions [lon, lat] des marqueurs de stations
+    return [[l['coords'][1], l['coords'][0]] for l in layers if l['kind'] in ('marker', 'circleMarker')]
+
+
+def containment(rings):
+    # contains[i, j] : l'anneau j est entièrement dans l'anneau i
+    # (boîtes englobantes d'abord, puis un échantillon de sommets de j dans i)
+    n = len(rings)
+    coords, offsets = pack_rings(rings)
+    arrays = [coords[offsets[k]:offsets[k + 1]] for k in range(n)]
+    boxes = bboxes(coords, offsets)
+    inside_box = ((boxes[:, None, 0] <= boxes[None, :, 0]) & (boxes[:, None, 1] <= boxes[None, :, 1])
+                  & (boxes[:, None, 2] >= boxes[None, :, 2]) & (boxes[:, None, 3] >= boxes[None, :, 3]))
+    np.fill_diagonal(inside_box, False)
+    contains = np.zeros((n, n), dtype=bool)
+    for i, j in zip(*np.nonzero(inside_box)):
+        sample = arrays[j][np.linspace(0, len(arrays[j]) - 1, min(SAMPLE_VERTICES, len(arrays[j]))).astype(int)]
+        contains[i, j] = points_in_rings(sample[:, 0], sample[:, 1], [arrays[i]]).all()
+    return contains
+
+
+def pair_by_station(rings, stations, areas):
+    # Site propriétaire de chaque polygone (-1 si aucun) et nombre de stations par site.
+    # Un site regroupe les marqueurs au même endroit (station ICI et bureau, par ex.)
+    # et reçoit deux polygones par station (30 et 60 min). Du plus petit au plus
+    # grand, chaque polygone va à un site qu'il contient et qui n'est pas complet,
+    # le plus proche de son centre si plusieurs : un 60 min qui englobe des
+    # stations voisines déjà servies revient ainsi à la sienne.
+    owner = np.full(len(rings), -1, dtype=np.int64)
+    if not len(stations):
+        return owner, np.zeros(0, dtype=np.int64)
+    sites, sizes = np.unique(np.asarray(stations, dtype=float), axis=0, return_counts=True)
+    coords, offsets = pack_rings(rings)
+    boxes = bboxes(coords, offsets)
+    counts = np.zeros(len(sites), dtype=np.int64)
+    for i in np.argsort(areas, kind='stable'):
+        ring = coords[offsets[i]:offsets[i + 1]]
+        cand = np.flatnonzero((counts < 2 * sizes)
+                              & (sites[:, 0] >= boxes[i, 0]) & (sites[:, 0] <= boxes[i, 2])
+                              & (sites[:, 1] >= boxes[i, 1]) & (sites[:, 1] <= boxes[i, 3]))
+        if len(cand):
+            cand = cand[points_in_rings(sites[cand, 0], sites[cand, 1], [ring])]
+        if len(cand):
+            center = ring.mean(axis=0)
+            best = cand[np.argmin(((sites[cand] - center) ** 2).sum(axis=1))]
+            owner[i] = best
+            counts[best] += 1
+    return owner, sizes
+
+
+def classify_nested(rings, stations=()):
+    # Durée relative de chaque isochrone : 'inner' (30 min) ou 'outer' (60 min).
+    # stations : positions [lon, lat] des marqueurs. Une station qui reçoit ses deux
+    # polygones (pair_by_station) a son 30 min dans le plus petit des deux.
+    # Aucune règle d'emboîtement globale ne tient : un 30 min peut contenir le
+    # 30 min d'une station voisine, ou être contenu dans son 60 min.
+    # Polygones non appariés : 'outer' s'il en contient un autre, 'inner' s'il est
+    # contenu, sinon au plus proche des aires (en log) des deux groupes déjà classés.
+    n = len(rings)
+    log_areas = np.log(np.maximum(planar_areas(*pack_rings(rings)), 1e-12))
+    owner, sizes = pair_by_station(rings, stations, log_areas)
+    labels = np.full(n, '', dtype=object)
+    for site in np.unique(owner[owner >= 0]):
+        group = np.flatnonzero(owner == site)
+        if len(group) == 2 * sizes[site]:
+            group = group[np.argsort(log_areas[group], kind='stable')]
+            labels[group[:sizes[site]]], labels[group[sizes[site]:]] = 'inner', 'outer'
+
+    unpaired = labels == ''
+    if unpaired.any():
+        contains = containment(rings)
+        outer = unpaired & contains.any(axis=1)
+        inner = unpaired & contains.any(axis=0) & ~outer
+        labels[outer], labels[inner] = 'outer', 'inner'
+    isolated = np.flatnonzero(labels == '')
+    if len(isolated):
+        inner, outer = labels == 'inner', labels == 'outer'
+        inner_mean = log_areas[inner].mean() if inner.any() else log_areas.min()
+        outer_mean = log_areas[outer].mean() if outer.any() else log_areas.max()
+        for i in isolated:
+            labels[i] = 'inner' if abs(log_areas[i] - inner_mean) <= abs(log_areas[i] - outer_mean) else 'outer'
+    return labels.tolist(), len(isolated)
@@ -0,0 +1,173 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from road_graph import RoadGraph
+from attribution import points_in_rings
+from geometry_kernels import pack_rings, signed_areas
+
+# Moteur d'isochrones hors ligne (alternative à TravelTime, sans quota)
+# 1. Dijkstra sur le graphe routier depuis la station, borné à la plus grande durée
+# 2. Rasterisation : chaque cellule prend le temps du nœud le plus rapide
+#    qu'elle contient, puis le temps se propage hors route à vitesse réduite
+#    (champs, petites voies absentes de l'extrait)
+# 3. Contours de toute la zone atteinte : polygones [extérieur, trous...] en
+#    anneaux fermés [lon, lat], même format que les formes TravelTime
+#    (traveltime_client.shapes_to_coords), pour chaque durée demandée
+#    (30, 45, 150 min...) à partir du même champ de temps
+#
+#   polygons = compute_isochrones('france.osm', [(station, lat, lon, [1800, 3600]), ...])
+#   polygons['ici Paris '][1800]   # polygones 30 min
+
+CELL_M = 500            # Taille des cellules du raster
+OFFROAD_KMH = 10        # Propagation hors route entre les nœuds atteints
+OFFROAD_MAX_M = 1500    # Distance maximale parcourue hors route
+M_PER_DEGREE = 111320.0
+
+
+def travel_time_field(lons, lats, times, center_lat, cell_m=CELL_M,
+                      offroad_kmh=OFFROAD_KMH, offroad_max_m=OFFROAD_MAX_M):
+    # Raster (lignes = latitude croissante) des temps d'accès, en secondes (inf = non atteint)
+    # Renvoie (champ, lon0, lat0, pas_lon, pas_lat)
+    step_lat = cell_m / M_PER_DEGREE
+    step_lon = cell_m / (M_PER_DEGREE * math.cos(math.radians(center_lat)))
+    margin = int(math.ceil(offroad_max_m / cell_m)) + 1
+    lon0 = lons.min() - margin * step_lon
+    lat0 = lats.min() - margin * step_lat
+    cols = ((lons - lon0) / step_lon).astype(np.int64)
+    rows = ((lats - lat0) / step_lat).astype(np.int64)
+    field = np.full((rows.max() + margin + 1, cols.max() + margin + 1), np.inf)
+    np.minimum.at(field, (rows, cols), times)
+
+    # Propagation 8-voisins, une cellule par itération
+    step_s = cell_m / (offroad_kmh / 3.6)
+    for _ in range(margin - 1):
+        padded = np.pad(field, 1, constant_values=np.inf)
+        h, w = field.shape
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                if dr or dc:
+                    cost = step_s * (math.sqrt(2) if dr and dc else 1.0)
+                    np.minimum(field, padded[1 + dr:1 + dr + h, 1 + dc:1 + dc + w] + cost, out=field)
+    return field, lon0, lat0, step_lon, step_lat
+
+
+def mask_boundaries(mask):
+    # Contours des zones vraies d'un masque, en coordonnées de coins de cellules (x=col, y=ligne),
+    # orientés dans le sens trigonométrique (intérieur à gauche)
+    padded = np.pad(mask, 1)
+    inside = padded[1:-1, 1:-1]
+    rows, cols = np.nonzero(inside & ~padded[:-2, 1:-1])     # voisin du dessous vide
+    edges = [((c, r), (c + 1, r)) for r, c in zip(rows.tolist(), cols.tolist())]
+    rows, cols = np.nonzero(inside & ~padded[1:-1, 2:])      # voisin de droite vide
+    edges += [((c + 1, r), (c + 1, r + 1)) for r, c in zip(rows.tolist(), cols.tolist())]
+    rows, cols = np.nonzero(inside & ~padded[2:, 1:-1])      # voisin du dessus vide
+    edges += [((c + 1, r + 1), (c, r + 1)) for r, c in zip(rows.tolist(), cols.tolist())]
+    rows, cols = np.nonzero(inside & ~padded[1:-1, :-2])     # voisin de gauche vide
+    edges += [((c, r + 1), (c, r)) for r, c in zip(rows.tolist(), cols.tolist())]
+
+    outgoing = {}
+    for start, end in edges:
+        outgoing.setdefault(start, []).append(end)
+
+    loops = []
+    while outgoing:
+        start = next(iter(outgoing))
+        loop = [start]
+        previous, current = None, start
+        while True:
+            ends = outgoing[current]
+            if len(ends) > 1 and previous is not None:
+                # Coin partagé en diagonale : tourner à gauche garde les zones séparées
+                dx, dy = current[0] - previous[0], current[1] - previous[1]
+                left = (current[0] - dy, current[1] + dx)
+                end = left if left in ends else ends[0]
+                ends.remove(end)
+            else:
+                end = ends.pop()
+            if not ends:
+                del outgoing[current]
+            previous, current = current, end
+            if current == start:
+                break
+            loop.append(current)
+        loops.append(loop)
+    return loops
+
+
+def drop_collinear(loop):
+    # Supprime les sommets alignés (forme identique, marches d'escalier seulement)
+    pts = np.asarray(loop, dtype=float)
+    prev_d = pts - np.roll(pts, 1, axis=0)
+    next_d = np.roll(pts, -1, axis=0) - pts
+    turn = prev_d[:, 0] * next_d[:, 1] - prev_d[:, 1] * next_d[:, 0]
+    return pts[turn != 0]
+
+
+def contour(field, seconds, lon0, lat0, step_lon, step_lat):
+    # Polygones [extérieur, trous...] de toute la zone atteinte en moins de `seconds`,
+    # du plus grand au plus petit : les zones isolées (ville desservie par autoroute,
+    # au-delà du remplissage hors route) sont gardées comme des "shells" TravelTime.
+    # Contours de mask_boundaries : extérieurs dans le sens trigonométrique, trous
+    # dans le sens horaire ; un trou va au plus petit extérieur qui contient la
+    # cellule atteinte à gauche de sa première arête.
+    raw = [np.asarray(loop, dtype=float) for loop in mask_boundaries(field <= seconds)]
+    loops = [drop_collinear(loop) for loop in raw]
+    keep = [i for i, loop in enumerate(loops) if len(loop) >= 3]
+    if not keep:
+        return []
+    areas = signed_areas(*pack_rings([loops[i] for i in keep]))
+    shells = [i for i, a in zip(keep, areas) if a > 0]
+    shell_areas = areas[areas > 0]
+    polygons = {i: [loops[i]] for i in shells}
+    for i, a in zip(keep, areas):
+        if a > 0:
+            continue
+        (x0, y0), (x1, y1) = raw[i][0], raw[i][1]
+        px, py = np.array([(x0 + x1) / 2 - (y1 - y0) / 2]), np.array([(y0 + y1) / 2 + (x1 - x0) / 2])
+        around = [k for k, j in enumerate(shells) if points_in_rings(px, py, [loops[j]])[0]]
+        if around:
+            polygons[shells[min(around, key=lambda k: shell_areas[k])]].append(loops[i])
+
+    def to_lonlat(loop):
+        ring = np.column_stack([lon0 + loop[:, 0] * step_lon, lat0 + loop[:, 1] * step_lat])
+        return np.vstack([ring, ring[:1]]).round(6).tolist()
+
+    order = np.argsort(-shell_areas, kind='stable')
+    return [[to_lonlat(loop) for loop in polygons[shells[k]]] for k in order]
+
+
+# ---------- Calcul en parallèle ----------
+
+_graph = None
+
+
+def _init_worker(graph_path):
+    global _graph
+    _graph = RoadGraph.load_cached(graph_path)
+
+
+def station_isochrones(key, lat, lon, thresholds):
+    # Toutes les durées d'une station en un passage : un seul Dijkstra borné à la
+    # plus grande, un seul champ de temps, un contour par seuil. Sur une même grille,
+    # field <= t1 est inclus dans field <= t2 pour t1 < t2 : les bandes sont emboîtées.
+    # Renvoie (clé, {seuil: polygones}) ; liste vide si la station est hors graphe.
+    thresholds = sorted(set(thresholds))
+    sources, offsets = _graph.snap(lon, lat)
+    nodes, times = _graph.dijkstra(sources, offsets, thresholds[-1])
+    if len(nodes) == 0:
+        return key, {t: [] for t in thresholds}
+    node_lons = np.append(np.asarray(_graph.lons)[nodes], lon)
+    node_lats = np.append(np.asarray(_graph.lats)[nodes], lat)
+    field, lon0, lat0, step_lon, step_lat = travel_time_field(node_lons, node_lats, np.append(times, 0.0), lat)
+    return key, {t: contour(field, t, lon0, lat0, step_lon, step_lat) for t in thresholds}
+
+
+def compute_isochrones(graph_path, stations, max_workers=None):
+    # stations : [(clé, lat, lon, [secondes, ...]), ...] -> {clé: {secondes: [polygones]}}
+    # Une tâche par station (et non par station × durée) : le travail est partagé entre seuils
+    if not stations:
+        return {}
+    RoadGraph.load_cached(graph_path)   # construit le cache .npz une seule fois avant les processus
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(graph_path,)) as pool:
+        return dict(pool.map(station_isochrones, *zip(*stations), chunksize=1))
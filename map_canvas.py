@@ -0,0 +1,79 @@
+import folium
+from jinja2 import Template
+
+# Mode canvas de carte_finale.html (create_final_map_v2.py --canvas)
+# Les marqueurs de stations ne sont plus des éléments DOM (SVG pour les cercles
+# ICI, DivIcon HTML pour les carrés RER et les losanges Bureau) mais sont
+# dessinés sur un canvas commun placé dans markerPane : toujours au-dessus des
+# isochrones (canvas de map_hover.py, overlayPane), même quand des tuiles
+# d'isochrones arrivent après les stations.
+# Les formes gardent leurs couleurs et leur contour blanc ; tooltip et popup
+# sont liés par map_popups.bind_script (option 'station' de la couche).
+#
+#   1. shapes_script()                  avant les marqueurs (canvas + L.formeStation)
+#   2. StationShape(location, forme='carre', ...).add_to(groupe)
+
+STATIONS_RENDERER = 'rendu_stations'
+# Carré de 16 px + bordure de 3 px (22 px hors tout, comme le DivIcon) : demi-côté
+# au milieu du trait 9,5 px, soit 9,5 × √2 du centre au coin
+SHAPE_RADIUS = 9.5 * 2 ** 0.5
+
+
+def shapes_script():
+    return f"""
+var {STATIONS_RENDERER} = L.canvas({{pane: 'markerPane', padding: 0.5}});
+L.FormeStation = L.CircleMarker.extend({{
+    // forme : 'cercle', 'carre' ou 'losange' ; radius = distance du centre au coin
+    options: {{forme: 'cercle'}},
+
+    _updatePath: function() {{
+        var forme = this.options.forme, renderer = this._renderer;
+        if (forme === 'cercle') return renderer._updateCircle(this);
+        if (!renderer._drawing || this._empty()) return;
+        var ctx = renderer._ctx, p = this._point, d = this._radius, h = d / Math.SQRT2;
+        ctx.beginPath();
+        if (forme === 'losange') {{
+            ctx.moveTo(p.x, p.y - d); ctx.lineTo(p.x + d, p.y);
+            ctx.lineTo(p.x, p.y + d); ctx.lineTo(p.x - d, p.y);
+        }} else {{
+            ctx.rect(p.x - h, p.y - h, 2 * h, 2 * h);
+        }}
+        ctx.closePath();
+        // Ombre portée sous la forme (box-shadow du DivIcon), pas sur le trait
+        ctx.save();
+        ctx.shadowColor = 'rgba(0,0,0,0.3)'; ctx.shadowBlur = 4; ctx.shadowOffsetY = 2;
+        ctx.fillStyle = this.options.color;
+        ctx.fill();
+        ctx.restore();
+        renderer._fillStroke(ctx, this);
+    }},
+
+    _containsPoint: function(p) {{
+        var dx = Math.abs(p.x - this._point.x), dy = Math.abs(p.y - this._point.y);
+        var d = this._radius + this._clickTolerance();
+        if (this.options.forme === 'losange') return dx + dy <= d;
+        if (this.options.forme === 'carre') return Math.max(dx, dy) <= d / Math.SQRT2;
+        return dx * dx + dy * dy <= d * d;
+    }}
+}});
+L.formeStation = function(latlng, options) {{
+    return new L.FormeStation(latlng, L.extend({{renderer: {STATIONS_RENDERER}}}, options));
+}};
+"""
+
+
+class StationShape(folium.CircleMarker):
+    # CircleMarker folium dessiné par L.formeStation sur le canvas des stations
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.formeStation(
+                {{ this.location|tojson }},
+                {{ this.options|tojson }}
+            ).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """)
+
+    def __init__(self, location, forme='cercle', radius=10, popup=None, tooltip=None, **kwargs):
+        super().__init__(location, radius=radius, popup=popup, tooltip=tooltip, **kwargs)
+        self._name = 'StationShape'
+        self.options['forme'] = forme
@@ -0,0 +1,150 @@
+import json
+from map_popups import TEMPLATES
+
+# Survol et clic des isochrones de carte_finale.html
+# Les isochrones sont dessinées sur un canvas partagé et ne sont pas
+# interactives : un seul gestionnaire mousemove / click sur la carte cherche
+# la zone sous le pointeur dans une grille de boîtes englobantes (GRID_DEG),
+# puis teste les seuls candidats de la cellule (point dans polygone).
+# Sans cela, chaque chemin SVG fait son propre test de survol et la carte
+# ralentit dès que les couches se superposent.
+# Si plusieurs zones contiennent le pointeur, on retient la plus petite
+# (la durée la plus courte de la station la plus proche).
+#
+#   1. renderer_script()     avant les couches (canvas partagé, nom RENDERER)
+#   2. GeoJson(..., interactive=False, renderer=JsCode(RENDERER))
+#   3. hover_script(...)     après les couches ; window.survolIsochrones.add(...)
+#      pour les couches ajoutées ensuite (tuiles)
+#   4. couches de couverture : window.survolIsochrones.add(couche, 'couverture')
+#      (tooltip seul, ni surlignage ni popup)
+# Tooltip et popup viennent des modèles de map_popups.py (TEMPLATES), à partir
+# des propriétés de la feature (indice de station, durée).
+# Aucune couche vectorielle n'est interactive : en mode --canvas, le canvas des
+# stations (markerPane) recouvre toute la carte et intercepterait leurs événements.
+
+RENDERER = 'rendu_isochrones'
+GRID_DEG = 0.5
+
+
+def renderer_script():
+    return f"var {RENDERER} = L.canvas({{padding: 0.5}});"
+
+
+def hover_script(map_name, styles, layer_names=()):
+    # layer_names : noms JS des GeoJson folium déjà créés
+    return f"""
+(function() {{
+    var map = {map_name};
+    var styles = {json.dumps(styles)};
+    var cellSize = {GRID_DEG};
+    var grid = {{}}, items = {{}}, nextId = 0, current = null;
+    var tooltip = L.tooltip({{sticky: true, direction: 'top', offset: [0, -8]}});
+
+    function baseStyle(p) {{
+        var s = styles[p.duration];
+        return {{fillColor: p.color, color: '#000000', weight: s.weight,
+                 fillOpacity: s.fillOpacity, dashArray: s.dashArray}};
+    }}
+
+    function highlightStyle(p) {{
+        var s = styles[p.duration];
+        return {{fillColor: p.color, color: '#FF4444', weight: s.weight + 3,
+                 fillOpacity: Math.min(s.fillOpacity + 0.4, 0.9), dashArray: null}};
+    }}
+
+    function forCells(b, fn) {{
+        var x0 = Math.floor(b.getWest() / cellSize), x1 = Math.floor(b.getEast() / cellSize);
+        var y0 = Math.floor(b.getSouth() / cellSize), y1 = Math.floor(b.getNorth() / cellSize);
+        for (var x = x0; x <= x1; x++) for (var y = y0; y <= y1; y++) fn(x + ':' + y);
+    }}
+
+    function rings(latlngs) {{
+        // Polygon [[anneau], [trou]...] ou MultiPolygon [[[anneau]...]...] -> liste d'anneaux
+        if (!latlngs.length || !Array.isArray(latlngs[0])) return [latlngs];
+        return latlngs.reduce(function(all, l) {{ return all.concat(rings(l)); }}, []);
+    }}
+
+    function contains(item, latlng) {{
+        // Règle pair-impair sur tous les anneaux (les trous inversent la parité)
+        var inside = false, x = latlng.lng, y = latlng.lat;
+        item.rings.forEach(function(ring) {{
+            for (var i = 0, j = ring.length - 1; i < ring.length; j = i++) {{
+                var a = ring[i], b = ring[j];
+                if ((a.lat > y) !== (b.lat > y) &&
+                    x < (b.lng - a.lng) * (y - a.lat) / (b.lat - a.lat) + a.lng) inside = !inside;
+            }}
+        }});
+        return inside;
+    }}
+
+    function add(layer, kind) {{
+        kind = kind || 'isochrone';
+        if (layer.eachLayer) {{
+            layer.eachLayer(function(l) {{ add(l, kind); }});
+            return;
+        }}
+        var b = layer.getBounds(), id = nextId++;
+        items[id] = {{layer: layer, p: layer.feature.properties, kind: kind,
+                     bounds: b, rings: rings(layer.getLatLngs()),
+                     area: (b.getEast() - b.getWest()) * (b.getNorth() - b.getSouth())}};
+        layer._survolId = id;
+        forCells(b, function(key) {{ (grid[key] = grid[key] || []).push(id); }});
+    }}
+
+    function remove(layer) {{
+        if (layer.eachLayer) {{
+            layer.eachLayer(remove);
+            return;
+        }}
+        var item = items[layer._survolId];
+        if (!item) return;
+        if (current === item) clear();
+        forCells(item.bounds, function(key) {{
+            grid[key] = grid[key].filter(function(id) {{ return id !== layer._survolId; }});
+        }});
+        delete items[layer._survolId];
+    }}
+
+    function hit(latlng) {{
+        var best = null;
+        (grid[Math.floor(latlng.lng / cellSize) + ':' + Math.floor(latlng.lat / cellSize)] || []).forEach(function(id) {{
+            var item = items[id];
+            if (item.area < (best ? best.area : Infinity) && map.hasLayer(item.layer)
+                && item.bounds.contains(latlng) && contains(item, latlng)) best = item;
+        }});
+        return best;
+    }}
+
+    function overMarker(e) {{
+        // Pointeur sur une station (marqueur ou cercle interactif) : la station a la priorité
+        var target = e.originalEvent && e.originalEvent.target;
+        return target && target.classList && target.classList.contains('leaflet-interactive');
+    }}
+
+    function clear() {{
+        if (current && current.kind === 'isochrone') current.layer.setStyle(baseStyle(current.p));
+        current = null;
+        map.closeTooltip(tooltip);
+    }}
+
+    map.on('mousemove', function(e) {{
+        var item = overMarker(e) ? null : hit(e.latlng);
+        if (item !== current) {{
+            clear();
+            if (item && item.kind === 'isochrone') item.layer.setStyle(highlightStyle(item.p));
+            current = item;
+        }}
+        if (item) map.openTooltip(tooltip.setContent(item.kind === 'couverture'
+            ? {TEMPLATES}.tooltipCouverture(item.p) : {TEMPLATES}.tooltipIsochrone(item.p)), e.latlng);
+    }});
+    map.on('mouseout', clear);
+
+    map.on('click', function(e) {{
+        var item = overMarker(e) ? null : hit(e.latlng);
+        if (item && item.kind === 'isochrone') L.popup({{maxWidth: 250}}).setLatLng(e.latlng).setContent({TEMPLATES}.popupIsochrone(item.p)).openOn(map);
+    }});
+
+    window.survolIsochrones = {{add: add, remove: remove, baseStyle: baseStyle}};
+    [{', '.join(layer_names)}].forEach(function(layer) {{ add(layer); }});
+}})();
+"""
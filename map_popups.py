@@ -0,0 +1,139 @@
+import json
+import re
+import pandas as pd
+from territoires import rattachement
+
+# Popups et tooltips de carte_finale.html
+# Une table des stations (JSON, une ligne par station) et quelques modèles JS
+# remplacent le HTML recopié dans chaque isochrone et chaque marqueur : une
+# feature porte seulement l'indice de sa station (propriété 'station'), un
+# marqueur l'option Leaflet 'station'. Le HTML est construit par le navigateur
+# à l'ouverture du popup ou du tooltip.
+#
+#   stations, index = station_table(df_sorted)
+#   1. templates_script(stations, DURATION_LABELS)   après la carte (TABLE, TEMPLATES)
+#   2. feature['properties'] = {'station': index[nom], 'color': ..., 'duration': ...}
+#      marker.options['station'] = index[nom]
+#   3. bind_script([groupes])                         après les groupes de marqueurs
+#
+# Ligne de la table : [nom, nom court, territoire, couleur, type, contacts]
+# (contacts sans numéros de téléphone ; les 5 rôles pour ICI, le contact principal sinon)
+
+TABLE = 'stationsCarte'
+TEMPLATES = 'modelesCarte'
+CONTACT_COLUMNS = ['Contact_Principal', 'RedChef', 'RedChefAdj', 'RespProg', 'RespTech']
+
+
+# Fonction pour retirer les numéros de téléphone
+def remove_phone(text):
+    if pd.isna(text) or text == '0' or text == 'nan':
+        return ''
+    # Supprimer les numéros de téléphone (formats français)
+    text = str(text)
+    text = re.sub(r'\d{2}[-.\s]?\d{2}[-.\s]?\d{2}[-.\s]?\d{2}[-.\s]?\d{2}', '', text)
+    text = re.sub(r'\d{10}', '', text)
+    text = re.sub(r'\d{2}\s\d{2}\s\d{2}\s\d{2}\s\d{2}', '', text)
+    return text.strip()
+
+
+def short_name(station):
+    return station.replace('ici ', '').replace('RER ', '')
+
+
+def station_table(stations):
+    # (lignes de la table, {nom de station: indice}) dans l'ordre du DataFrame
+    rows, index = [], {}
+    for row in stations.to_dict('records'):
+        station, station_type = row['Nom_Station'], row['Type']
+        territoire, color, _ = rattachement(station, row['Territoire'], station_type)
+        columns = CONTACT_COLUMNS if station_type == 'ICI' else CONTACT_COLUMNS[:1]
+        index[station] = len(rows)
+        rows.append([station, short_name(station), territoire, color, station_type,
+                     [remove_phone(row.get(c)) for c in columns]])
+    return rows, index
+
+
+def templates_script(stations, labels):
+    table = json.dumps(stations, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    return f"""
+var {TABLE} = {table};
+var {TEMPLATES} = (function() {{
+    var labels = {json.dumps(labels)};
+    var roles = ['👤 Directeur', '✏️ Réd. Chef', '🔧 Réd. Chef Adj', '📺 Resp. Prog', '⚙️ Resp. Tech'];
+    var hint = '<hr style="margin:10px 0"><div style="text-align:center; font-size:11px; color:#666;">' +
+        '<i>💡 Survolez les zones colorées pour voir les isochrones</i></div>';
+
+    function esc(text) {{
+        return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+    }}
+
+    function station(i) {{
+        var r = {TABLE}[i];
+        return {{nom: esc(r[0]), court: esc(r[1]), territoire: esc(r[2]), couleur: r[3], type: r[4],
+                 contacts: r[5].map(esc)}};
+    }}
+
+    function popupStation(i) {{
+        var s = station(i), ici = s.type === 'ICI';
+        var html = '<div style="width:' + (ici ? 280 : 250) + 'px">' +
+            '<h4 style="margin:0 0 10px 0; color:' + s.couleur + '; text-align:center;">' + s.nom + '</h4>' +
+            '<div style="background:#f8f9fa; padding:10px; border-radius:5px; margin-bottom:10px;">' +
+            '<b>🏢 Territoire:</b> ' + s.territoire + '<br>';
+        if (ici) {{
+            html += '<b>📍 Couverture:</b> 30min à 2h de transport</div><hr style="margin:10px 0">' +
+                '<div style="font-size:13px;">' +
+                s.contacts.map(function(c, k) {{ return '<b>' + roles[k] + ':</b> ' + c; }}).join('<br>') +
+                '</div>';
+        }} else {{
+            html += (s.type === 'RER' ? '<b>📻 Type:</b> RER (Radio locale)' : '<b>🏢 Type:</b> Bureau') +
+                '</div><hr style="margin:10px 0"><b>📞 Contact:</b> ' + s.contacts[0];
+        }}
+        return html + hint + '</div>';
+    }}
+
+    function tooltipStation(i) {{
+        var s = station(i);
+        return '<b>' + s.court + '</b><br>' + s.territoire + '<br><i>Cliquez pour plus d\\'infos</i>';
+    }}
+
+    function tooltipIsochrone(p) {{
+        return station(p.station).court + ' - ' + labels[p.duration];
+    }}
+
+    function tooltipCouverture(p) {{
+        // Zone fusionnée d'un territoire (coverage.py) : pas d'indice de station
+        return '<b>' + esc(p.territoire) + '</b> - ' + labels[p.duration] +
+            '<br><b>Stations :</b> ' + p.stations +
+            '<br><b>Aire couverte :</b> ' + p.area_km2 + ' km²' +
+            '<br><b>Recouvrement :</b> ' + p.overlap_km2 + ' km²';
+    }}
+
+    function popupIsochrone(p) {{
+        var s = station(p.station);
+        return '<div style="width:200px; text-align:center;">' +
+            '<h4 style="margin:5px 0; color:' + s.couleur + '">' + s.court + '</h4>' +
+            '<p style="margin:5px 0;"><b>Territoire:</b> ' + s.territoire + '</p>' +
+            '<p style="margin:5px 0;"><b>Couverture:</b> ' + labels[p.duration] + '</p>' +
+            '<hr style="margin:8px 0;">' +
+            '<small><i>Cliquez sur la station pour plus d\\'infos</i></small></div>';
+    }}
+
+    return {{popupStation: popupStation, tooltipStation: tooltipStation,
+             tooltipIsochrone: tooltipIsochrone, popupIsochrone: popupIsochrone,
+             tooltipCouverture: tooltipCouverture}};
+}})();
+"""
+
+
+def bind_script(group_names):
+    # Popup et tooltip de chaque marqueur portant l'option 'station', construits à l'ouverture
+    return f"""
+[{', '.join(group_names)}].forEach(function(group) {{
+    group.eachLayer(function(layer) {{
+        var i = layer.options.station;
+        if (i === undefined) return;
+        layer.bindPopup(function() {{ return {TEMPLATES}.popupStation(i); }}, {{maxWidth: 320}});
+        layer.bindTooltip(function() {{ return {TEMPLATES}.tooltipStation(i); }}, {{sticky: true}});
+    }});
+}});
+"""
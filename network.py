@@ -0,0 +1,233 @@
+import json
+import os
+import pickle
+import shutil
+from functools import cached_property
+import pandas as pd
+from station_index import StationIndex
+from attribution import attribute_cached, INSIDE, CACHE_VERSION as ATTRIBUTION_VERSION
+from geometry_store import GeometryStore
+from simplification import simplify_store, SIMPLIFICATION_VERSION
+from instrumentation import span
+
+# Couche de données commune à tous les scripts de carte et d'export :
+# stations + isochrones indexés par station et par durée, chargés à la demande,
+# avec un instantané binaire pour éviter de re-parser le GeoJSON.
+#
+#   net = Network.load()
+#   net.stations                    # DataFrame des stations géocodées
+#   net.geometries('30')            # GeometryStore (coordonnées en tableaux NumPy)
+#   net.isochrones('30')            # FeatureCollection, stations attribuées
+#   net.simplified('30', tol)       # GeometryStore simplifiée (Douglas-Peucker)
+#   net.feature_ids['ici Paris ']['90']   # indices dans net.geometries('90')
+#   net.by_station()['ici Paris ']['90']  # mêmes isochrones, en features GeoJSON
+#
+# L'instantané est un dossier : métadonnées en pickle + une GeometryStore
+# par durée en .npy, relue en mmap (vues sans copie sur les coordonnées).
+# Il est reconstruit si un fichier source change (taille, date) ou si l'une des
+# versions ci-dessous change : attributions et versions simplifiées y sont figées.
+
+STATIONS_FILE = 'all_stations_geocoded.csv'
+ISOCHRONES_FILE = 'isochrones_{}min.geojson'
+SNAPSHOT_DIR = 'network_snapshot'
+DURATIONS = ['30', '60', '90', '120']
+MAX_DISTANCE_KM = 50  # Repli sur la station la plus proche au-delà : isochrone exclue
+SNAPSHOT_VERSION = 1  # À incrémenter quand le contenu de l'instantané change
+
+
+class Network:
+    def __init__(self, stations_file=STATIONS_FILE, isochrones_file=ISOCHRONES_FILE,
+                 durations=DURATIONS, max_km=MAX_DISTANCE_KM):
+        self.stations_file = stations_file
+        self.isochrones_file = isochrones_file
+        self.durations = list(durations)
+        self.max_km = max_km
+        self.snapshot_dir = None
+        self._stores = {}
+        self._simplified = {}
+        self._isochrones = {}
+        self._by_station = {}
+        self._report = {}
+
+    # ---------- Chargement ----------
+
+    @classmethod
+    def load(cls, snapshot=SNAPSHOT_DIR, **kwargs):
+        # Réutilise l'instantané s'il correspond aux fichiers sources actuels
+        net = cls(**kwargs)
+        if snapshot and os.path.isdir(snapshot):
+            try:
+                cached = cls.load_snapshot(snapshot)
+            except Exception:
+                cached = None
+            if cached is not None and cached.source_fingerprint() == cached._fingerprint \
+                    and cached._params() == net._params():
+                return cached
+        if snapshot:
+            net.save_snapshot(snapshot)
+        return net
+
+    def _params(self):
+        return (self.stations_file, self.isochrones_file, self.durations, self.max_km)
+
+    def source_files(self):
+        return [self.stations_file] + [self.isochrones_file.format(d) for d in self.durations]
+
+    def source_fingerprint(self):
+        # Fichiers sources et versions du code qui a calculé l'instantané
+        fingerprint = [('versions', SNAPSHOT_VERSION, ATTRIBUTION_VERSION, SIMPLIFICATION_VERSION)]
+        for path in self.source_files():
+            if os.path.exists(path):
+                st = os.stat(path)
+                fingerprint.append((path, st.st_size, st.st_mtime_ns))
+            else:
+                fingerprint.append((path, None, None))
+        return fingerprint
+
+    @cached_property
+    def stations(self):
+        return pd.read_csv(self.stations_file, sep=';')
+
+    @cached_property
+    def station_index(self):
+        return StationIndex.from_dataframe(self.stations)
+
+    @cached_property
+    def station_territoire(self):
+        return dict(zip(self.stations['Nom_Station'], self.stations['Territoire']))
+
+    def geometries(self, duration):
+        duration = str(duration)
+        if duration not in self._stores:
+            if self.snapshot_dir:
+                self._stores[duration] = GeometryStore.load(os.path.join(self.snapshot_dir, f'{duration}min'))
+            else:
+                self._stores[duration] = self._parse(duration)
+        return self._stores[duration]
+
+    def _parse(self, duration):
+        path = self.isochrones_file.format(duration)
+        features = []
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                features = json.load(f)['features']
+        self._attribute(duration, features)
+        return GeometryStore.from_features(features)
+
+    def _attribute(self, duration, features):
+        # Les isochrones issus de TravelTime portent déjà leur station ;
+        # ceux extraits du HTML (30/60 min) sont attribués par point-dans-polygone
+        to_assign = [(i, f) for i, f in enumerate(features) if not f['properties'].get('station')]
+        self._report[duration] = []
+        if not to_assign:
+            return
+        with span('association'):
+            stations, statuses, candidates = attribute_cached(
+                [f for _, f in to_assign], self.station_index, self.max_km,
+                cache_file=f'association_cache_{duration}min.json'
+            )
+        for (i, feature), station, status, cands in zip(to_assign, stations, statuses, candidates):
+            feature['properties']['station'] = station or 'EXCLUDE'
+            if status != INSIDE:
+                self._report[duration].append((duration, i, status, station, cands))
+
+    def simplified(self, duration, tolerance):
+        key = (str(duration), tolerance)
+        if key not in self._simplified:
+            prefix = self._simplified_prefix(*key)
+            if prefix and os.path.exists(f'{prefix}.coords.npy'):
+                self._simplified[key] = GeometryStore.load(prefix)
+            else:
+                with span('simplification'):
+                    self._simplified[key] = simplify_store(self.geometries(duration), tolerance)
+        return self._simplified[key]
+
+    def _simplified_prefix(self, duration, tolerance):
+        if not self.snapshot_dir:
+            return None
+        return os.path.join(self.snapshot_dir, f'{duration}min_tol{tolerance:.6e}')
+
+    def save_simplified(self, duration, tolerance):
+        # Écrit la version simplifiée dans l'instantané : les processus d'export
+        # la relisent en mmap au lieu de refaire Douglas-Peucker chacun de leur côté
+        prefix = self._simplified_prefix(str(duration), tolerance)
+        if prefix and not os.path.exists(f'{prefix}.coords.npy'):
+            self.simplified(duration, tolerance).save(prefix)
+
+    def isochrones(self, duration, tolerance=None):
+        # FeatureCollection GeoJSON reconstruite depuis la GeometryStore
+        # (simplifiée si une tolérance est donnée)
+        key = (str(duration), tolerance)
+        if key not in self._isochrones:
+            store = self.simplified(duration, tolerance) if tolerance else self.geometries(duration)
+            self._isochrones[key] = store.to_geojson()
+        return self._isochrones[key]
+
+    # ---------- Index dérivés (mémoïsés) ----------
+
+    @cached_property
+    def feature_ids(self):
+        # {station: {durée: [indices de features]}}
+        index = {station: {d: [] for d in self.durations} for station in self.stations['Nom_Station']}
+        for duration in self.durations:
+            for i, properties in enumerate(self.geometries(duration).properties):
+                station = properties.get('station', '')
+                if station in index:
+                    index[station][duration].append(i)
+        return index
+
+    def by_station(self, tolerance=None):
+        # {station: {durée: [features]}}
+        if tolerance not in self._by_station:
+            self._by_station[tolerance] = {
+                station: {d: [self.isochrones(d, tolerance)['features'][i] for i in ids]
+                          for d, ids in durations.items()}
+                for station, durations in self.feature_ids.items()
+            }
+        return self._by_station[tolerance]
+
+    @property
+    def attribution_report(self):
+        for duration in self.durations:
+            self.geometries(duration)
+        return [row for d in self.durations for row in self._report.get(d, [])]
+
+    # ---------- Instantané binaire ----------
+
+    def __getstate__(self):
+        # Les géométries sont écrites à part (.npy) ; on ne picke que les métadonnées
+        state = self.__dict__.copy()
+        for key in ('_stores', '_simplified', '_isochrones', '_by_station'):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stores = {}
+        self._simplified = {}
+        self._isochrones = {}
+        self._by_station = {}
+
+    def save_snapshot(self, path=SNAPSHOT_DIR):
+        # Force le chargement complet avant de sérialiser ; les versions simplifiées
+        # d'un ancien instantané sont supprimées avec lui
+        for duration in self.durations:
+            self.geometries(duration)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        for duration in self.durations:
+            self.geometries(duration).save(os.path.join(path, f'{duration}min'))
+        self.feature_ids
+        self.station_territoire
+        self._fingerprint = self.source_fingerprint()
+        with open(os.path.join(path, 'meta.pkl'), 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.snapshot_dir = path
+
+    @staticmethod
+    def load_snapshot(path=SNAPSHOT_DIR):
+        with open(os.path.join(path, 'meta.pkl'), 'rb') as f:
+            net = pickle.load(f)
+        net.snapshot_dir = path
+        return net
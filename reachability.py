@@ -0,0 +1,129 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import shapely
+from network import Network
+from coverage import store_geometries
+
+# Quelles stations atteignent un lieu en 30 / 60 / 90 / 120 min ?
+#   python reachability.py --point 45.76 4.84                 # un point (lat lon)
+#   python reachability.py --communes communes.csv            # toutes les communes d'un CSV
+#
+# Toutes les isochrones (toutes durées) sont rangées dans un seul R-tree
+# (STRtree de shapely, empaquetage STR) ; une requête par lot teste tous les
+# points d'un coup en C (boîtes englobantes puis point-dans-polygone exact).
+#
+#   index = ReachabilityIndex(Network.load())
+#   index.query_point(4.84, 45.76)   # {'30': ['ici Lyon '], '60': [...], ...}
+
+OUTPUT_FILE = 'accessibilite_communes.csv'
+LAT_COLUMNS = ['latitude', 'lat', 'latitude_centre', 'y']
+LON_COLUMNS = ['longitude', 'lon', 'lng', 'longitude_centre', 'x']
+CODE_COLUMNS = ['code_commune_insee', 'code_insee', 'insee', 'codgeo', 'code_commune', 'code']
+NAME_COLUMNS = ['nom_commune_complet', 'nom_commune', 'nom_standard', 'nom', 'libelle']
+
+
+class ReachabilityIndex:
+    def __init__(self, net, durations=None):
+        self.durations = list(durations or net.durations)
+        self.stations = list(net.stations['Nom_Station'])
+        station_ids = {name: k for k, name in enumerate(self.stations)}
+        geometries, duration_of, station_of = [], [], []
+        for d, duration in enumerate(self.durations):
+            store = net.geometries(duration)
+            for geometry, properties in zip(store_geometries(store), store.properties):
+                station = station_ids.get(properties.get('station'))
+                if geometry is not None and station is not None:
+                    geometries.append(geometry)
+                    duration_of.append(d)
+                    station_of.append(station)
+        self.geometries = np.array(geometries, dtype=object)
+        self.duration_of = np.array(duration_of, dtype=np.int64)
+        self.station_of = np.array(station_of, dtype=np.int64)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def query_pairs(self, lons, lats):
+        # Couples (indice du point, indice de durée, indice de station), sans doublon,
+        # triés par point puis durée puis station
+        points = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        point_idx, geometry_idx = self.tree.query(points, predicate='intersects')
+        # Une clé entière par couple : un seul np.unique 1D trie et dédoublonne
+        n_durations, n_stations = len(self.durations), len(self.stations)
+        keys = np.unique((point_idx * n_durations + self.duration_of[geometry_idx]) * n_stations
+                         + self.station_of[geometry_idx])
+        point_duration, station = np.divmod(keys, n_stations)
+        point, duration = np.divmod(point_duration, n_durations)
+        return point, duration, station
+
+    def query(self, lons, lats):
+        # Pour chaque point : {durée: [stations]} (listes vides si aucune)
+        results = [{duration: [] for duration in self.durations} for _ in range(len(lons))]
+        for p, d, s in zip(*(a.tolist() for a in self.query_pairs(lons, lats))):
+            results[p][self.durations[d]].append(self.stations[s])
+        return results
+
+    def query_point(self, lon, lat):
+        return self.query([lon], [lat])[0]
+
+
+def find_column(columns, candidates):
+    lowered = {c.lower(): c for c in columns}
+    return next((lowered[c] for c in candidates if c in lowered), None)
+
+
+def read_communes(path):
+    # CSV de communes (séparateur ; ou ,) avec au moins latitude / longitude ;
+    # code INSEE et nom repris s'ils sont présents
+    with open(path, 'r', encoding='utf-8') as f:
+        header = f.readline()
+    df = pd.read_csv(path, sep=';' if header.count(';') > header.count(',') else ',', dtype=str)
+    lat, lon = find_column(df.columns, LAT_COLUMNS), find_column(df.columns, LON_COLUMNS)
+    if lat is None or lon is None:
+        raise ValueError(f"{path} : colonnes latitude / longitude introuvables ({', '.join(df.columns)})")
+    code, name = find_column(df.columns, CODE_COLUMNS), find_column(df.columns, NAME_COLUMNS)
+    communes = pd.DataFrame({
+        'code': df[code] if code else df.index.astype(str),
+        'nom': df[name] if name else '',
+        'latitude': pd.to_numeric(df[lat].str.replace(',', '.'), errors='coerce'),
+        'longitude': pd.to_numeric(df[lon].str.replace(',', '.'), errors='coerce'),
+    })
+    return communes.dropna(subset=['latitude', 'longitude']).reset_index(drop=True)
+
+
+def communes_table(index, communes):
+    # Une ligne par commune, une colonne par durée (stations séparées par " | ")
+    results = index.query(communes['longitude'], communes['latitude'])
+    table = communes.copy()
+    for duration in index.durations:
+        table[f'{duration}min'] = [' | '.join(r[duration]) for r in results]
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stations qui atteignent un lieu, par durée")
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--point', nargs=2, type=float, metavar=('LAT', 'LON'), help="un lieu")
+    where.add_argument('--communes', metavar='CSV', help="CSV de communes (latitude, longitude, code, nom)")
+    parser.add_argument('--sortie', default=OUTPUT_FILE, help=f"CSV produit avec --communes (défaut : {OUTPUT_FILE})")
+    args = parser.parse_args()
+
+    start = time.time()
+    index = ReachabilityIndex(Network.load())
+    print(f"🌲 Index : {len(index.geometries)} isochrones ({time.time() - start:.1f}s)")
+
+    if args.point:
+        lat, lon = args.point
+        for duration, stations in index.query_point(lon, lat).items():
+            print(f"   {duration:>3} min : {', '.join(s.strip() for s in stations) or '—'}")
+    else:
+        communes = read_communes(args.communes)
+        start = time.time()
+        table = communes_table(index, communes)
+        elapsed = time.time() - start
+        table.to_csv(args.sortie, sep=';', index=False)
+        print(f"✅ {len(table)} communes traitées en {elapsed:.2f}s -> {args.sortie}")
+        for duration in index.durations:
+            covered = (table[f'{duration}min'] != '').sum()
+            print(f"   {duration:>3} min : {covered} communes desservies ({covered / max(len(table), 1):.0%})")
@@ -0,0 +1,178 @@
+import heapq
+import os
+from array import array
+import xml.etree.ElementTree as ET
+import numpy as np
+from station_index import StationIndex, haversine_km
+
+# Graphe routier local pour calculer les isochrones sans TravelTime
+# Source : un extrait OpenStreetMap (.osm, XML) téléchargé une fois
+# (ex. Geofabrik / Overpass, voies highway=*). Le graphe est mis en cache
+# dans un .npz à côté (CSR : indptr / indices / secondes) pour ne parser
+# le XML qu'une fois.
+#
+#   graph = RoadGraph.load_cached('france.osm')
+#   sources, offsets = graph.snap(lon, lat)
+#   nodes, seconds = graph.dijkstra(sources, offsets, max_seconds=7200)
+
+# Vitesses moyennes (km/h) par type de voie ; les autres voies sont ignorées
+SPEEDS_KMH = {
+    'motorway': 110, 'motorway_link': 60,
+    'trunk': 90, 'trunk_link': 50,
+    'primary': 70, 'primary_link': 40,
+    'secondary': 60, 'secondary_link': 40,
+    'tertiary': 50, 'tertiary_link': 30,
+    'unclassified': 40, 'residential': 30, 'living_street': 10, 'service': 20,
+}
+ACCESS_KMH = 15   # de la station au nœud routier le plus proche
+
+
+def _osm_elements(path, tag):
+    # Éléments <tag> de premier niveau d'un fichier OSM, en flux. La racine est
+    # vidée après chaque élément : elem.clear() seul laisse les éléments vides
+    # attachés à la racine, et l'arbre grossit avec le fichier.
+    context = ET.iterparse(path, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event == 'end' and elem.tag in ('node', 'way', 'relation'):
+            if elem.tag == tag:
+                yield elem
+            root.clear()
+
+
+class RoadGraph:
+    def __init__(self, lons, lats, indptr, indices, seconds):
+        self.lons = lons
+        self.lats = lats
+        self.indptr = indptr
+        self.indices = indices
+        self.seconds = seconds
+        self._index = None
+        self._adjacency = None
+
+    def __len__(self):
+        return len(self.lons)
+
+    # ---------- Construction depuis OSM ----------
+
+    @classmethod
+    def from_osm(cls, path, speeds=SPEEDS_KMH):
+        # Lecture en flux (iterparse) en deux passages : les voies routières d'abord,
+        # puis les seuls nœuds qu'elles utilisent (bâtiments, points d'intérêt,
+        # chemins... ne sont jamais gardés en mémoire)
+        edges_from, edges_to, edges_speed = array('q'), array('q'), array('d')
+        for elem in _osm_elements(path, 'way'):
+            tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+            speed = speeds.get(tags.get('highway'))
+            if speed:
+                refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                oneway = tags.get('oneway', 'yes' if tags['highway'].startswith('motorway') else 'no')
+                if oneway == '-1':
+                    refs.reverse()
+                for a, b in zip(refs[:-1], refs[1:]):
+                    edges_from.append(a)
+                    edges_to.append(b)
+                    edges_speed.append(speed)
+                    if oneway not in ('yes', '1', 'true', '-1'):
+                        edges_from.append(b)
+                        edges_to.append(a)
+                        edges_speed.append(speed)
+        edges_from = np.frombuffer(edges_from, dtype=np.int64)
+        edges_to = np.frombuffer(edges_to, dtype=np.int64)
+        edges_speed = np.frombuffer(edges_speed, dtype=float)
+
+        wanted = set(np.unique(np.concatenate([edges_from, edges_to])).tolist())
+        node_ids, node_lons, node_lats = array('q'), array('d'), array('d')
+        for elem in _osm_elements(path, 'node'):
+            node_id = int(elem.get('id'))
+            if node_id in wanted:
+                node_ids.append(node_id)
+                node_lons.append(float(elem.get('lon')))
+                node_lats.append(float(elem.get('lat')))
+        del wanted
+
+        # Voies coupées au bord de l'extrait : arêtes vers des nœuds absents ignorées
+        node_ids = np.frombuffer(node_ids, dtype=np.int64)
+        known = np.isin(edges_from, node_ids) & np.isin(edges_to, node_ids)
+        edges_from, edges_to, edges_speed = edges_from[known], edges_to[known], edges_speed[known]
+
+        # Renumérotation compacte des nœuds utilisés par au moins une voie
+        order = np.argsort(node_ids)
+        node_ids = node_ids[order]
+        lons = np.frombuffer(node_lons, dtype=float)[order]
+        lats = np.frombuffer(node_lats, dtype=float)[order]
+        src = np.searchsorted(node_ids, edges_from)
+        dst = np.searchsorted(node_ids, edges_to)
+        used = np.unique(np.concatenate([src, dst]))
+        remap = np.full(len(node_ids), -1, dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        src, dst, lons, lats = remap[src], remap[dst], lons[used], lats[used]
+
+        length_km = haversine_km(lats[src], lons[src], lats[dst], lons[dst])
+        seconds = length_km / edges_speed * 3600
+        return cls.from_edges(lons, lats, src, dst, seconds)
+
+    @classmethod
+    def from_edges(cls, lons, lats, src, dst, seconds):
+        order = np.argsort(src, kind='stable')
+        indptr = np.zeros(len(lons) + 1, dtype=np.int64)
+        np.add.at(indptr, src + 1, 1)
+        return cls(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float), np.cumsum(indptr),
+                   np.asarray(dst, dtype=np.int64)[order], np.asarray(seconds, dtype=np.float32)[order])
+
+    # ---------- Cache .npz ----------
+
+    def save(self, path):
+        np.savez(path, lons=self.lons, lats=self.lats, indptr=self.indptr,
+                 indices=self.indices, seconds=self.seconds)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['lons'], data['lats'], data['indptr'], data['indices'], data['seconds'])
+
+    @classmethod
+    def load_cached(cls, path):
+        # .osm -> .npz à côté, reconstruit seulement si l'extrait OSM est plus récent
+        if path.endswith('.npz'):
+            return cls.load(path)
+        cache = os.path.splitext(path)[0] + '.graph.npz'
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+            return cls.load(cache)
+        graph = cls.from_osm(path)
+        graph.save(cache)
+        return graph
+
+    # ---------- Requêtes ----------
+
+    def snap(self, lon, lat, access_kmh=ACCESS_KMH):
+        # Nœud le plus proche de la station et temps d'accès depuis la station (s)
+        if self._index is None:
+            self._index = StationIndex(range(len(self)), self.lats, self.lons, cell_deg=0.05)
+        idx, dist = self._index.nearest([lat], [lon])
+        return idx, dist / access_kmh * 3600
+
+    def dijkstra(self, sources, offsets, max_seconds):
+        # Plus courts chemins depuis plusieurs sources (temps de départ = offsets),
+        # bornés à max_seconds : (nœuds atteints, secondes)
+        if self._adjacency is None:
+            # memoryview : accès élément par élément en objets Python, sans copie en listes
+            self._adjacency = tuple(memoryview(np.ascontiguousarray(a))
+                                    for a in (self.indptr, self.indices, self.seconds))
+        indptr, indices, seconds = self._adjacency
+        best = {}
+        heap = [(float(t), int(s)) for s, t in zip(sources, offsets) if t <= max_seconds]
+        heapq.heapify(heap)
+        while heap:
+            t, node = heapq.heappop(heap)
+            if node in best:
+                continue
+            best[node] = t
+            for e in range(indptr[node], indptr[node + 1]):
+                nxt = indices[e]
+                arrival = t + seconds[e]
+                if arrival <= max_seconds and nxt not in best:
+                    heapq.heappush(heap, (arrival, nxt))
+        nodes = np.fromiter(best.keys(), dtype=np.int64, count=len(best))
+        times = np.fromiter(best.values(), dtype=float, count=len(best))
+        return nodes, times
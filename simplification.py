@@ -0,0 +1,153 @@
+import json
+import numpy as np
+from geometry_store import GeometryStore
+
+# Simplification des anneaux d'isochrones (Douglas-Peucker)
+# - tolérance exprimée en degrés de latitude, longitudes corrigées par cos(lat)
+# - anneaux toujours fermés, au moins 4 sommets, sans auto-intersection :
+#   si la version simplifiée est invalide on divise la tolérance par 2,
+#   et on garde l'anneau d'origine en dernier recours
+# - une tolérance par niveau de zoom (≈ un demi-pixel Web Mercator)
+
+MIN_RING_POINTS = 4
+SIMPLIFICATION_VERSION = 1   # À incrémenter quand l'algorithme change (instantané de network.py)
+
+
+def tolerance_for_zoom(zoom, pixels=0.5):
+    # Taille d'un pixel de tuile 256 px au niveau de zoom donné, en degrés
+    return pixels * 360.0 / (256 * 2 ** zoom)
+
+
+ZOOM_TOLERANCES = {zoom: tolerance_for_zoom(zoom) for zoom in range(4, 13)}
+KML_TOLERANCE = ZOOM_TOLERANCES[11]   # Google Earth : on zoome sur une station
+MAP_TOLERANCE = ZOOM_TOLERANCES[10]   # carte_finale.html : vue France à ville
+
+
+def _projected(ring):
+    ring = np.asarray(ring, dtype=float)
+    scale = np.cos(np.radians(ring[:, 1].mean()))
+    return np.column_stack([ring[:, 0] * scale, ring[:, 1]])
+
+
+def douglas_peucker_mask(points, tolerance):
+    # Masque des sommets conservés ; chaque découpage traite son segment en bloc
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        a, b = points[start], points[end]
+        rel = points[start + 1:end] - a
+        d = b - a
+        length = np.hypot(d[0], d[1])
+        if length == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(d[0] * rel[:, 1] - d[1] * rel[:, 0]) / length
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            i = start + 1 + k
+            keep[i] = True
+            stack.append((start, i))
+            stack.append((i, end))
+    return keep
+
+
+def _orient(a, b, c):
+    return np.sign((b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1])
+                   - (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0]))
+
+
+def ring_is_valid(ring, chunk=256):
+    # Fermé, assez de sommets, et aucune paire d'arêtes non adjacentes qui se croise.
+    # Les arêtes sont triées par x minimal : chaque paquet n'est comparé qu'aux
+    # arêtes dont l'intervalle en x le recouvre.
+    ring = np.asarray(ring, dtype=float)
+    if len(ring) < MIN_RING_POINTS or not np.array_equal(ring[0], ring[-1]):
+        return False
+    p, q = ring[:-1], ring[1:]
+    m = len(p)
+    if m < 4:
+        return True
+
+    min_x = np.minimum(p[:, 0], q[:, 0])
+    max_x = np.maximum(p[:, 0], q[:, 0])
+    order = np.argsort(min_x)
+    for s in range(0, m, chunk):
+        i = order[s:s + chunk]
+        j = np.flatnonzero((min_x <= max_x[i].max()) & (max_x >= min_x[i].min()))
+        p1, q1 = p[i][:, None, :], q[i][:, None, :]
+        p2, q2 = p[j][None, :, :], q[j][None, :, :]
+        crosses = ((_orient(p1, q1, p2) * _orient(p1, q1, q2) < 0)
+                   & (_orient(p2, q2, p1) * _orient(p2, q2, q1) < 0))
+        # Arêtes adjacentes (y compris la première et la dernière) : pas un croisement
+        gap = np.abs(i[:, None] - j[None, :])
+        if np.any(crosses & (gap > 1) & (gap != m - 1)):
+            return False
+    return True
+
+
+def simplify_ring(ring, tolerance, max_halvings=4):
+    ring = np.asarray(ring)
+    if tolerance <= 0 or len(ring) <= MIN_RING_POINTS:
+        return ring
+    points = _projected(ring)
+    for _ in range(max_halvings + 1):
+        simplified = ring[douglas_peucker_mask(points, tolerance)]
+        if ring_is_valid(simplified):
+            return simplified
+        tolerance /= 2
+    return ring
+
+
+def simplify_store(store, tolerance):
+    # Nouvelle GeometryStore simplifiée (mêmes features, mêmes propriétés)
+    rings = []
+    ring_offsets = [0]
+    for r in range(len(store.ring_offsets) - 1):
+        simplified = simplify_ring(store.ring(r), tolerance)
+        rings.append(simplified)
+        ring_offsets.append(ring_offsets[-1] + len(simplified))
+    coords = np.concatenate(rings) if rings else np.empty((0, 2), dtype=store.coords.dtype)
+    return GeometryStore(
+        coords.astype(store.coords.dtype), np.array(ring_offsets, dtype=np.int64),
+        np.asarray(store.part_offsets), np.asarray(store.feature_offsets),
+        np.asarray(store.geom_types), store.properties
+    )
+
+
+def simplification_stats(original, simplified, feature_ids):
+    # Sommets et octets GeoJSON avant / après pour un ensemble de features
+    ids = np.asarray(list(feature_ids), dtype=np.int64)
+    stats = {'vertices_before': int(original.vertex_counts()[ids].sum()),
+             'vertices_after': int(simplified.vertex_counts()[ids].sum()),
+             'bytes_before': 0, 'bytes_after': 0}
+    for i in ids.tolist():
+        for part_before, part_after in zip(original.feature_parts(i), simplified.feature_parts(i)):
+            for before, after in zip(part_before, part_after):
+                stats['bytes_before'] += len(json.dumps(before.tolist()))
+                stats['bytes_after'] += len(json.dumps(after.tolist()))
+    return stats
+
+
+def station_report(net, tolerance, filename):
+    # Rapport CSV par station des gains de la simplification, toutes durées confondues
+    totals = {'vertices_before': 0, 'vertices_after': 0, 'bytes_before': 0, 'bytes_after': 0}
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write('Nom_Station;Sommets_avant;Sommets_apres;Octets_avant;Octets_apres\n')
+        for station, durations in net.feature_ids.items():
+            row = dict.fromkeys(totals, 0)
+            for duration, ids in durations.items():
+                stats = simplification_stats(net.geometries(duration), net.simplified(duration, tolerance), ids)
+                for key in row:
+                    row[key] += stats[key]
+            for key in totals:
+                totals[key] += row[key]
+            f.write(f"{station};{row['vertices_before']};{row['vertices_after']};"
+                    f"{row['bytes_before']};{row['bytes_after']}\n")
+    return totals
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import numpy as np
+
+# Index spatial des stations pour associer les isochrones en un seul appel
+# vectorisé (grille régulière + distance haversine), au lieu d'un
+# df.iterrows() par polygone.
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.195
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # Distance orthodromique en km (tableaux NumPy, broadcasting accepté)
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def outer_ring(geometry):
+    # Anneau extérieur d'un Polygon, ou du premier polygone d'un MultiPolygon
+    if geometry['type'] == 'Polygon':
+        return geometry['coordinates'][0]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates'][0][0]
+    return None
+
+
+class StationIndex:
+    def __init__(self, names, lats, lons, cell_deg=0.5):
+        self.names = list(names)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.cell_deg = cell_deg
+
+        # Grille : stations triées par cellule + table (cellule -> début, fin)
+        cells = self._cells(self.lats, self.lons)
+        self.order = np.lexsort((cells[:, 1], cells[:, 0]))
+        sorted_cells = cells[self.order]
+        self.buckets = {}
+        if len(sorted_cells):
+            breaks = np.flatnonzero(np.any(np.diff(sorted_cells, axis=0) != 0, axis=1)) + 1
+            bounds = np.concatenate([[0], breaks, [len(sorted_cells)]])
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                self.buckets[tuple(sorted_cells[start])] = (start, end)
+        self.max_bucket = max((e - s for s, e in self.buckets.values()), default=0)
+
+    @classmethod
+    def from_dataframe(cls, df, cell_deg=0.5):
+        df = df.dropna(subset=['Latitude', 'Longitude'])
+        return cls(df['Nom_Station'], df['Latitude'], df['Longitude'], cell_deg)
+
+    def _cells(self, lats, lons):
+        return np.stack([np.floor(lats / self.cell_deg), np.floor(lons / self.cell_deg)], axis=1).astype(np.int64)
+
+    def fingerprint(self):
+        h = hashlib.sha1()
+        h.update(json.dumps(self.names).encode('utf-8'))
+        h.update(self.lats.tobytes())
+        h.update(self.lons.tobytes())
+        return h.hexdigest()
+
+    def _brute_force(self, lats, lons, chunk=2048):
+        idx = np.empty(len(lats), dtype=np.int64)
+        dist = np.empty(len(lats))
+        for s in range(0, len(lats), chunk):
+            d = haversine_km(lats[s:s + chunk, None], lons[s:s + chunk, None], self.lats[None, :], self.lons[None, :])
+            idx[s:s + chunk] = np.argmin(d, axis=1)
+            dist[s:s + chunk] = d[np.arange(len(d)), idx[s:s + chunk]]
+        return idx, dist
+
+    def nearest(self, lats, lons, max_km=None):
+        # Station la plus proche de chaque point : (indices, distances en km)
+        # Indice -1 si aucune station à moins de max_km.
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        n = len(lats)
+        idx = np.full(n, -1, dtype=np.int64)
+        dist = np.full(n, np.inf)
+        if n == 0 or not self.names:
+            return idx, dist
+
+        # Candidats = stations des 3×3 cellules voisines, en une matrice (points × candidats)
+        cells = self._cells(lats, lons)
+        width = 9 * self.max_bucket
+        candidates = np.full((n, width), -1, dtype=np.int64)
+        fill = np.zeros(n, dtype=np.int64)
+        for i, (cy, cx) in enumerate(cells):
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    bucket = self.buckets.get((cy + dy, cx + dx))
+                    if bucket:
+                        start, end = bucket
+                        candidates[i, fill[i]:fill[i] + end - start] = self.order[start:end]
+                        fill[i] += end - start
+
+        valid = candidates >= 0
+        safe = np.where(valid, candidates, 0)
+        d = haversine_km(lats[:, None], lons[:, None], self.lats[safe], self.lons[safe])
+        d = np.where(valid, d, np.inf)
+        best = np.argmin(d, axis=1)
+        idx = np.where(valid.any(axis=1), safe[np.arange(n), best], -1)
+        dist = d[np.arange(n), best]
+
+        # Le résultat de la grille n'est exact que si la station trouvée est plus
+        # proche que le bord du voisinage ; sinon on vérifie sur toutes les stations.
+        guaranteed = self.cell_deg * KM_PER_DEGREE * np.cos(np.radians(np.minimum(np.abs(lats) + self.cell_deg, 89.9)))
+        unsure = dist > guaranteed
+        if max_km is not None:
+            unsure &= guaranteed < max_km
+        if unsure.any():
+            idx[unsure], dist[unsure] = self._brute_force(lats[unsure], lons[unsure])
+
+        if max_km is not None:
+            too_far = dist > max_km
+            idx[too_far] = -1
+        return idx, dist
+
@@ -0,0 +1,78 @@
+# Territoires de rattachement des stations et couleurs associées,
+# partagés par la carte et les analyses de couverture
+
+COLORS = {
+    'Nord Est': '#e41a1c',
+    'Nord Ouest': '#377eb8',
+    'Centre': '#4daf4a',
+    'Est du Sud': '#984ea3',
+    'Sud Ouest': '#ff7f00',
+    'Sud Med': '#f0e130',
+    'Paris': '#a65628',
+    'RER': '#999999'
+}
+
+# Correspondance entre les anciens noms (dans le CSV) et les nouveaux noms
+TERRITOIRE_MAPPING = {
+    'Nord-Est': 'Nord Est',
+    'Nord-Ouest': 'Nord Ouest',
+    'Centre': 'Centre',
+    'Centre-Est': 'Est du Sud',
+    'Centre-Sud-Ouest': 'Sud Ouest',
+    'Sud-Med': 'Sud Med',
+    'Paris': 'Paris',
+    'RER': 'RER'
+}
+
+# Mapping des RER vers leur territoire de rattachement
+RER_TERRITOIRE_MAPPING = {
+    'RER EPINAL': 'Nord Est',
+    'RER TULLE': 'Centre',
+    'RER EVREUX': 'Nord Ouest',
+    'RER ANNECY': 'Est du Sud',
+    'RER ARRAS': 'Nord Est',
+    'RER BÉZIERS': 'Sud Med',
+    'RER TOULON': 'Sud Med',
+    'RER ANGOULÈME': 'Sud Ouest',
+    'RER MULHOUSE': 'Nord Est',
+    'RER ALÈS': 'Sud Med',
+    'RER VANNES': 'Nord Ouest',
+    'RER BOURGES': 'Centre',
+    'RER VESOUL': 'Est du Sud',
+    'RER AUBENAS': 'Est du Sud',
+    'RER CALAIS': 'Nord Est',
+    'RER COLMAR': 'Nord Est',
+    'RER LA ROCHE SUR YON': 'Nord Ouest',
+    'RER ARCACHON': 'Sud Ouest',
+    'RER SAINT-NAZAIRE': 'Nord Ouest',
+    'RER SAINT-BRIEUC': 'Nord Ouest',
+    'RER BREST': 'Nord Ouest',
+    'RER MENDE': 'Sud Med',
+    'RER LE HAVRE': 'Nord Ouest',
+    'RER DAX': 'Sud Ouest',
+    'RER MONTBÉLIARD': 'Nord Est',
+    'RER VALENCIENNES': 'Nord Est',
+    'RER BOURGOIN': 'Est du Sud',
+    'RER NIORT': 'Sud Ouest',
+    'RER SENS': 'Est du Sud'
+}
+
+# Mapping des Bureaux vers leur territoire de rattachement
+BUREAU_TERRITOIRE_MAPPING = {
+    'Bureau LYON': 'Est du Sud',
+    'Bureau MARSEILLE': 'Sud Med',
+    'Bureau AJACCIO': 'Sud Med'
+}
+
+
+def rattachement(station, territoire_original, station_type):
+    # (territoire, couleur, groupe de couches) d'une station selon son type :
+    # les RER et Bureaux sont rattachés à un territoire par leur nom
+    if territoire_original == 'RER' or station_type == 'RER':
+        territoire = RER_TERRITOIRE_MAPPING.get(station, 'RER')
+        return territoire, COLORS.get(territoire, '#999999'), 'rer'
+    if territoire_original == 'Bureau' or station_type == 'Bureau':
+        territoire = BUREAU_TERRITOIRE_MAPPING.get(station, 'Bureau')
+        return territoire, COLORS.get(territoire, '#999999'), 'bureau'
+    territoire = TERRITOIRE_MAPPING.get(territoire_original, territoire_original)
+    return territoire, COLORS.get(territoire, '#999999'), 'ici'
@@ -0,0 +1,72 @@
+import unittest
+
+from leaflet_html import classify_nested, marker_positions, polygon_rings
+
+# Classement 30 min / 60 min des isochrones extraits de ReseauICI.html
+#   python -m unittest test_leaflet_html
+
+
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+class ClassifyNestedTest(unittest.TestCase):
+    def test_pair(self):
+        labels, n_isolated = classify_nested([square(0, 0, 10), square(2, 2, 3)])
+        self.assertEqual(labels, ['outer', 'inner'])
+        self.assertEqual(n_isolated, 0)
+
+    def test_outer_inside_neighbour_outer(self):
+        # Le 60 min d'une station (4, 4) tombe dans le 60 min d'une voisine :
+        # il contient son 30 min, il reste 'outer'
+        labels, n_isolated = classify_nested([square(0, 0, 10), square(0, 0, 3),
+                                              square(4, 4, 4), square(4, 4, 1)])
+        self.assertEqual(labels, ['outer', 'inner', 'outer', 'inner'])
+        self.assertEqual(n_isolated, 0)
+
+    def test_inner_containing_neighbour_inner(self):
+        # Le 30 min de A (6, 6) contient le 30 min et le 60 min de B (2.5, 2.5) :
+        # sans les stations, aucune règle d'emboîtement ne le classe bien
+        rings = [square(0, 0, 10), square(1, 1, 6), square(2, 2, 1), square(1.5, 1.5, 3)]
+        labels, n_isolated = classify_nested(rings, [[6, 6], [2.5, 2.5]])
+        self.assertEqual(labels, ['outer', 'inner', 'inner', 'outer'])
+        self.assertEqual(n_isolated, 0)
+
+    def test_outer_inside_neighbour_outer_with_stations(self):
+        rings = [square(0, 0, 10), square(0, 0, 3), square(4, 4, 4), square(4, 4, 1)]
+        labels, _ = classify_nested(rings, [[1, 1], [4.5, 4.5]])
+        self.assertEqual(labels, ['outer', 'inner', 'outer', 'inner'])
+
+    def test_colocated_stations(self):
+        # Deux marqueurs au même endroit (station et bureau), chacun avec son 30 et son 60 min
+        rings = [square(0, 0, 3), square(0, 0, 10), square(0.1, 0, 3), square(0.1, 0, 10)]
+        labels, n_isolated = classify_nested(rings, [[1, 1], [1, 1]])
+        self.assertEqual(labels, ['inner', 'outer', 'inner', 'outer'])
+        self.assertEqual(n_isolated, 0)
+
+    def test_unpaired_falls_back_to_nesting(self):
+        # Station (20, 20) sans son 60 min : ses polygones passent par l'emboîtement / l'aire
+        rings = [square(0, 0, 10), square(2, 2, 3), square(19, 19, 2)]
+        labels, n_isolated = classify_nested(rings, [[3, 3], [20, 20]])
+        self.assertEqual(labels, ['outer', 'inner', 'inner'])
+        self.assertEqual(n_isolated, 1)
+
+    def test_marker_positions(self):
+        layers = [{'kind': 'marker', 'coords': [45, 4]}, {'kind': 'polygon', 'coords': []},
+                  {'kind': 'circleMarker', 'coords': [46, 5]}]
+        self.assertEqual(marker_positions(layers), [[4, 45], [5, 46]])
+
+    def test_isolated_by_area(self):
+        # Sans emboîtement : au plus proche des aires des groupes classés
+        labels, n_isolated = classify_nested([square(0, 0, 10), square(2, 2, 3),
+                                              square(50, 50, 9), square(80, 80, 2)])
+        self.assertEqual(labels, ['outer', 'inner', 'outer', 'inner'])
+        self.assertEqual(n_isolated, 2)
+
+    def test_polygon_rings_closes_and_swaps(self):
+        self.assertEqual(polygon_rings([[45, 4], [46, 4], [46, 5]]),
+                         [[[4, 45], [4, 46], [5, 46], [4, 45]]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from traveltime_client import make_search, fetch_time_maps
+
+# Client TravelTime contre un serveur local (pas de clé API ni de réseau)
+#   python -m unittest test_traveltime_client
+#
+# Le serveur bouchon répond à chaque POST selon une liste de réponses prévues
+# (statut, en-têtes), puis 200 avec un carré troué par recherche reçue.
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.posts.append(body['departure_searches'])
+            status, headers = server.planned.pop(0) if server.planned else (200, {})
+        if status != 200:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(b'{"error": "stub"}')
+            return
+        results = []
+        for search in body['departure_searches']:
+            lat, lng = search['coords']['lat'], search['coords']['lng']
+            shell = [{'lat': lat, 'lng': lng}, {'lat': lat, 'lng': lng + 1},
+                     {'lat': lat + 1, 'lng': lng + 1}, {'lat': lat + 1, 'lng': lng}]
+            hole = [{'lat': lat + 0.4, 'lng': lng + 0.4}, {'lat': lat + 0.6, 'lng': lng + 0.4},
+                    {'lat': lat + 0.6, 'lng': lng + 0.6}]
+            results.append({'search_id': search['id'], 'shapes': [{'shell': shell, 'holes': [hole]}]})
+        payload = json.dumps({'results': results}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FetchTimeMapsTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.posts = []
+        self.server.planned = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v4/time-map'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fetch(self, searches, **kwargs):
+        return fetch_time_maps(searches, {}, url=self.url, rate=100, **kwargs)
+
+    def searches(self, n):
+        return [make_search(f's{i}', 45 + i * 0.01, 4 + i * 0.01, 3600) for i in range(n)]
+
+    def test_batches_and_maps_back_by_id(self):
+        results, errors, n_requests = self.fetch(self.searches(25), batch_size=10)
+        self.assertEqual(errors, {})
+        self.assertEqual(n_requests, 3)
+        self.assertEqual(sorted(len(batch) for batch in self.server.posts), [5, 10, 10])
+        self.assertEqual(set(results), {f's{i}' for i in range(25)})
+        # Polygone [extérieur, trou], anneaux fermés [lon, lat], autour du point de la recherche
+        shell, hole = results['s3'][0]
+        self.assertEqual(shell[0], shell[-1])
+        self.assertAlmostEqual(shell[0][0], 4.03)
+        self.assertAlmostEqual(shell[0][1], 45.03)
+        self.assertEqual(len(hole), 4)
+        self.assertEqual(hole[0], hole[-1])
+
+    def test_429_honours_retry_after(self):
+        self.server.planned = [(429, {'Retry-After': '2'})]
+        start = time.monotonic()
+        results, errors, n_requests = self.fetch(self.searches(3))
+        self.assertGreaterEqual(time.monotonic() - start, 2)
+        self.assertEqual(errors, {})
+        self.assertEqual(len(results), 3)
+        self.assertEqual(n_requests, 2)
+
+    def test_retries_server_errors_then_succeeds(self):
+        self.server.planned = [(503, {}), (500, {})]
+        results, errors, n_requests = self.fetch(self.searches(4))
+        self.assertEqual(errors, {})
+        self.assertEqual(len(results), 4)
+        self.assertEqual(n_requests, 3)
+
+    def test_client_error_is_not_retried(self):
+        self.server.planned = [(400, {})]
+        results, errors, n_requests = self.fetch(self.searches(2))
+        self.assertEqual(results, {})
+        self.assertEqual(set(errors), {'s0', 's1'})
+        self.assertTrue(errors['s0'].startswith('Erreur 400'))
+        self.assertEqual(n_requests, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import shutil
+import numpy as np
+from simplification import tolerance_for_zoom
+from map_hover import RENDERER
+
+# Export des isochrones en tuiles par niveau de zoom pour carte_finale.html
+# Chaque niveau a sa propre simplification ; une feature est écrite une seule
+# fois, dans la tuile XYZ du centre de sa boîte englobante (sans découpage).
+# L'index donne pour chaque tuile l'étendue, en tuiles, de ses features : la
+# carte charge toute tuile dont l'étendue recoupe la vue, même si la tuile
+# elle-même est hors champ. Les tuiles sont des fichiers .js qui appellent
+# chargerTuile(...) : elles se chargent avec une balise <script>, ce qui
+# fonctionne aussi en ouvrant la carte en file://.
+#
+#   tuiles/<niveau>/<x>/<y>.js
+#
+# La carte ne garde que les tuiles du niveau courant qui recoupent la vue
+# élargie (PADDING) : la mémoire reste stable quand on se déplace.
+
+TILES_DIR = 'tuiles'
+# Niveau de grille -> zoom dont on prend la tolérance (dernier zoom servi par ce niveau)
+TILE_LEVELS = {5: 7, 8: 10}
+PADDING = 0.5   # Marge de la vue (fraction de sa taille) avant de décharger une tuile
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    n = 2 ** zoom
+    lat = np.clip(lat, -85.0511, 85.0511)
+    x = np.floor((np.asarray(lon) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(np.radians(lat))) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(int), np.clip(y, 0, n - 1).astype(int)
+
+
+def write_tiles(net, properties_for, out_dir=TILES_DIR, levels=TILE_LEVELS):
+    # properties_for(durée, propriétés) -> propriétés à publier, ou None pour ignorer
+    # Renvoie l'index des tuiles existantes {niveau: {"x/y": [x0, y0, x1, y1]}}
+    # (étendue en tuiles des features de chaque tuile) et le volume écrit
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+
+    index = {}
+    total_bytes = 0
+    for level, tolerance_zoom in levels.items():
+        tiles, extents = {}, {}
+        for duration in net.durations:
+            store = net.simplified(duration, tolerance_for_zoom(tolerance_zoom))
+            boxes = store.bboxes()
+            x0, y1 = lonlat_to_tile(boxes[:, 0], boxes[:, 1], level)
+            x1, y0 = lonlat_to_tile(boxes[:, 2], boxes[:, 3], level)
+            cx, cy = lonlat_to_tile((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2, level)
+            for i in range(len(store)):
+                if np.isnan(boxes[i, 0]):
+                    continue
+                properties = properties_for(duration, store.properties[i])
+                if properties is None:
+                    continue
+                feature = {
+                    "type": "Feature",
+                    "id": f"{duration}-{i}",
+                    "properties": properties,
+                    "geometry": store.geometry(i)
+                }
+                key = (int(cx[i]), int(cy[i]))
+                tiles.setdefault(key, []).append(feature)
+                e = extents.setdefault(key, [int(x0[i]), int(y0[i]), int(x1[i]), int(y1[i])])
+                e[:] = [min(e[0], x0[i]), min(e[1], y0[i]), max(e[2], x1[i]), max(e[3], y1[i])]
+
+        for (x, y), features in tiles.items():
+            os.makedirs(os.path.join(out_dir, str(level), str(x)), exist_ok=True)
+            content = f'chargerTuile("{level}/{x}/{y}", {json.dumps(features, separators=(",", ":"))});\n'
+            with open(os.path.join(out_dir, str(level), str(x), f'{y}.js'), 'w') as f:
+                f.write(content)
+            total_bytes += len(content.encode('utf-8'))
+        index[level] = {f'{x}/{y}': [int(v) for v in extents[(x, y)]] for x, y in sorted(tiles)}
+
+    return index, total_bytes
+
+
+def loader_script(map_name, groups, index, out_dir=TILES_DIR, padding=PADDING):
+    # JavaScript qui charge les tuiles utiles à la vue et les répartit dans les FeatureGroup folium
+    # groups : {"ici_30": nom JS du FeatureGroup, ...} ; index : retour de write_tiles
+    # Survol et clic passent par window.survolIsochrones (map_hover.hover_script,
+    # à ajouter avant ce script), rendu sur le canvas partagé RENDERER
+    groups_js = '{' + ', '.join(f'"{key}": {name}' for key, name in groups.items()) + '}'
+    return f"""
+(function() {{
+    var map = {map_name};
+    var groups = {groups_js};
+    var survol = window.survolIsochrones;
+    var tileIndex = {json.dumps(index, separators=(',', ':'))};
+    var levels = {json.dumps(sorted(index))};
+    var baseDir = "{out_dir}";
+    var padding = {padding};
+    var tiles = {{}};   // clé -> {{layers: [...]}} ; layers null tant que la tuile n'est pas arrivée
+
+    function levelFor(zoom) {{
+        var level = levels[0];
+        levels.forEach(function(l) {{ if (zoom >= l) level = l; }});
+        return level;
+    }}
+
+    function tileXY(lat, lng, z) {{
+        var n = Math.pow(2, z);
+        lat = Math.max(Math.min(lat, 85.0511), -85.0511);
+        var x = Math.floor((lng + 180) / 360 * n);
+        var y = Math.floor((1 - Math.asinh(Math.tan(lat * Math.PI / 180)) / Math.PI) / 2 * n);
+        return [Math.min(Math.max(x, 0), n - 1), Math.min(Math.max(y, 0), n - 1)];
+    }}
+
+    function tileRange(bounds, level) {{
+        var nw = tileXY(bounds.getNorth(), bounds.getWest(), level);
+        var se = tileXY(bounds.getSouth(), bounds.getEast(), level);
+        return [nw[0], nw[1], se[0], se[1]];
+    }}
+
+    function overlaps(e, r) {{
+        return e[0] <= r[2] && e[2] >= r[0] && e[1] <= r[3] && e[3] >= r[1];
+    }}
+
+    function unload(key) {{
+        (tiles[key].layers || []).forEach(function(l) {{
+            survol.remove(l.layer);
+            l.group.removeLayer(l.layer);
+        }});
+        delete tiles[key];
+    }}
+
+    window.chargerTuile = function(key, features) {{
+        var tile = tiles[key];
+        if (!tile || tile.layers) return;   // déchargée ou changée de niveau entre-temps
+        tile.layers = features.map(function(f) {{
+            var p = f.properties, group = groups[p.group + '_' + p.duration];
+            var layer = L.geoJSON(f, {{style: function() {{ return survol.baseStyle(p); }},
+                                      interactive: false, renderer: {RENDERER}}});
+            survol.add(layer);
+            group.addLayer(layer);
+            return {{layer: layer, group: group}};
+        }});
+    }};
+
+    function update() {{
+        var level = levelFor(map.getZoom());
+        var bounds = map.getBounds();
+        var visible = tileRange(bounds, level), kept = tileRange(bounds.pad(padding), level);
+        for (var key in tiles) {{
+            var parts = key.split('/');
+            if (parseInt(parts[0], 10) !== level || !overlaps(tileIndex[level][parts[1] + '/' + parts[2]], kept)) unload(key);
+        }}
+        for (var xy in tileIndex[level]) {{
+            var key = level + '/' + xy;
+            if (tiles[key] || !overlaps(tileIndex[level][xy], visible)) continue;
+            tiles[key] = {{layers: null}};
+            var script = document.createElement('script');
+            script.src = baseDir + '/' + key + '.js';
+            // Le code de la tuile a été exécuté : la balise ne sert plus
+            script.onload = script.onerror = function() {{ this.parentNode.removeChild(this); }};
+            document.body.appendChild(script);
+        }}
+    }}
+
+    map.on('moveend', update);
+    update();
+}})();
+"""
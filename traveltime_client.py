@@ -0,0 +1,134 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from instrumentation import count
+
+# Client TravelTime /v4/time-map : regroupe plusieurs recherches par requête,
+# envoie les lots en parallèle (pool borné + seau à jetons) et réassocie
+# chaque résultat à sa recherche via son "id".
+
+# Surchargeable pour tester contre un serveur local (ex: http://127.0.0.1:8000/v4/time-map)
+API_URL = os.environ.get('TRAVELTIME_URL', 'https://api.traveltimeapp.com/v4/time-map')
+
+DEPARTURE_TIME = "2024-01-15T08:00:00Z"
+BATCH_SIZE = 10        # Recherches par requête (limite de l'API time-map)
+MAX_WORKERS = 4        # Requêtes simultanées
+RATE_PER_SECOND = 2.0  # Débit moyen autorisé
+MAX_RETRIES = 4
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.acquired = 0   # Jetons délivrés = requêtes réellement envoyées
+
+    def acquire(self):
+        # Bloque jusqu'à ce qu'un jeton soit disponible
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.acquired += 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_search(search_id, lat, lon, seconds, mode='driving', departure_time=DEPARTURE_TIME):
+    return {
+        "id": search_id,
+        "coords": {"lat": float(lat), "lng": float(lon)},
+        "departure_time": departure_time,
+        "travel_time": int(seconds),
+        "transportation": {"type": mode}
+    }
+
+
+def shapes_to_coords(shapes):
+    # Convertit les formes TravelTime en polygones GeoJSON [extérieur, trous...],
+    # anneaux [lon, lat] fermés
+    polygons = []
+    for shape in shapes:
+        shell = shape.get('shell', [])
+        if shell:
+            polygons.append([_ring(shell)] + [_ring(hole) for hole in shape.get('holes', []) if hole])
+    return polygons
+
+
+def _ring(points):
+    coords = [[point['lng'], point['lat']] for point in points]
+    if coords[0] != coords[-1]:
+        coords.append(coords[0])  # Fermer le polygone
+    return coords
+
+
+def _post_batch(session, headers, batch, bucket, url):
+    payload = {"departure_searches": batch}
+    delay = 1.0
+    for attempt in range(MAX_RETRIES + 1):
+        bucket.acquire()
+        try:
+            response = session.post(url, headers=headers, json=payload, timeout=60)
+        except requests.RequestException as e:
+            error = str(e)[:80]
+        else:
+            count('requetes_traveltime')
+            count('octets_recus', len(response.content))
+            if response.status_code == 200:
+                return response.json()
+            error = f"Erreur {response.status_code}: {response.text[:80]}"
+            if response.status_code not in RETRY_STATUS:
+                raise RuntimeError(error)
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+
+        if attempt == MAX_RETRIES:
+            raise RuntimeError(error)
+        time.sleep(delay + random.uniform(0, delay / 2))
+        delay *= 2
+
+
+def fetch_time_maps(searches, headers, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS,
+                    rate=RATE_PER_SECOND, url=None):
+    # Renvoie ({search_id: [anneaux]}, {search_id: message d'erreur}, nb de requêtes)
+    # (requêtes réellement envoyées, nouvelles tentatives comprises)
+    url = url or API_URL
+    batches = [searches[i:i + batch_size] for i in range(0, len(searches), batch_size)]
+    bucket = TokenBucket(rate)
+    results = {}
+    errors = {}
+
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_post_batch, session, headers, batch, bucket, url): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                for search in batch:
+                    errors[search['id']] = str(e)[:80]
+                continue
+
+            for result in data.get('results', []):
+                results[result['search_id']] = shapes_to_coords(result.get('shapes', []))
+            for search in batch:
+                if search['id'] not in results:
+                    errors[search['id']] = "Pas de résultat"
+
+    return results, errors, bucket.acquired